@@ -1,27 +1,241 @@
+from django.conf import settings
 from django.contrib import admin
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .pagination import EstimatedCountPaginator
 from .models import (
     Location, Contact, Service, Potential, Property, PropertyPicture,
     SingleRoom, House, Apartment, Hostel, Frame, Land, Office, Feature, 
-    ProfilePicture, Amenity, RoomType, Room
+    ProfilePicture, Amenity, RoomType, Room, ExchangeRate,
+    SavedSearch, Notification, PropertyViewCount, PropertySignature, Job, User,
+    normalized_price_expression, record_queryset_changes, stripped_iexact,
+    PROPERTY, ROOM, HOUSE, APARTMENT, LAND, FRAME, OFFICE, HOSTEL, QUEUED, RUNNING
 )
 
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Admin of a table too large to count or list in select boxes"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class PropertyTypeFilter(admin.SimpleListFilter):
+    # Lookups are fixed instead of a SELECT DISTINCT of all types
+    title = 'type'
+    parameter_name = 'type'
+
+    def lookups(self, request, model_admin):
+        types = [PROPERTY, ROOM, HOUSE, APARTMENT, LAND, FRAME, OFFICE, HOSTEL]
+        return [(type, type.capitalize()) for type in types]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(type=self.value())
+        return queryset
+
+
+class DuplicateFilter(admin.SimpleListFilter):
+    # Properties listed more than once(see api.duplicates)
+    title = 'duplicates'
+    parameter_name = 'duplicate'
+    cluster_field = 'signature__cluster'
+    id_field = 'id'
+
+    def lookups(self, request, model_admin):
+        return [('yes', 'Duplicates'), ('first', 'First of duplicates'), ('no', 'Not duplicates')]
+
+    def queryset(self, request, queryset):
+        cluster = self.cluster_field
+        if self.value() == 'yes':
+            return queryset.filter(**{f'{cluster}__isnull': False})
+        if self.value() == 'first':
+            # Clusters are named after their smallest property id
+            return queryset.filter(**{cluster: F(self.id_field)})
+        if self.value() == 'no':
+            return queryset.filter(**{f'{cluster}__isnull': True})
+        return queryset
+
+
+class PropertyAdmin(LargeTableAdmin):
+    list_display = ('id', '__str__', 'type', 'available_for', 'price', 'currency', 'owner', 'post_date')
+    list_select_related = ('location', 'owner')
+    # Filtered lists use (type, post_date) and (available_for, post_date) indexes
+    list_filter = (PropertyTypeFilter, 'available_for', DuplicateFilter)
+    ordering = ('-post_date',)
+    raw_id_fields = ('owner', 'location', 'contact')
+    autocomplete_fields = ('amenities', 'services', 'potentials')
+    actions = (
+        'update_normalized_prices', 'update_favourites_counts',
+        'mark_price_negotiable', 'mark_price_not_negotiable', 'clear_view_counts'
+    )
+
+    def update_normalized_prices(self, request, queryset):
+        rates = [(settings.BASE_CURRENCY, 1.0)]
+        rates += list(ExchangeRate.objects.values_list('currency', 'rate'))
+        count = 0
+        with transaction.atomic():
+            for currency, rate in rates:
+                properties = queryset.filter(stripped_iexact('currency', currency))
+                record_queryset_changes(properties)
+                count += properties.update(normalized_price=normalized_price_expression(rate))
+        self.message_user(request, f'Updated normalized price of {count} properties')
+    update_normalized_prices.short_description = 'Recompute normalized prices'
+
+    def update_favourites_counts(self, request, queryset):
+        favourites = (
+            User.fav_properties.through.objects
+            .filter(property=OuterRef('pk'))
+            .order_by().values('property')
+            .annotate(count=Count('*')).values('count')
+        )
+        count = queryset.update(favourites_count=Coalesce(Subquery(favourites), 0))
+        self.message_user(request, f'Updated favourites count of {count} properties')
+    update_favourites_counts.short_description = 'Recompute favourites counts'
+
+    def mark_price_negotiable(self, request, queryset):
+        with transaction.atomic():
+            record_queryset_changes(queryset)
+            count = queryset.update(is_price_negotiable='Y')
+        self.message_user(request, f'Marked {count} properties as negotiable')
+    mark_price_negotiable.short_description = 'Mark price as negotiable'
+
+    def mark_price_not_negotiable(self, request, queryset):
+        with transaction.atomic():
+            record_queryset_changes(queryset)
+            count = queryset.update(is_price_negotiable='N')
+        self.message_user(request, f'Marked {count} properties as not negotiable')
+    mark_price_not_negotiable.short_description = 'Mark price as not negotiable'
+
+    def clear_view_counts(self, request, queryset):
+        count, _ = PropertyViewCount.objects.filter(property__in=queryset.values('pk')).delete()
+        self.message_user(request, f'Cleared view counts of {count} properties')
+    clear_view_counts.short_description = 'Clear view counts'
+
+
+class SignatureDuplicateFilter(DuplicateFilter):
+    cluster_field = 'cluster'
+    id_field = 'property_id'
+
+
+class PropertySignatureAdmin(LargeTableAdmin):
+    list_display = ('property_id', 'cluster', 'type', 'available_for', 'price', 'currency', 'cell_x', 'cell_y')
+    list_filter = (SignatureDuplicateFilter,)
+    ordering = ('cluster', 'property_id')
+    raw_id_fields = ('property',)
+    readonly_fields = ('minhash', 'bands')
+
+
+class NamedAdmin(admin.ModelAdmin):
+    # Searched by autocomplete widgets of properties
+    search_fields = ('name',)
+
+
+class LocationAdmin(LargeTableAdmin):
+    list_display = ('id', 'address')
+
+
+class ContactAdmin(LargeTableAdmin):
+    list_display = ('id', 'name', 'email', 'phone')
+
+
+class PropertyPictureAdmin(LargeTableAdmin):
+    list_display = ('id', 'src', 'property', 'is_main')
+    list_select_related = ('property__location',)
+    list_filter = ('is_main',)
+    raw_id_fields = ('property',)
+    actions = ('mark_main', 'unmark_main')
+
+    def mark_main(self, request, queryset):
+        with transaction.atomic():
+            record_queryset_changes(Property.objects.filter(id__in=queryset.values('property_id')))
+            count = queryset.update(is_main=True)
+        self.message_user(request, f'Marked {count} pictures as main')
+    mark_main.short_description = 'Mark as main pictures'
+
+    def unmark_main(self, request, queryset):
+        with transaction.atomic():
+            record_queryset_changes(Property.objects.filter(id__in=queryset.values('property_id')))
+            count = queryset.update(is_main=False)
+        self.message_user(request, f'Unmarked {count} main pictures')
+    unmark_main.short_description = 'Unmark main pictures'
+
+
+class ProfilePictureAdmin(LargeTableAdmin):
+    list_display = ('id', 'src', 'owner')
+    list_select_related = ('owner',)
+    raw_id_fields = ('owner',)
+
+
+class FeatureAdmin(LargeTableAdmin):
+    list_display = ('id', 'name', 'value', 'property_id')
+    raw_id_fields = ('property',)
+
+
+class RoomAdmin(LargeTableAdmin):
+    list_display = ('id', 'property_id', 'type', 'count')
+    list_select_related = ('type',)
+    raw_id_fields = ('property',)
+
+
+class SavedSearchAdmin(LargeTableAdmin):
+    list_display = ('id', '__str__', 'owner', 'created_at')
+    list_select_related = ('owner',)
+    raw_id_fields = ('owner',)
+
+
+class NotificationAdmin(LargeTableAdmin):
+    list_display = ('id', 'owner', 'saved_search', 'property_id', 'is_read', 'created_at')
+    list_select_related = ('owner', 'saved_search')
+    list_filter = ('is_read',)
+    raw_id_fields = ('owner', 'saved_search', 'property')
+    actions = ('mark_read',)
+
+    def mark_read(self, request, queryset):
+        count = queryset.update(is_read=True)
+        self.message_user(request, f'Marked {count} notifications as read')
+    mark_read.short_description = 'Mark as read'
+
+
+class JobAdmin(LargeTableAdmin):
+    list_display = ('id', 'task', 'queue', 'status', 'priority', 'attempts', 'run_at', 'worker')
+    list_filter = ('status', 'queue')
+    ordering = ('-id',)
+    actions = ('retry',)
+
+    def retry(self, request, queryset):
+        # Running jobs are left to their worker
+        count = queryset.exclude(status=RUNNING).update(
+            status=QUEUED, attempts=0, run_at=timezone.now(), locked_at=None, worker=''
+        )
+        self.message_user(request, f'Queued {count} jobs again')
+    retry.short_description = 'Run again'
+
+
 # Register your models here.
 
-admin.site.register(Apartment)
-admin.site.register(Frame)
-admin.site.register(Hostel)
-admin.site.register(House)
-admin.site.register(Land)
-admin.site.register(Location) 
-admin.site.register(Office)
-admin.site.register(PropertyPicture)
-admin.site.register(ProfilePicture)
-admin.site.register(Potential) 
-admin.site.register(Property)
-admin.site.register(Contact)
-admin.site.register(SingleRoom)
-admin.site.register(Service)
-admin.site.register(Feature)
-admin.site.register(Amenity)
+admin.site.register(Apartment, PropertyAdmin)
+admin.site.register(Frame, PropertyAdmin)
+admin.site.register(Hostel, PropertyAdmin)
+admin.site.register(House, PropertyAdmin)
+admin.site.register(Land, PropertyAdmin)
+admin.site.register(Location, LocationAdmin) 
+admin.site.register(Office, PropertyAdmin)
+admin.site.register(PropertyPicture, PropertyPictureAdmin)
+admin.site.register(ProfilePicture, ProfilePictureAdmin)
+admin.site.register(Potential, NamedAdmin) 
+admin.site.register(Property, PropertyAdmin)
+admin.site.register(Contact, ContactAdmin)
+admin.site.register(SingleRoom, PropertyAdmin)
+admin.site.register(Service, NamedAdmin)
+admin.site.register(Feature, FeatureAdmin)
+admin.site.register(Amenity, NamedAdmin)
 admin.site.register(RoomType)
-admin.site.register(Room)
+admin.site.register(Room, RoomAdmin)
+admin.site.register(ExchangeRate)
+admin.site.register(SavedSearch, SavedSearchAdmin)
+admin.site.register(Notification, NotificationAdmin)
+admin.site.register(PropertySignature, PropertySignatureAdmin)
+admin.site.register(Job, JobAdmin)
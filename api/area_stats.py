@@ -0,0 +1,206 @@
+import math
+
+from django.db import connections, transaction
+
+from .models import (
+    AreaStatsEntry, AreaPriceStats, Land, Location, Property, AREA_CELL_SIZE,
+    AREA_ZOOM_LEVELS, PRICE_BUCKETS_PER_DECADE, COUNT, PRICE, PRICE_PER_SQM
+)
+
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+# Heatmaps can't have more cells than this
+MAX_HEATMAP_CELLS = 10_000
+
+
+def cell_size(zoom):
+    return AREA_CELL_SIZE * AREA_ZOOM_LEVELS[zoom]
+
+
+def cell_of(longitude, latitude, zoom):
+    size = cell_size(zoom)
+    return math.floor(longitude / size), math.floor(latitude / size)
+
+
+def cell_bounds(cell_x, cell_y, zoom):
+    """
+    Return (west, south, east, north) bounds of a cell.
+    """
+    size = cell_size(zoom)
+    return [cell_x * size, cell_y * size, (cell_x + 1) * size, (cell_y + 1) * size]
+
+
+def bucket_value(bucket):
+    # Geometric middle of the bucket
+    return 10 ** ((bucket + 0.5) / PRICE_BUCKETS_PER_DECADE)
+
+
+def percentiles(buckets, percents=PERCENTILES):
+    """
+    Return estimated percentiles of values counted in `buckets`
+    (a dict of bucket => count) as a dict of `p<percent>` => value.
+    """
+    total = sum(buckets.values())
+    if not total:
+        return None
+
+    result = {}
+    items = sorted(buckets.items())
+    for percent in percents:
+        rank = percent / 100 * total
+        seen = 0
+        for bucket, count in items:
+            seen += count
+            if seen >= rank:
+                break
+        result[f'p{percent}'] = round(bucket_value(bucket), 2)
+    return result
+
+
+def stats_rows(zoom, filters):
+    return AreaPriceStats.objects.filter(zoom=zoom, count__gt=0, **filters).values_list(
+        'cell_x', 'cell_y', 'type', 'available_for', 'metric', 'bucket', 'count'
+    )
+
+
+def summarize(rows):
+    """
+    Return count and price percentiles of `rows` of a single cell.
+    """
+    count = 0
+    buckets = {PRICE: {}, PRICE_PER_SQM: {}}
+    for metric, bucket, value in rows:
+        if metric == COUNT:
+            count += value
+        else:
+            buckets[metric][bucket] = buckets[metric].get(bucket, 0) + value
+
+    return {
+        'count': count,
+        'price': percentiles(buckets[PRICE]),
+        'price_per_sqm': percentiles(buckets[PRICE_PER_SQM]),
+    }
+
+
+def cell_stats(longitude, latitude, zoom, filters):
+    """
+    Return stats of the cell containing a point by availability, and
+    by type and availability. Prices of sales and rents aren't
+    comparable, only their counts are added up.
+    """
+    cell_x, cell_y = cell_of(longitude, latitude, zoom)
+    rows = stats_rows(zoom, filters).filter(cell_x=cell_x, cell_y=cell_y)
+
+    groups, availabilities = {}, {}
+    for x, y, type, available_for, metric, bucket, count in rows:
+        groups.setdefault((type, available_for), []).append((metric, bucket, count))
+        availabilities.setdefault(available_for, []).append((metric, bucket, count))
+
+    availabilities = {
+        available_for: summarize(rows) for available_for, rows in sorted(availabilities.items())
+    }
+    return {
+        'zoom': zoom,
+        'bounds': cell_bounds(cell_x, cell_y, zoom),
+        'count': sum(stats['count'] for stats in availabilities.values()),
+        'availabilities': availabilities,
+        'groups': [
+            {'type': type, 'available_for': available_for, **summarize(group)}
+            for (type, available_for), group in sorted(groups.items())
+        ],
+    }
+
+
+def heatmap_size(west, south, east, north, zoom):
+    min_x, min_y = cell_of(west, south, zoom)
+    max_x, max_y = cell_of(east, north, zoom)
+    return (max_x - min_x + 1) * (max_y - min_y + 1)
+
+
+def heatmap(west, south, east, north, zoom, filters):
+    """
+    Return count and median prices by availability of every non empty cell in bounds.
+    """
+    min_x, min_y = cell_of(west, south, zoom)
+    max_x, max_y = cell_of(east, north, zoom)
+    rows = stats_rows(zoom, filters).filter(
+        cell_x__gte=min_x, cell_x__lte=max_x, cell_y__gte=min_y, cell_y__lte=max_y
+    )
+
+    cells = {}
+    for x, y, type, available_for, metric, bucket, count in rows:
+        availabilities = cells.setdefault((x, y), {})
+        availabilities.setdefault(available_for, []).append((metric, bucket, count))
+
+    result = []
+    for (x, y), availabilities in sorted(cells.items()):
+        medians = {}
+        for available_for, rows in sorted(availabilities.items()):
+            stats = summarize(rows)
+            medians[available_for] = {
+                'count': stats['count'],
+                'median_price': stats['price'] and stats['price']['p50'],
+                'median_price_per_sqm': stats['price_per_sqm'] and stats['price_per_sqm']['p50'],
+            }
+        result.append({
+            'bounds': cell_bounds(x, y, zoom),
+            'count': sum(stats['count'] for stats in medians.values()),
+            'availabilities': medians,
+        })
+    return result
+
+
+def rebuild_entries(start, end, using='default'):
+    """
+    Recompute entries of properties with ids from `start` to `end`(excluded).
+    """
+    entries = AreaStatsEntry._meta.db_table
+    buckets = PRICE_BUCKETS_PER_DECADE
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        # Deleting with the queryset would fire receivers of every entry
+        cursor.execute(
+            f"DELETE FROM {entries} WHERE property_id >= %s AND property_id < %s",
+            [start, end]
+        )
+        cursor.execute(
+            f"INSERT INTO {entries} "
+            f"(property_id, cell_x, cell_y, type, available_for, price_bucket, price_per_sqm_bucket) "
+            f"SELECT p.id, floor(ST_X(l.point) / %s), floor(ST_Y(l.point) / %s), "
+            f"p.type, p.available_for, "
+            f"CASE WHEN p.normalized_price > 0 "
+            f"THEN floor(log(p.normalized_price) * %s) END, "
+            f"CASE WHEN p.normalized_price > 0 AND land.square_meters > 0 "
+            f"THEN floor(log(p.normalized_price / land.square_meters) * %s) END "
+            f"FROM {Property._meta.db_table} p "
+            f"JOIN {Location._meta.db_table} l ON l.id = p.location_id "
+            f"LEFT JOIN {Land._meta.db_table} land ON land.property_ptr_id = p.id "
+            f"WHERE p.id >= %s AND p.id < %s AND l.point IS NOT NULL",
+            [AREA_CELL_SIZE, AREA_CELL_SIZE, buckets, buckets, start, end]
+        )
+        return cursor.rowcount
+
+
+def rebuild_stats(using='default'):
+    """
+    Replace counts of every zoom level with counts of entries.
+    """
+    stats = AreaPriceStats._meta.db_table
+    entries = AreaStatsEntry._meta.db_table
+    # Metric => column of entries holding its bucket
+    metrics = {COUNT: None, PRICE: 'price_bucket', PRICE_PER_SQM: 'price_per_sqm_bucket'}
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {stats}")
+        for zoom, factor in AREA_ZOOM_LEVELS.items():
+            for metric, column in metrics.items():
+                bucket = column or '0'
+                condition = f'{column} IS NOT NULL' if column else 'TRUE'
+                group = f'2, 3, type, available_for, {column}' if column else '2, 3, type, available_for'
+                cursor.execute(
+                    f"INSERT INTO {stats} "
+                    f"(zoom, cell_x, cell_y, type, available_for, metric, bucket, count) "
+                    f"SELECT %s, floor(cell_x / %s::float), floor(cell_y / %s::float), "
+                    f"type, available_for, %s, {bucket}, count(*) "
+                    f"FROM {entries} WHERE {condition} GROUP BY {group}",
+                    [zoom, factor, factor, metric]
+                )
@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import statistics
+import subprocess
+from datetime import datetime
+
+
+# City centres used to spread benchmark locations,
+# (name, longitude, latitude, weight, spread in degrees)
+CITIES = [
+    ('Dar es Salaam', 39.2083, -6.7924, 45, 0.08),
+    ('Arusha', 36.6830, -3.3869, 12, 0.05),
+    ('Mwanza', 32.9175, -2.5164, 12, 0.05),
+    ('Dodoma', 35.7516, -6.1630, 10, 0.05),
+    ('Mbeya', 33.4608, -8.9094, 7, 0.04),
+    ('Morogoro', 37.6611, -6.8235, 6, 0.04),
+    ('Zanzibar', 39.1925, -6.1659, 5, 0.03),
+    ('Tanga', 39.0985, -5.0689, 3, 0.03),
+]
+
+# Rural points are spread uniformly within this box,
+# (min longitude, min latitude, max longitude, max latitude)
+COUNTRY_BOUNDS = (29.6, -11.7, 40.4, -1.0)
+
+# Words used to build descriptions, the first ones are used for searching
+DESCRIPTION_WORDS = [
+    'spacious', 'furnished', 'modern', 'quiet', 'beach', 'garden',
+    'parking', 'fenced', 'tiled', 'water', 'electricity', 'security',
+    'view', 'balcony', 'near', 'road', 'school', 'market', 'hospital',
+    'town', 'new', 'clean', 'bright', 'large', 'family', 'compound',
+]
+
+SEARCH_WORDS = DESCRIPTION_WORDS[:6]
+
+
+def random_point(rnd):
+    """
+    Return a random (longitude, latitude), mostly clustered around cities.
+    """
+    if rnd.random() < 0.1:
+        min_x, min_y, max_x, max_y = COUNTRY_BOUNDS
+        return rnd.uniform(min_x, max_x), rnd.uniform(min_y, max_y)
+
+    weights = [city[3] for city in CITIES]
+    _, x, y, _, spread = rnd.choices(CITIES, weights=weights)[0]
+    return rnd.gauss(x, spread), rnd.gauss(y, spread)
+
+
+def summarize(durations, elapsed):
+    """
+    Return latency percentiles(in milliseconds) and throughput
+    of requests which took `durations` seconds in `elapsed` seconds.
+    """
+    durations = sorted(durations)
+    if len(durations) > 1:
+        cuts = statistics.quantiles(durations, n=100, method='inclusive')
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = durations[0]
+
+    return {
+        'requests': len(durations),
+        'p50': round(p50 * 1000, 3),
+        'p95': round(p95 * 1000, 3),
+        'p99': round(p99 * 1000, 3),
+        'mean': round(statistics.mean(durations) * 1000, 3),
+        'throughput': round(len(durations) / elapsed, 2) if elapsed else None,
+    }
+
+
+def timed(func, *args, **kwargs):
+    """
+    Call `func` and return its result together with how long it took.
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(output_dir, name, results, options=None):
+    """
+    Save benchmark results as json and return the path of the saved file.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    now = datetime.now()
+    path = os.path.join(output_dir, f'{name}-{now:%Y%m%d-%H%M%S}.json')
+    data = {
+        'name': name,
+        'date': now.isoformat(),
+        'revision': git_revision(),
+        'options': options or {},
+        'results': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+    return path
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def compare(previous, current, metric):
+    """
+    Return relative change(in percent) of `metric` of every scenario
+    present in both `previous` and `current` results.
+    """
+    changes = {}
+    for scenario, stats in current.items():
+        old = previous.get(scenario, {}).get(metric)
+        new = stats.get(metric)
+        if old and new is not None:
+            changes[scenario] = round((new - old) / old * 100, 1)
+    return changes
+
+
+def measure_startup(paths, warm):
+    """
+    Return how long importing the wsgi application, warming it up and
+    first and second requests to `paths` take in seconds. It must run in
+    a new process so that nothing is loaded before.
+    """
+    os.environ['WARM_UP'] = 'False'
+    start = time.perf_counter()
+    import wsgi
+    durations = {'import': time.perf_counter() - start}
+
+    if warm:
+        from api.warmup import warm_up
+        _, durations['warm_up'] = timed(warm_up)
+
+    from django.test import RequestFactory
+
+    def get(path):
+        response = wsgi.application(RequestFactory().get(path).environ, lambda *args: None)
+        b''.join(response)
+        response.close()
+
+    for attempt in ('first_requests', 'second_requests'):
+        durations[attempt] = sum(timed(get, path)[1] for path in paths)
+    return durations
@@ -0,0 +1,96 @@
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import PropertyChange, CREATED, DELETED
+
+
+# Maximum number of log entries read by one request
+MAX_CHANGES = 1000
+
+# Smallest id of transactions which may still be running, every
+# transaction with a smaller id has committed or rolled back
+OLDEST_RUNNING_TRANSACTION = "txid_snapshot_xmin(txid_current_snapshot())"
+
+
+def format_cursor(transaction_id, id):
+    return f'{transaction_id}-{id}'
+
+
+def parse_cursor(cursor):
+    """
+    Return (transaction id, change id) of `cursor`, raise
+    ValueError if it's not a cursor returned by the feed.
+    """
+    transaction_id, id = cursor.split('-')
+    transaction_id, id = int(transaction_id), int(id)
+    if transaction_id < 0 or id < 0:
+        raise ValueError(f'Invalid cursor {cursor}')
+    return transaction_id, id
+
+
+def collapse(entries):
+    """
+    Return the last action of each property in `entries` as a list of
+    (property id, action) ordered by that action. Properties created
+    and deleted within `entries` were never seen and are left out.
+    """
+    first, last = {}, {}
+    for entry in entries:
+        first.setdefault(entry.property_id, entry.action)
+        # Moved to the end
+        last.pop(entry.property_id, None)
+        last[entry.property_id] = entry.action
+
+    changes = []
+    for property_id, action in last.items():
+        if first[property_id] == CREATED:
+            if action == DELETED:
+                continue
+            action = CREATED
+        changes.append((property_id, action))
+    return changes
+
+
+def read_changes(since=None, limit=MAX_CHANGES, using=None):
+    """
+    Return (changes, cursor, has_more) of up to `limit` log entries after
+    `since` cursor, from the start of the log if it's None. Entries are
+    read in (transaction id, id) order only up to the oldest running
+    transaction, so entries committed later never land behind a cursor.
+    """
+    entries = PropertyChange.objects.using(using).filter(
+        transaction_id__lt=RawSQL(OLDEST_RUNNING_TRANSACTION, [])
+    )
+    if since is not None:
+        transaction_id, id = since
+        entries = entries.filter(
+            Q(transaction_id__gt=transaction_id) |
+            Q(transaction_id=transaction_id, id__gt=id)
+        )
+    entries = list(entries.order_by('transaction_id', 'id')[:limit + 1])
+
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    if entries:
+        cursor = format_cursor(entries[-1].transaction_id, entries[-1].id)
+    else:
+        cursor = format_cursor(*since) if since is not None else format_cursor(0, 0)
+    return collapse(entries), cursor, has_more
+
+
+def compact(using='default'):
+    """
+    Delete log entries followed by a newer entry of the same property,
+    return the number of deleted entries. Clients with a cursor before a
+    deleted entry get the newer one, which tells the current state.
+    """
+    table = PropertyChange._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {table} c USING {table} n "
+            f"WHERE n.property_id = c.property_id "
+            f"AND (n.transaction_id, n.id) > (c.transaction_id, c.id) "
+            f"AND n.transaction_id < {OLDEST_RUNNING_TRANSACTION}"
+        )
+        return cursor.rowcount
@@ -0,0 +1,246 @@
+import json
+
+from django.conf import settings
+from django.db import connections
+from django.urls import reverse
+
+from .models import (
+    Contact, Feature, Location, ProfilePicture, Property, PropertyPicture, User
+)
+
+
+# Primary key used to find where ids go in detail urls
+URL_PLACEHOLDER = 987654321
+
+
+def detail_url(request, view_name, column):
+    """
+    Return an sql expression of the absolute detail url of `column`
+    object and its parameters, as rendered by `HyperlinkedIdentityField`.
+    """
+    url = request.build_absolute_uri(reverse(view_name, args=[URL_PLACEHOLDER]))
+    prefix, suffix = url.rsplit(str(URL_PLACEHOLDER), 1)
+    return f"%s || {column} || %s", [prefix, suffix]
+
+
+def file_url(request, column):
+    """
+    Return an sql expression of the absolute url of a file, null if
+    there is no file, as rendered by `ImageField`.
+    """
+    return f"%s || NULLIF({column}, '')", [request.build_absolute_uri(settings.MEDIA_URL)]
+
+
+def datetime_string(column):
+    # ISO 8601 in UTC like `DateTimeField`, without microseconds when they are 0
+    utc = f"({column} AT TIME ZONE 'UTC')"
+    return (
+        f"to_char({utc}, 'YYYY-MM-DD\"T\"HH24:MI:SS') || "
+        f"CASE WHEN date_trunc('second', {column}) = {column} "
+        f"THEN '' ELSE to_char({utc}, '.US') END || 'Z'"
+    )
+
+
+def point_string(column):
+    # EWKT like `str(Point)`
+    return (
+        f"'SRID=' || ST_SRID({column}) || ';POINT (' || "
+        f"ST_X({column}) || ' ' || ST_Y({column}) || ')'"
+    )
+
+
+def json_object(pairs):
+    """
+    Return an sql expression building a json object out of `pairs` of
+    key => (sql expression, parameters) and its parameters.
+    """
+    parts, params = [], []
+    for key, (sql, sql_params) in pairs.items():
+        parts.append(f"'{key}', {sql}")
+        params.extend(sql_params)
+    return f"json_build_object({', '.join(parts)})", params
+
+
+def column(sql):
+    return sql, []
+
+
+def json_list(table, alias, condition, pairs):
+    """
+    Return an sql subquery building a json list of rows of `table`
+    matching `condition` ordered by id.
+    """
+    obj, params = json_object(pairs)
+    return (
+        f"(SELECT COALESCE(json_agg({obj} ORDER BY {alias}.id), '[]'::json) "
+        f"FROM {table} {alias} {condition})"
+    ), params
+
+
+def json_row(table, alias, condition, obj):
+    sql, params = obj
+    return f"(SELECT {sql} FROM {table} {alias} {condition})", params
+
+
+def m2m_list(request, field, view_name, alias):
+    """
+    Return an sql subquery of a json list of objects related to
+    `p` property through `field` like `AmenitySerializer`.
+    """
+    through = field.remote_field.through._meta.db_table
+    model = field.related_model
+    return json_list(
+        model._meta.db_table, alias,
+        f"JOIN {through} t ON t.{field.m2m_reverse_name()} = {alias}.id "
+        f"WHERE t.{field.m2m_column_name()} = p.id",
+        {
+            'id': column(f'{alias}.id'),
+            'url': detail_url(request, view_name, f'{alias}.id'),
+            'name': column(f'{alias}.name'),
+        }
+    )
+
+
+def owner_object(request, with_picture):
+    """
+    Return an sql expression of the owner `u` like `UserSerializer`,
+    which skips `picture` when the user has none.
+    """
+    groups = User._meta.get_field('groups')
+    pairs = {
+        'id': column('u.id'),
+        'url': detail_url(request, 'user-detail', 'u.id'),
+        'username': column('u.username'),
+        'email': column('u.email'),
+        'phone': column('u.phone'),
+        'groups': (
+            f"(SELECT COALESCE(json_agg(g.{groups.m2m_reverse_name()} "
+            f"ORDER BY g.{groups.m2m_reverse_name()}), '[]'::json) "
+            f"FROM {groups.remote_field.through._meta.db_table} g "
+            f"WHERE g.{groups.m2m_column_name()} = u.id)", []
+        ),
+        'date_joined': column(datetime_string('u.date_joined')),
+        'is_staff': column('u.is_staff'),
+        'full_name': column('u.full_name'),
+        'is_active': column('u.is_active'),
+    }
+    if with_picture:
+        pairs['picture'] = json_object({
+            'id': column('pp.id'),
+            'url': detail_url(request, 'profilepicture-detail', 'pp.id'),
+            'src': file_url(request, 'pp.src'),
+        })
+    pairs['biography'] = column('u.biography')
+    return json_object(pairs)
+
+
+def property_object(request):
+    """
+    Return an sql expression of the property `p` like `PropertySerializer`
+    renders it for anonymous users.
+    """
+    with_picture, with_picture_params = owner_object(request, True)
+    without_picture, without_picture_params = owner_object(request, False)
+    owner = (
+        f"(SELECT CASE WHEN pp.id IS NULL THEN {without_picture} ELSE {with_picture} END "
+        f"FROM {User._meta.db_table} u "
+        f"LEFT JOIN {ProfilePicture._meta.db_table} pp ON pp.owner_id = u.id "
+        f"WHERE u.id = p.owner_id)",
+        without_picture_params + with_picture_params
+    )
+
+    return json_object({
+        'id': column('p.id'),
+        'url': detail_url(request, 'property-detail', 'p.id'),
+        'type': column('p.type'),
+        'available_for': column('p.available_for'),
+        # Always empty on Property instances
+        'available_for_options': column("'[]'::json"),
+        'price': column('p.price'),
+        'price_rate_unit': column('p.price_rate_unit'),
+        'payment_terms': column('p.payment_terms'),
+        'is_price_negotiable': column('p.is_price_negotiable'),
+        'rating': column('p.rating'),
+        'currency': column('p.currency'),
+        'descriptions': column('p.descriptions'),
+        'location': json_row(
+            Location._meta.db_table, 'l', 'WHERE l.id = p.location_id',
+            json_object({
+                'id': column('l.id'),
+                'url': detail_url(request, 'location-detail', 'l.id'),
+                'address': column('l.address'),
+                'point': column(point_string('l.point')),
+                'latitude': column('ST_Y(l.point)'),
+                'longitude': column('ST_X(l.point)'),
+                'srid': column('ST_SRID(l.point)'),
+            })
+        ),
+        'owner': owner,
+        'amenities': m2m_list(request, Property._meta.get_field('amenities'), 'amenity-detail', 'a'),
+        'services': m2m_list(request, Property._meta.get_field('services'), 'service-detail', 's'),
+        'potentials': m2m_list(request, Property._meta.get_field('potentials'), 'potential-detail', 'pt'),
+        'pictures': json_list(
+            PropertyPicture._meta.db_table, 'pic', 'WHERE pic.property_id = p.id',
+            {
+                'id': column('pic.id'),
+                'url': detail_url(request, 'propertypicture-detail', 'pic.id'),
+                'is_main': column('pic.is_main'),
+                'property': column('pic.property_id'),
+                'tooltip': column('pic.tooltip'),
+                'src': file_url(request, 'pic.src'),
+            }
+        ),
+        'other_features': json_list(
+            Feature._meta.db_table, 'f', 'WHERE f.property_id = p.id',
+            {
+                'id': column('f.id'),
+                'url': detail_url(request, 'feature-detail', 'f.id'),
+                'property': column('f.property_id'),
+                'name': column('f.name'),
+                'value': column('f.value'),
+            }
+        ),
+        'contact': json_row(
+            Contact._meta.db_table, 'c', 'WHERE c.id = p.contact_id',
+            json_object({
+                'id': column('c.id'),
+                'url': detail_url(request, 'contact-detail', 'c.id'),
+                'name': column('c.name'),
+                'email': column('c.email'),
+                'phone': column('c.phone'),
+            })
+        ),
+        'post_date': column(datetime_string('p.post_date')),
+        'is_my_favourite': column('false'),
+        'distance': column('NULL::text'),
+        'nearest_origin': column('NULL::integer'),
+        'normalized_price': column('p.normalized_price'),
+        'favourites_count': column('p.favourites_count'),
+        'views_count': column('NULL::bigint'),
+    })
+
+
+def render_properties(ids, request, using='default'):
+    """
+    Return a json list of properties with `ids`(in that order)
+    built by the database.
+    """
+    obj, params = property_object(request)
+    sql = (
+        f"SELECT COALESCE(json_agg({obj} ORDER BY ids.position), '[]'::json)::text "
+        f"FROM unnest(%s::integer[]) WITH ORDINALITY AS ids (id, position) "
+        f"JOIN {Property._meta.db_table} p ON p.id = ids.id"
+    )
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params + [list(ids)])
+        return cursor.fetchone()[0]
+
+
+def paginated_body(data, results):
+    """
+    Return a json page made of pagination `data` and `results`
+    which is already json.
+    """
+    # Results are the last key, their placeholder is replaced
+    body = json.dumps({**data, 'results': None})
+    return body[:-len('null}')] + results + '}'
@@ -0,0 +1,97 @@
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections, DatabaseError
+
+
+# Alias chosen for reads of the request being processed, `None` means primary
+_read_alias = ContextVar('read_alias', default=None)
+
+PRIMARY = 'default'
+
+
+def replica_aliases():
+    """
+    Return aliases of all configured read replicas.
+    """
+    return [alias for alias in settings.DATABASES if alias != PRIMARY]
+
+
+def use_replica(alias):
+    """
+    Route reads of the current context to `alias`, returns a token to
+    pass to `reset_replica` once the request is done.
+    """
+    return _read_alias.set(alias)
+
+
+def reset_replica(token):
+    _read_alias.reset(token)
+
+
+class ReplicaPool():
+    """
+    Keeps track of replicas health and picks a healthy one for reads.
+    A replica is considered unhealthy if it can't be reached or if its
+    replication lag exceeds `REPLICA_MAX_LAG` seconds.
+    """
+
+    def __init__(self):
+        # alias => (is_healthy, time of the last check)
+        self.health = {}
+
+    def check(self, alias):
+        try:
+            with connections[alias].cursor() as cursor:
+                # The last replayed transaction gets older while the primary
+                # is idle, a replica which replayed all it received is caught up
+                cursor.execute(
+                    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+                )
+                lag = cursor.fetchone()[0]
+        except DatabaseError:
+            return False
+        return lag <= settings.REPLICA_MAX_LAG
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        healthy, checked_at = self.health.get(alias, (True, None))
+        if checked_at is None or now - checked_at > settings.REPLICA_HEALTH_CHECK_INTERVAL:
+            healthy = self.check(alias)
+            self.health[alias] = (healthy, now)
+        return healthy
+
+    def mark_unhealthy(self, alias):
+        self.health[alias] = (False, time.monotonic())
+
+    def choose(self):
+        """
+        Return a random healthy replica or `None` if there is none.
+        """
+        healthy = [alias for alias in replica_aliases() if self.is_healthy(alias)]
+        if not healthy:
+            return None
+        return random.choice(healthy)
+
+
+replica_pool = ReplicaPool()
+
+
+class PrimaryReplicaRouter():
+    """
+    Send writes to the primary database and reads to the replica
+    selected for the current request(if any).
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get() or PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
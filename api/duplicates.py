@@ -0,0 +1,282 @@
+import re
+import math
+import zlib
+import hashlib
+
+import numpy as np
+from django.db import connections, transaction
+
+from .models import Property, PropertySignature
+
+
+# Size(in degrees, about 110 meters) of cells points are bucketed in,
+# properties are only compared with properties of neighbouring cells
+CELL_SIZE = 0.001
+
+# Descriptions are compared as sets of shingles of this number of words
+SHINGLE_SIZE = 2
+
+# MinHash signatures are split in BANDS bands of ROWS values, properties
+# sharing a band are compared. With 20 bands of 3 rows descriptions with a
+# jaccard similarity of 0.5 share a band 93% of the time and of 0.3 42% of it
+BANDS = 20
+ROWS = 3
+PERMUTATIONS = BANDS * ROWS
+
+# Properties are duplicates when their descriptions have at least this
+# estimated jaccard similarity and prices differ by at most PRICE_TOLERANCE
+MIN_SIMILARITY = 0.5
+PRICE_TOLERANCE = 0.05
+
+# Universal hashing (a * x + b) mod PRIME of shingle hashes
+PRIME = (1 << 31) - 1
+_random = np.random.RandomState(20261019)
+A = _random.randint(1, PRIME, PERMUTATIONS).astype(np.uint64)
+B = _random.randint(0, PRIME, PERMUTATIONS).astype(np.uint64)
+
+WORD = re.compile(r'\w+')
+
+
+def shingles(text):
+    words = WORD.findall((text or '').lower())
+    if len(words) < SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {
+        ' '.join(words[index:index + SHINGLE_SIZE])
+        for index in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def minhash(text):
+    """
+    Return the MinHash signature of shingles of `text`,
+    None if it has no words.
+    """
+    values = shingles(text)
+    if not values:
+        return None
+    hashes = np.array([zlib.crc32(value.encode()) % PRIME for value in values], dtype=np.uint64)
+    return ((np.outer(A, hashes) + B[:, None]) % PRIME).min(axis=1).astype(np.uint32)
+
+
+def band_hashes(signature):
+    """
+    Return a 64 bits hash of each band of `signature`, including
+    the band's position so that bands only match the same band.
+    """
+    hashes = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(
+            bytes([band]) + signature[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8
+        ).digest()
+        hashes.append(int.from_bytes(digest, 'big', signed=True))
+    return hashes
+
+
+def similarity(first, second):
+    # Estimated jaccard similarity of two MinHash signatures
+    return float(np.mean(
+        np.frombuffer(first, dtype=np.uint32) == np.frombuffer(second, dtype=np.uint32)
+    ))
+
+
+def similar_prices(first, second):
+    """
+    Whether two signatures have prices within PRICE_TOLERANCE, normalized
+    prices are compared when both are known and prices otherwise.
+    """
+    if first.normalized_price is not None and second.normalized_price is not None:
+        a, b = first.normalized_price, second.normalized_price
+    elif first.currency.strip().lower() == second.currency.strip().lower():
+        a, b = first.price, second.price
+    else:
+        return False
+    return abs(a - b) <= PRICE_TOLERANCE * max(abs(a), abs(b))
+
+
+def is_duplicate(first, second):
+    return (
+        similar_prices(first, second) and
+        similarity(first.minhash, second.minhash) >= MIN_SIMILARITY
+    )
+
+
+def compute_signature(property):
+    """
+    Return an unsaved signature of `property`, None if it has no
+    location or description to compare.
+    """
+    location = property.location
+    signature = minhash(property.descriptions)
+    if location is None or location.point is None or signature is None:
+        return None
+    return PropertySignature(
+        property_id=property.pk,
+        type=property.type,
+        available_for=property.available_for,
+        cell_x=math.floor(location.point.x / CELL_SIZE),
+        cell_y=math.floor(location.point.y / CELL_SIZE),
+        price=property.price,
+        currency=property.currency,
+        normalized_price=property.normalized_price,
+        minhash=signature.tobytes(),
+        bands=band_hashes(signature),
+    )
+
+
+def candidates(signature):
+    """
+    Return signatures of properties in cells around `signature`'s
+    sharing a band with it, found with indexes.
+    """
+    return PropertySignature.objects.filter(
+        type=signature.type,
+        available_for=signature.available_for,
+        cell_x__range=(signature.cell_x - 1, signature.cell_x + 1),
+        cell_y__range=(signature.cell_y - 1, signature.cell_y + 1),
+        bands__overlap=signature.bands,
+    ).exclude(property_id=signature.property_id)
+
+
+def merge_clusters(ids):
+    """
+    Put properties with `ids` and those of their clusters in one cluster,
+    return its id.
+    """
+    clusters = set(
+        PropertySignature.objects.filter(property_id__in=ids, cluster__isnull=False)
+        .values_list('cluster', flat=True)
+    )
+    cluster = min(set(ids) | clusters)
+    PropertySignature.objects.filter(property_id__in=ids).update(cluster=cluster)
+    PropertySignature.objects.filter(cluster__in=clusters).update(cluster=cluster)
+    return cluster
+
+
+def update_duplicates(property):
+    """
+    Recompute the signature of `property` after it has been saved and
+    add it to the cluster of properties it duplicates. Clusters are never
+    split here, `detect_duplicates` command rebuilds them.
+    """
+    signature = compute_signature(property)
+    with transaction.atomic():
+        old = PropertySignature.objects.filter(property_id=property.pk).first()
+        if signature is None:
+            if old is not None:
+                old.delete()
+            return None
+
+        signature.cluster = old.cluster if old is not None else None
+        signature.save()
+
+        duplicates = [
+            candidate.property_id for candidate in candidates(signature)
+            if is_duplicate(signature, candidate)
+        ]
+        if duplicates:
+            return merge_clusters([property.pk] + duplicates)
+        return signature.cluster
+
+
+def save_signatures(start, end, using='default'):
+    """
+    Recompute signatures of properties with ids from `start` to
+    `end`(excluded), return the number of saved signatures.
+    """
+    properties = (
+        Property.objects.using(using)
+        .filter(id__gte=start, id__lt=end)
+        .select_related('location')
+        .only(
+            'id', 'type', 'available_for', 'price', 'currency', 'normalized_price',
+            'descriptions', 'location__point'
+        )
+    )
+    signatures = [compute_signature(property) for property in properties]
+    signatures = [signature for signature in signatures if signature is not None]
+    with transaction.atomic(using=using):
+        # Deleting with the queryset would fire receivers of every signature
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {PropertySignature._meta.db_table} "
+                f"WHERE property_id >= %s AND property_id < %s",
+                [start, end]
+            )
+        PropertySignature.objects.using(using).bulk_create(signatures)
+    return len(signatures)
+
+
+def candidate_pairs(using='default'):
+    """
+    Yield pairs of signatures sharing a band, of the same type and
+    availability in neighbouring cells. Pairs are found with a hash
+    join on bands so there are no all pairs comparisons.
+    """
+    table = PropertySignature._meta.db_table
+    columns = ['property_id', 'price', 'currency', 'normalized_price', 'minhash']
+    selected = ', '.join(f'a.{column}' for column in columns)
+    selected += ', ' + ', '.join(f'b.{column}' for column in columns)
+    # Server side cursor, pairs are streamed
+    with connections[using].chunked_cursor() as cursor:
+        cursor.execute(
+            f"WITH bands AS ("
+            f"SELECT property_id, type, available_for, cell_x, cell_y, unnest(bands) AS band "
+            f"FROM {table}), "
+            f"pairs AS ("
+            f"SELECT DISTINCT x.property_id AS a_id, y.property_id AS b_id "
+            f"FROM bands x JOIN bands y ON x.band = y.band AND x.type = y.type "
+            f"AND x.available_for = y.available_for AND x.property_id < y.property_id "
+            f"WHERE abs(x.cell_x - y.cell_x) <= 1 AND abs(x.cell_y - y.cell_y) <= 1) "
+            f"SELECT {selected} FROM pairs "
+            f"JOIN {table} a ON a.property_id = pairs.a_id "
+            f"JOIN {table} b ON b.property_id = pairs.b_id"
+        )
+        while True:
+            rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+            for row in rows:
+                first = PropertySignature(**dict(zip(columns, row[:len(columns)])))
+                second = PropertySignature(**dict(zip(columns, row[len(columns):])))
+                yield first, second
+
+
+def find_clusters(pairs):
+    """
+    Return a dict of property id => cluster id(smallest id of the cluster)
+    of properties in duplicate `pairs`, joined with union find.
+    """
+    parents = {}
+
+    def root(id):
+        parents.setdefault(id, id)
+        while parents[id] != id:
+            parents[id] = parents[parents[id]]
+            id = parents[id]
+        return id
+
+    for first, second in pairs:
+        a, b = root(first), root(second)
+        if a != b:
+            parents[max(a, b)] = min(a, b)
+    return {id: root(id) for id in parents}
+
+
+def save_clusters(clusters, batch_size=1000, using='default'):
+    """
+    Replace clusters of all signatures with `clusters`.
+    """
+    table = PropertySignature._meta.db_table
+    items = sorted(clusters.items())
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(f"UPDATE {table} SET cluster = NULL WHERE cluster IS NOT NULL")
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            values = ', '.join(['(%s, %s)'] * len(batch))
+            cursor.execute(
+                f"UPDATE {table} s SET cluster = v.cluster "
+                f"FROM (VALUES {values}) AS v (property_id, cluster) "
+                f"WHERE s.property_id = v.property_id",
+                [value for item in batch for value in item]
+            )
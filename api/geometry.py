@@ -0,0 +1,82 @@
+import json
+import math
+
+from django.contrib.gis.gdal import GDALException
+from django.contrib.gis.geos import GEOSException, GEOSGeometry
+
+
+# Polygons with more points than this are rejected before any processing
+MAX_INPUT_POINTS = 10_000
+
+# Polygons are simplified until they have at most this number of points
+MAX_POLYGON_POINTS = 200
+
+# Simplification tolerance starts at this fraction of the polygon's size
+# and doubles until it has few enough points
+INITIAL_TOLERANCE = 0.001
+MAX_SIMPLIFICATIONS = 20
+
+SRID = 4326
+
+# Length of a degree of latitude
+METERS_PER_DEGREE = 111320
+
+
+def radius_in_degrees(point, radius):
+    """
+    Return a distance in degrees which is at least `radius` meters
+    everywhere around `point`.
+    """
+    latitude = min(abs(point.y) + radius / METERS_PER_DEGREE, 89)
+    return 1.1 * radius / (METERS_PER_DEGREE * math.cos(math.radians(latitude)))
+
+
+def parse_polygon(value):
+    """
+    Return a polygon or multipolygon from a GeoJSON geometry or feature,
+    raise ValueError if it's not one.
+    """
+    try:
+        data = json.loads(value)
+    except ValueError:
+        raise ValueError('Must be a GeoJSON polygon or multipolygon')
+
+    if isinstance(data, dict) and data.get('type') == 'Feature':
+        data = data.get('geometry')
+    if not isinstance(data, dict) or data.get('type') not in ('Polygon', 'MultiPolygon'):
+        raise ValueError('Must be a GeoJSON polygon or multipolygon')
+
+    try:
+        polygon = GEOSGeometry(json.dumps(data))
+    except (GEOSException, GDALException, ValueError) as error:
+        raise ValueError(f'Invalid GeoJSON geometry: {error}')
+    polygon.srid = SRID
+
+    if polygon.num_points > MAX_INPUT_POINTS:
+        raise ValueError(f'Must not have more than {MAX_INPUT_POINTS} points')
+    if not polygon.valid:
+        # Fixes self intersections of hand drawn shapes
+        polygon = polygon.buffer(0)
+    if polygon.empty:
+        raise ValueError('Must not be empty')
+    return polygon
+
+
+def simplify_polygon(polygon, max_points=MAX_POLYGON_POINTS):
+    """
+    Return `polygon` simplified to at most `max_points` points,
+    raise ValueError if it can't be simplified enough.
+    """
+    if polygon.num_points <= max_points:
+        return polygon
+
+    xmin, ymin, xmax, ymax = polygon.extent
+    tolerance = max(xmax - xmin, ymax - ymin) * INITIAL_TOLERANCE
+    for _ in range(MAX_SIMPLIFICATIONS):
+        # Topology is preserved so that rings don't collapse or cross
+        simplified = polygon.simplify(tolerance, preserve_topology=True)
+        if simplified.num_points <= max_points:
+            simplified.srid = polygon.srid
+            return simplified
+        tolerance *= 2
+    raise ValueError(f'Must not have more than {max_points} points once simplified')
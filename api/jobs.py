@@ -0,0 +1,260 @@
+import os
+import time
+import random
+import select
+import socket
+import logging
+import traceback
+import multiprocessing
+from datetime import timedelta
+from functools import partial
+from importlib import import_module
+from concurrent import futures
+
+import django
+import psycopg2
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import Job, QUEUED, RUNNING, FAILED
+from .live import listening_connection
+
+
+logger = logging.getLogger('api.jobs')
+
+# Channel notified with the queue of every added job, on commit
+CHANNEL = 'jobs'
+
+# Module registering tasks with `task`, imported by workers
+TASKS_MODULE = 'api.tasks'
+
+# Seconds before the first retry of a failed job, doubled on every
+# attempt up to MAX_RETRY_DELAY
+RETRY_DELAY = 10
+MAX_RETRY_DELAY = 3600
+
+# Task name => function
+TASKS = {}
+
+
+def task(queue='default', priority=0, max_attempts=5):
+    """
+    Register the decorated function as a task, `function.delay(*args, **kwargs)`
+    adds a job calling it. Arguments must be json serializable.
+    """
+    def register(function):
+        name = f'{function.__module__}.{function.__name__}'
+        TASKS[name] = function
+        options = {'queue': queue, 'priority': priority, 'max_attempts': max_attempts}
+        function.delay = lambda *args, **kwargs: enqueue(name, args, kwargs, **options)
+        return function
+    return register
+
+
+def enqueue(name, args=(), kwargs=None, queue='default', priority=0,
+            max_attempts=5, delay=0, using='default'):
+    """
+    Add a job calling task `name`. It's written in the current transaction
+    so workers see it only once the transaction commits and never if it
+    rolls back, waiting workers are notified on commit too.
+    """
+    if settings.JOBS_EAGER:
+        function = partial(TASKS[name], *args, **(kwargs or {}))
+        transaction.on_commit(function, using=using)
+        return None
+
+    job = Job.objects.using(using).create(
+        queue=queue, task=name, args=list(args), kwargs=kwargs or {},
+        priority=priority, max_attempts=max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay)
+    )
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, queue])
+    return job
+
+
+def claim(worker, queues=None, limits=None, using='default'):
+    """
+    Mark the next due job of `queues`(all queues if None) as running by
+    `worker` and return it, None if there is none. Jobs locked by other
+    workers are skipped instead of waited for. Queues with as many running
+    jobs as their limit in `limits`(a dict of queue => limit) are left out.
+    """
+    table = Job._meta.db_table
+    columns = ['id', 'queue', 'task', 'args', 'kwargs', 'attempts', 'max_attempts']
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        full = []
+        if limits:
+            # Claims are serialized while running jobs are counted so
+            # that limits hold across workers, the lock ends with the transaction
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [table])
+            cursor.execute(
+                f"SELECT queue, COUNT(*) FROM {table} "
+                f"WHERE status = %s AND queue = ANY(%s) GROUP BY queue",
+                [RUNNING, list(limits)]
+            )
+            full = [queue for queue, count in cursor.fetchall() if count >= limits[queue]]
+
+        cursor.execute(
+            f"UPDATE {table} SET status = %s, attempts = attempts + 1, "
+            f"locked_at = now(), worker = %s "
+            f"WHERE id = ("
+            f"SELECT id FROM {table} WHERE status = %s AND run_at <= now() "
+            f"AND (%s::text[] IS NULL OR queue = ANY(%s)) AND NOT queue = ANY(%s) "
+            f"ORDER BY priority DESC, run_at, id LIMIT 1 FOR UPDATE SKIP LOCKED) "
+            f"RETURNING {', '.join(columns)}",
+            [RUNNING, worker, QUEUED, queues, queues, full]
+        )
+        row = cursor.fetchone()
+    return Job(**dict(zip(columns, row))) if row is not None else None
+
+
+def retry_delay(attempts):
+    # Jitter spreads retries of jobs which failed together
+    delay = min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+    return delay * random.uniform(0.75, 1.25)
+
+
+def fail(job, error, using='default'):
+    """
+    Queue `job` again after a delay growing with its attempts,
+    or mark it as failed when it has no attempts left.
+    """
+    jobs = Job.objects.using(using).filter(pk=job.pk)
+    if job.attempts >= job.max_attempts:
+        jobs.update(status=FAILED, last_error=error, locked_at=None)
+    else:
+        jobs.update(
+            status=QUEUED, last_error=error, locked_at=None, worker='',
+            run_at=timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+        )
+
+
+def requeue_lost(timeout, using='default'):
+    """
+    Fail jobs running for more than `timeout` seconds, their worker is
+    assumed to be dead, return the number of failed jobs.
+    """
+    table = Job._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET locked_at = NULL, worker = '', "
+            f"last_error = 'Worker lost', "
+            f"status = CASE WHEN attempts >= max_attempts THEN %s ELSE %s END "
+            f"WHERE status = %s AND locked_at < now() - %s * interval '1 second'",
+            [FAILED, QUEUED, RUNNING, timeout]
+        )
+        return cursor.rowcount
+
+
+def run(job):
+    """
+    Call the task of claimed `job` and record the outcome.
+    """
+    try:
+        TASKS[job.task](*job.args, **job.kwargs)
+    except Exception:
+        logger.exception('Job %s failed', job)
+        fail(job, traceback.format_exc())
+    else:
+        Job.objects.filter(pk=job.pk).delete()
+
+
+def run_in_pool(job):
+    # Called by threads or processes of a worker's pool
+    try:
+        # Registers tasks in spawned processes
+        import_module(TASKS_MODULE)
+        run(job)
+    finally:
+        # Every thread of the pool has its own connections
+        connections.close_all()
+
+
+class Worker():
+    """
+    Claims due jobs and runs them with a pool of `concurrency` threads, or
+    processes when `processes` is true, until it's stopped. With `burst`
+    it stops once there are no due jobs.
+    """
+
+    def __init__(self, concurrency=4, processes=False, queues=None, limits=None, burst=False):
+        self.concurrency = concurrency
+        self.processes = processes
+        self.queues = queues
+        self.limits = limits or {}
+        self.burst = burst
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = False
+
+    def stop(self, *args):
+        # Running jobs are finished before exiting
+        self.stopping = True
+
+    def pool(self):
+        if self.processes:
+            # Spawned instead of forked so that connections aren't shared
+            return futures.ProcessPoolExecutor(
+                self.concurrency, mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup
+            )
+        return futures.ThreadPoolExecutor(self.concurrency)
+
+    def listen(self):
+        try:
+            return listening_connection(CHANNEL)
+        except psycopg2.Error:
+            logger.exception('Could not listen to added jobs, polling')
+            return None
+
+    def wait_for_jobs(self, listener):
+        """
+        Wait until a job is added or JOBS_POLL_INTERVAL has passed,
+        return the listener to use next.
+        """
+        if listener is None:
+            time.sleep(settings.JOBS_POLL_INTERVAL)
+            return self.listen()
+        try:
+            select.select([listener], [], [], settings.JOBS_POLL_INTERVAL)
+            listener.poll()
+            listener.notifies.clear()
+            return listener
+        except (psycopg2.Error, OSError):
+            listener.close()
+            return None
+
+    def run(self):
+        import_module(TASKS_MODULE)
+        listener = self.listen()
+        running = set()
+        requeued_at = 0
+
+        with self.pool() as pool:
+            while not self.stopping:
+                if time.monotonic() - requeued_at > settings.JOB_TIMEOUT / 2:
+                    requeue_lost(settings.JOB_TIMEOUT)
+                    requeued_at = time.monotonic()
+
+                job = None
+                while len(running) < self.concurrency and not self.stopping:
+                    job = claim(self.name, self.queues, self.limits)
+                    if job is None:
+                        break
+                    running.add(pool.submit(run_in_pool, job))
+
+                if self.burst and job is None and not running:
+                    break
+                if len(running) >= self.concurrency or (self.burst and job is None):
+                    _, running = futures.wait(
+                        running, timeout=settings.JOBS_POLL_INTERVAL,
+                        return_when=futures.FIRST_COMPLETED
+                    )
+                elif not self.stopping:
+                    listener = self.wait_for_jobs(listener)
+                    running = {future for future in running if not future.done()}
+
+        if listener is not None:
+            listener.close()
+        connections.close_all()
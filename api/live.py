@@ -0,0 +1,338 @@
+import json
+import math
+import asyncio
+import logging
+from itertools import product
+
+import psycopg2
+from django.conf import settings
+from django.db import connections
+from django.http import QueryDict
+
+from .models import DELETED
+from .serializers import LiveSubscriptionSerializer
+
+
+logger = logging.getLogger('api.live')
+
+# Channel notified by a trigger on PropertyChange table with the
+# current state of the changed property(see migrations 0031 and 0034)
+CHANNEL = 'property_changes'
+
+# Path of the stream of property changes
+LIVE_PATH = '/live/properties/'
+
+# Size(in degrees) of grid cells subscriptions are indexed by
+CELL_SIZE = 0.1
+
+# Subscriptions to boxes covering more cells than this are
+# checked against every event instead of being indexed
+MAX_INDEXED_CELLS = 400
+
+# Events waiting to be sent to a client, clients too slow
+# to keep up are sent a reset and disconnected
+QUEUE_SIZE = 100
+
+# Seconds between comments keeping idle streams open
+KEEPALIVE_INTERVAL = 15
+
+# Seconds before reconnecting a lost listening connection
+RECONNECT_DELAY = 5
+
+# Events of properties which left a subscription's box or filters
+REMOVED = 'removed'
+
+# Event telling clients that events were lost, they sync
+# with /changes/ and subscribe again
+RESET = 'reset'
+
+
+def cell(longitude, latitude):
+    return math.floor(longitude / CELL_SIZE), math.floor(latitude / CELL_SIZE)
+
+
+class Subscription():
+    """
+    Stream of changes of properties within a bounding box matching filters
+    """
+
+    def __init__(self, west, south, east, north, type=None, available_for=None,
+                 normalized_price__gt=None, normalized_price__lt=None):
+        self.west, self.south, self.east, self.north = west, south, east, north
+        self.type = type
+        self.available_for = available_for
+        self.normalized_price__gt = normalized_price__gt
+        self.normalized_price__lt = normalized_price__lt
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        # Properties sent to the client, which are told when they leave
+        self.sent = set()
+        self.closed = False
+
+    def cells(self):
+        """
+        Return grid cells covered by the box, None if there are too many
+        """
+        west, south = cell(self.west, self.south)
+        east, north = cell(self.east, self.north)
+        if (east - west + 1) * (north - south + 1) > MAX_INDEXED_CELLS:
+            return None
+        return list(product(range(west, east + 1), range(south, north + 1)))
+
+    def contains(self, longitude, latitude):
+        if longitude is None or latitude is None:
+            return False
+        return self.west <= longitude <= self.east and self.south <= latitude <= self.north
+
+    def matches(self, event):
+        if not self.contains(event['longitude'], event['latitude']):
+            return False
+        if self.type is not None and event['type'] != self.type:
+            return False
+        if self.available_for is not None and event['available_for'] != self.available_for:
+            return False
+
+        price = event['normalized_price']
+        if self.normalized_price__gt is not None and (price is None or price <= self.normalized_price__gt):
+            return False
+        if self.normalized_price__lt is not None and (price is None or price >= self.normalized_price__lt):
+            return False
+        return True
+
+    def push(self, action, event):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait((action, {**event, 'action': action}))
+        except asyncio.QueueFull:
+            # Events are dropped, the client resyncs
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait((RESET, {}))
+            self.closed = True
+
+    def deliver(self, event):
+        id = event['id']
+        if event['action'] == DELETED:
+            # Tombstones carry the last location but no filtered fields
+            if id in self.sent or self.contains(event['longitude'], event['latitude']):
+                self.sent.discard(id)
+                self.push(DELETED, event)
+        elif self.matches(event):
+            self.sent.add(id)
+            self.push(event['action'], event)
+        elif id in self.sent:
+            self.sent.discard(id)
+            self.push(REMOVED, event)
+
+
+class SubscriptionIndex():
+    """
+    Subscriptions of a worker indexed by grid cells of their boxes, so
+    that an event is only checked against subscriptions around it.
+    """
+
+    def __init__(self):
+        self.subscriptions = set()
+        self.cells = {}
+        # Subscriptions to large boxes
+        self.unindexed = set()
+        # Property id => subscriptions it was sent to
+        self.watchers = {}
+
+    def add(self, subscription):
+        self.subscriptions.add(subscription)
+        cells = subscription.cells()
+        if cells is None:
+            self.unindexed.add(subscription)
+            return
+        for key in cells:
+            self.cells.setdefault(key, set()).add(subscription)
+
+    def remove(self, subscription):
+        self.subscriptions.discard(subscription)
+        self.unindexed.discard(subscription)
+        for key in subscription.cells() or []:
+            subscriptions = self.cells.get(key)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.cells[key]
+        for id in subscription.sent:
+            self.unwatch(id, subscription)
+
+    def unwatch(self, id, subscription):
+        watchers = self.watchers.get(id)
+        if watchers is not None:
+            watchers.discard(subscription)
+            if not watchers:
+                del self.watchers[id]
+
+    def candidates(self, event):
+        # Properties deleted without a location only reach their watchers
+        candidates = set(self.watchers.get(event['id'], ()))
+        if event['longitude'] is not None and event['latitude'] is not None:
+            candidates.update(self.unindexed)
+            candidates.update(self.cells.get(cell(event['longitude'], event['latitude']), ()))
+        return candidates
+
+    def dispatch(self, event):
+        id = event['id']
+        for subscription in self.candidates(event):
+            subscription.deliver(event)
+            if id in subscription.sent:
+                self.watchers.setdefault(id, set()).add(subscription)
+            else:
+                self.unwatch(id, subscription)
+
+    def reset(self):
+        for subscription in self.subscriptions:
+            subscription.push(RESET, {})
+            subscription.closed = True
+
+
+def listening_connection(channel=CHANNEL):
+    """
+    Return a new connection to the primary database listening to `channel`
+    """
+    connection = psycopg2.connect(**connections['default'].get_connection_params())
+    connection.set_session(autocommit=True)
+    with connection.cursor() as cursor:
+        cursor.execute(f'LISTEN {channel}')
+    return connection
+
+
+class ChangeListener():
+    """
+    Connection of a worker receiving notifications of property changes
+    from every worker(and commands) and dispatching them to subscriptions
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.listen())
+
+    async def listen(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            try:
+                connection = await loop.run_in_executor(None, listening_connection)
+            except psycopg2.Error:
+                logger.exception('Could not listen to property changes')
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+
+            readable = asyncio.Event()
+            loop.add_reader(connection.fileno(), readable.set)
+            try:
+                while True:
+                    await readable.wait()
+                    readable.clear()
+                    connection.poll()
+                    while connection.notifies:
+                        self.dispatch(connection.notifies.pop(0).payload)
+            except psycopg2.Error:
+                logger.exception('Lost connection listening to property changes')
+            finally:
+                loop.remove_reader(connection.fileno())
+                connection.close()
+
+            # Changes made while reconnecting are not received
+            self.index.reset()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    def dispatch(self, payload):
+        try:
+            self.index.dispatch(json.loads(payload))
+        except Exception:
+            logger.exception('Could not dispatch property change %s', payload)
+
+
+def event_message(action, data):
+    return f'event: {action}\ndata: {json.dumps(data)}\n\n'.encode()
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+class LiveUpdatesMiddleware():
+    """
+    ASGI middleware streaming server-sent events of properties created,
+    updated or deleted within a bounding box to clients of LIVE_PATH.
+    Other connections are passed to `app`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.index = SubscriptionIndex()
+        self.listener = ChangeListener(self.index)
+
+    def headers(self, content_type):
+        headers = [(b'content-type', content_type)]
+        if settings.CORS_ORIGIN_ALLOW_ALL:
+            headers.append((b'access-control-allow-origin', b'*'))
+        return headers
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] != LIVE_PATH:
+            return await self.app(scope, receive, send)
+
+        query = QueryDict(scope['query_string'].decode())
+        serializer = LiveSubscriptionSerializer(data=query)
+        if scope['method'] != 'GET' or not serializer.is_valid():
+            status = 405 if scope['method'] != 'GET' else 400
+            errors = serializer.errors if status == 400 else {'detail': 'Method not allowed'}
+            await send({
+                'type': 'http.response.start', 'status': status,
+                'headers': self.headers(b'application/json'),
+            })
+            await send({'type': 'http.response.body', 'body': json.dumps(errors).encode()})
+            return
+
+        subscription = Subscription(**serializer.validated_data)
+        self.listener.start()
+        self.index.add(subscription)
+        try:
+            await self.stream(subscription, receive, send)
+        finally:
+            self.index.remove(subscription)
+
+    async def stream(self, subscription, receive, send):
+        headers = self.headers(b'text/event-stream') + [
+            (b'cache-control', b'no-cache'),
+            # Sent as they come through nginx
+            (b'x-accel-buffering', b'no'),
+        ]
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b': subscribed\n\n', 'more_body': True})
+
+        disconnect = asyncio.ensure_future(wait_for_disconnect(receive))
+        try:
+            while True:
+                message = asyncio.ensure_future(subscription.queue.get())
+                await asyncio.wait(
+                    {message, disconnect}, timeout=KEEPALIVE_INTERVAL,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if disconnect.done():
+                    message.cancel()
+                    return
+                if not message.done():
+                    message.cancel()
+                    body = b': keep-alive\n\n'
+                    await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+                    continue
+
+                action, data = message.result()
+                body = event_message(action, data)
+                if action == RESET:
+                    await send({'type': 'http.response.body', 'body': body})
+                    return
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+        finally:
+            disconnect.cancel()
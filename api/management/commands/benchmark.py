@@ -0,0 +1,195 @@
+import json
+import time
+import random
+import threading
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min, Max
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import benchmarks
+from api.models import Property, RENT
+
+
+SCENARIOS = ['list', 'detail', 'nearby', 'search', 'favourites', 'write']
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure p50/p95/p99 latency and throughput of property endpoints, '
+        'run `seed_benchmark` first'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Number of measured requests per scenario'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=10,
+            help='Number of unmeasured requests per scenario'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Number of concurrent clients'
+        )
+        parser.add_argument(
+            '--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS
+        )
+        parser.add_argument(
+            '--base-url',
+            help='Benchmark a running server e.g http://127.0.0.1:8000 '
+                 'instead of an in-process client'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Random seed, same seed sends the same requests'
+        )
+        parser.add_argument(
+            '--output-dir', default='benchmark_results',
+            help='Directory where results are saved'
+        )
+        parser.add_argument(
+            '--compare',
+            help='Results file of a previous run to compare with'
+        )
+
+    def handle(self, *args, **options):
+        self.rnd = random.Random(options['seed'])
+        self.base_url = options['base_url']
+        self.local = threading.local()
+        self.load_fixtures()
+
+        results = {}
+        for scenario in options['scenarios']:
+            requests = [
+                getattr(self, f'request_{scenario}')()
+                for _ in range(options['warmup'] + options['requests'])
+            ]
+            self.run(requests[:options['warmup']], options['concurrency'])
+            durations, errors, elapsed = self.run(
+                requests[options['warmup']:], options['concurrency']
+            )
+            results[scenario] = {
+                **benchmarks.summarize(durations, elapsed),
+                'errors': errors
+            }
+            self.stdout.write(f'{scenario}: {json.dumps(results[scenario])}')
+
+        path = benchmarks.save_results(
+            options['output_dir'], 'endpoints', results,
+            {
+                key: options[key] for key in
+                ('requests', 'warmup', 'concurrency', 'base_url', 'seed')
+            }
+        )
+        self.stdout.write(self.style.SUCCESS(f'Results saved to {path}'))
+
+        if options['compare']:
+            previous = benchmarks.load_results(options['compare'])
+            for metric in ('p50', 'p95', 'p99', 'throughput'):
+                changes = benchmarks.compare(previous, results, metric)
+                self.stdout.write(f'{metric} change(%): {json.dumps(changes)}')
+
+    def load_fixtures(self):
+        """
+        Pick properties, owners and tokens used to build requests.
+        """
+        bounds = Property.objects.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            raise CommandError('No properties found, run `seed_benchmark` first')
+
+        candidates = [
+            self.rnd.randint(bounds['low'], bounds['high'])
+            for _ in range(2000)
+        ]
+        properties = list(
+            Property.objects.filter(id__in=candidates, owner__isnull=False)
+            .order_by('id').values_list('id', 'owner_id')
+        )
+        self.property_ids = [id for id, owner in properties]
+
+        owners = {owner for id, owner in properties}
+        self.tokens = dict(
+            Token.objects.filter(user_id__in=owners).values_list('user_id', 'key')
+        )
+        self.owned = [(id, self.tokens[owner]) for id, owner in properties if owner in self.tokens]
+        if not self.owned:
+            raise CommandError('No properties owned by users with tokens')
+        self.pages = max(1, min(100, Property.objects.count() // 10))
+
+    def request_list(self):
+        return 'get', f'/properties/?page={self.rnd.randint(1, self.pages)}', None, None
+
+    def request_detail(self):
+        return 'get', f'/properties/{self.rnd.choice(self.property_ids)}/', None, None
+
+    def request_nearby(self):
+        longitude, latitude = benchmarks.random_point(self.rnd)
+        radius = self.rnd.choice([500, 1000, 2000, 5000])
+        path = (
+            f'/nearby-properties/?longitude={longitude:.5f}'
+            f'&latitude={latitude:.5f}&radius_to_scan={radius}'
+        )
+        return 'get', path, None, None
+
+    def request_search(self):
+        word = self.rnd.choice(benchmarks.SEARCH_WORDS)
+        price = self.rnd.choice([100_000, 500_000, 1_000_000])
+        path = f'/properties/?search={word}&available_for={RENT}&price__lt={price}'
+        return 'get', path, None, None
+
+    def request_favourites(self):
+        return 'get', '/my-fav-properties/', None, self.rnd.choice(list(self.tokens.values()))
+
+    def request_write(self):
+        id, token = self.rnd.choice(self.owned)
+        data = {'price': self.rnd.randint(1, 1000) * 1000}
+        return 'patch', f'/properties/{id}/', data, token
+
+    def send(self, method, path, data, token):
+        """
+        Send a request and return its status code.
+        """
+        if self.base_url is None:
+            client = getattr(self.local, 'client', None)
+            if client is None:
+                client = self.local.client = APIClient()
+            headers = {'HTTP_AUTHORIZATION': f'Token {token}'} if token else {}
+            return getattr(client, method)(path, data, format='json', **headers).status_code
+
+        request = urllib.request.Request(
+            self.base_url.rstrip('/') + path, method=method.upper(),
+            data=json.dumps(data).encode() if data is not None else None,
+            headers={'Content-Type': 'application/json', 'Accept': 'application/json'}
+        )
+        if token:
+            request.add_header('Authorization', f'Token {token}')
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            return error.code
+
+    def measure(self, request):
+        status, duration = benchmarks.timed(self.send, *request)
+        return duration, status
+
+    def run(self, requests, concurrency):
+        """
+        Send `requests` and return their durations, number of failed
+        requests and total elapsed time.
+        """
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            measurements = list(executor.map(self.measure, requests))
+        elapsed = time.perf_counter() - start
+
+        durations = [duration for duration, status in measurements]
+        errors = sum(1 for duration, status in measurements if status >= 400)
+        return durations, errors, elapsed
@@ -0,0 +1,101 @@
+import io
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework import parsers, renderers
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api import benchmarks
+from api.models import Property
+from api.parsers import JSONParser, MessagePackParser
+from api.renderers import JSONRenderer, MessagePackRenderer
+from api.serializers import PropertySerializer
+from api.views import PropertyViewSetMixin
+
+
+# Name => (renderer, parser)
+FORMATS = {
+    'drf-json': (renderers.JSONRenderer(), parsers.JSONParser()),
+    'json': (JSONRenderer(), JSONParser()),
+    'msgpack': (MessagePackRenderer(), MessagePackParser()),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure render and parse time and payload size of property pages '
+        'in every response format, run `seed_benchmark` first'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page-size', type=int, default=100,
+            help='Number of properties per page'
+        )
+        parser.add_argument(
+            '--repeats', type=int, default=200,
+            help='Number of measured renders and parses per format'
+        )
+        parser.add_argument(
+            '--output-dir', default='benchmark_results',
+            help='Directory where results are saved'
+        )
+        parser.add_argument(
+            '--compare',
+            help='Results file of a previous run to compare with'
+        )
+
+    def handle(self, *args, **options):
+        data = self.load_page(options['page_size'])
+
+        results = {}
+        for name, (renderer, parser) in FORMATS.items():
+            body = renderer.render(data)
+            results[f'render-{name}'] = {
+                **self.measure(renderer.render, data, repeats=options['repeats']),
+                'bytes': len(body)
+            }
+            results[f'parse-{name}'] = self.measure(
+                lambda: parser.parse(io.BytesIO(body)), repeats=options['repeats']
+            )
+            for scenario in (f'render-{name}', f'parse-{name}'):
+                self.stdout.write(f'{scenario}: {json.dumps(results[scenario])}')
+
+        path = benchmarks.save_results(
+            options['output_dir'], 'renderers', results,
+            {key: options[key] for key in ('page_size', 'repeats')}
+        )
+        self.stdout.write(self.style.SUCCESS(f'Results saved to {path}'))
+
+        if options['compare']:
+            previous = benchmarks.load_results(options['compare'])
+            for metric in ('p50', 'p95', 'bytes'):
+                changes = benchmarks.compare(previous, results, metric)
+                self.stdout.write(f'{metric} change(%): {json.dumps(changes)}')
+
+    def load_page(self, page_size):
+        """
+        Return the first `page_size` properties serialized
+        like the property list does.
+        """
+        properties = (
+            Property.objects.order_by('-post_date')
+            .select_related(*PropertyViewSetMixin.select_related.values())
+            .prefetch_related(*PropertyViewSetMixin.prefetch_related.values())
+            [:page_size]
+        )
+        request = Request(APIRequestFactory().get('/properties/'))
+        data = PropertySerializer(properties, many=True, context={'request': request}).data
+        if not data:
+            raise CommandError('No properties found, run `seed_benchmark` first')
+        return {'count': len(data), 'next': None, 'previous': None, 'results': data}
+
+    def measure(self, func, *args, repeats):
+        durations = []
+        start = time.perf_counter()
+        for _ in range(repeats):
+            _, duration = benchmarks.timed(func, *args)
+            durations.append(duration)
+        return benchmarks.summarize(durations, time.perf_counter() - start)
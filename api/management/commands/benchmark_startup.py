@@ -0,0 +1,84 @@
+import os
+import sys
+import json
+import subprocess
+import importlib.util
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import benchmarks
+
+
+PATHS = [
+    '/properties/',
+    '/properties/?query={id,price,location{address}}',
+    '/nearby-properties/?longitude=39.27&latitude=-6.81&radius_to_scan=1000',
+    '/area-stats/?longitude=39.27&latitude=-6.81&zoom=2',
+]
+
+# Runs in a new interpreter, arguments are `cold|warm path...`
+CHILD = (
+    'import sys, json; from api.benchmarks import measure_startup; '
+    'print(json.dumps(measure_startup(sys.argv[2:], sys.argv[1] == "warm")))'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure import time and first request latency of new workers '
+        'with and without warm-up(see api.warmup)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--runs', type=int, default=10,
+            help='Number of started processes per mode'
+        )
+        parser.add_argument(
+            '--paths', nargs='+', default=PATHS,
+            help='Paths requested after starting'
+        )
+        parser.add_argument(
+            '--output-dir', default='benchmark_results',
+            help='Directory where results are saved'
+        )
+        parser.add_argument(
+            '--compare',
+            help='Results file of a previous run to compare with'
+        )
+
+    def handle(self, *args, **options):
+        # The project's root, where wsgi.py is
+        cwd = os.path.dirname(importlib.util.find_spec('wsgi').origin)
+
+        results = {}
+        for mode in ('cold', 'warm'):
+            runs = [self.start(cwd, mode, options['paths']) for _ in range(options['runs'])]
+            for metric in runs[0]:
+                scenario = f'{mode}-{metric}'
+                results[scenario] = benchmarks.summarize([run[metric] for run in runs], 0)
+                self.stdout.write(f'{scenario}: {json.dumps(results[scenario])}')
+
+        path = benchmarks.save_results(
+            options['output_dir'], 'startup', results,
+            {key: options[key] for key in ('runs', 'paths')}
+        )
+        self.stdout.write(self.style.SUCCESS(f'Results saved to {path}'))
+
+        if options['compare']:
+            previous = benchmarks.load_results(options['compare'])
+            for metric in ('p50', 'p95'):
+                changes = benchmarks.compare(previous, results, metric)
+                self.stdout.write(f'{metric} change(%): {json.dumps(changes)}')
+
+    def start(self, cwd, mode, paths):
+        """
+        Start a new process and return its startup durations.
+        """
+        process = subprocess.run(
+            [sys.executable, '-c', CHILD, mode, *paths],
+            cwd=cwd, capture_output=True, text=True
+        )
+        if process.returncode:
+            raise CommandError(process.stderr)
+        return json.loads(process.stdout.splitlines()[-1])
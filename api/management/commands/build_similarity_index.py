@@ -0,0 +1,48 @@
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import similarity
+from api.models import Property
+
+
+class Command(BaseCommand):
+    help = 'Compute feature vectors of all properties and save a snapshot of them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=5_000,
+            help='Number of properties whose vectors are computed at once'
+        )
+        parser.add_argument(
+            '--output', default=settings.SIMILARITY_INDEX_PATH,
+            help='Path of the snapshot loaded by workers'
+        )
+
+    def handle(self, *args, **options):
+        # Vectors saved while building are picked by workers when syncing
+        built_at = timezone.now()
+        batch_size = options['batch_size']
+
+        ids, vectors = [], []
+        last_id = 0
+        while True:
+            batch = list(
+                Property.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1]
+
+            computed = similarity.compute_vectors(batch)
+            similarity.save_vectors(computed)
+            ids.extend(computed)
+            vectors.extend(computed.values())
+            self.stdout.write(f'Computed {len(ids)} vectors')
+
+        index = similarity.SimilarityIndex()
+        index.set(ids, np.array(vectors, dtype=np.float32).reshape(-1, similarity.DIMENSIONS))
+        index.save(options['output'], built_at)
+        self.stdout.write(self.style.SUCCESS(f'Saved {len(ids)} vectors to {options["output"]}'))
@@ -0,0 +1,71 @@
+import os
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import query_plans
+
+
+class Command(BaseCommand):
+    help = (
+        'Explain list queries of property endpoints with representative filter '
+        'combinations and fail on sequential scans of large tables or cost '
+        'regressions, run it against a seeded database(see `seed_benchmark`)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--baseline', default='query_plan_baseline.json',
+            help='File with estimated costs to compare with'
+        )
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Save estimated costs of this run as the baseline'
+        )
+        parser.add_argument(
+            '--max-seq-scan-rows', type=int, default=10_000,
+            help='Tables with more rows must not be scanned sequentially'
+        )
+        parser.add_argument(
+            '--max-cost-increase', type=float, default=20,
+            help='Maximum allowed increase(in percent) of estimated cost'
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if os.path.exists(options['baseline']) and not options['update_baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        results = query_plans.check_plans(
+            baseline=baseline,
+            max_seq_scan_rows=options['max_seq_scan_rows'],
+            max_cost_increase=options['max_cost_increase']
+        )
+
+        for combinations in results.values():
+            for result in combinations.values():
+                self.stdout.write(f"{result['cost']:>12.2f}  {result['name']}")
+
+        if options['update_baseline']:
+            with open(options['baseline'], 'w') as f:
+                json.dump(query_plans.costs(results), f, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {options['baseline']}"))
+            return
+
+        failures = query_plans.failures(results)
+        for failure in failures:
+            if failure['seq_scans']:
+                self.stderr.write(
+                    f"{failure['name']}: sequential scan on {', '.join(failure['seq_scans'])}"
+                )
+            if failure['regression'] is not None:
+                self.stderr.write(
+                    f"{failure['name']}: estimated cost increased by {failure['regression']}%"
+                )
+            if failure['ignored']:
+                self.stderr.write(f"{failure['name']}: filters don't change the query")
+
+        if failures:
+            raise CommandError(f'{len(failures)} query plans failed')
+        self.stdout.write(self.style.SUCCESS('All query plans passed'))
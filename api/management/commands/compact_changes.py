@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api import changes
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete entries of the property change log which are followed '
+        'by a newer entry of the same property'
+    )
+
+    def handle(self, *args, **options):
+        count = changes.compact()
+        self.stdout.write(f'Deleted {count} change log entries')
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+
+from api import duplicates
+from api.models import Property
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute signatures of all properties and rebuild clusters '
+        'of duplicate listings'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=10_000,
+            help='Number of property ids whose signatures are computed at once'
+        )
+        parser.add_argument(
+            '--skip-signatures', action='store_true',
+            help='Only rebuild clusters from saved signatures'
+        )
+
+    def handle(self, *args, **options):
+        if not options['skip_signatures']:
+            bounds = Property.objects.aggregate(first=Min('id'), last=Max('id'))
+            batch_size = options['batch_size']
+            done = 0
+            if bounds['first'] is not None:
+                for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+                    done += duplicates.save_signatures(start, start + batch_size)
+                    self.stdout.write(f'Computed {done} signatures')
+
+        pairs = (
+            (first.property_id, second.property_id)
+            for first, second in duplicates.candidate_pairs()
+            if duplicates.is_duplicate(first, second)
+        )
+        clusters = duplicates.find_clusters(pairs)
+        duplicates.save_clusters(clusters)
+        self.stdout.write(self.style.SUCCESS(
+            f'Found {len(set(clusters.values()))} clusters of '
+            f'{len(clusters)} duplicate properties'
+        ))
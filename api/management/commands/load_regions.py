@@ -0,0 +1,93 @@
+from django.contrib.gis.gdal import DataSource, GDALException
+from django.contrib.gis.geos import MultiPolygon
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import Region
+
+
+SRID = 4326
+
+
+class Command(BaseCommand):
+    help = (
+        'Load region boundaries of a level from a GeoJSON file or shapefile '
+        'and link locations to them'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='GeoJSON file or shapefile')
+        parser.add_argument(
+            '--level', required=True,
+            help='Level of loaded regions e.g region, district or ward'
+        )
+        parser.add_argument(
+            '--name-field', default='name',
+            help='Attribute holding names of regions'
+        )
+        parser.add_argument(
+            '--code-field',
+            help='Attribute holding unique codes of regions, names are used by default'
+        )
+        parser.add_argument(
+            '--parent-level',
+            help='Level of already loaded regions containing loaded regions'
+        )
+        parser.add_argument(
+            '--layer', type=int, default=0,
+            help='Index of the layer holding boundaries'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            layer = DataSource(options['path'])[options['layer']]
+        except (GDALException, IndexError) as error:
+            raise CommandError(f'Could not read {options["path"]}: {error}')
+
+        for field in (options['name_field'], options['code_field']):
+            if field is not None and field not in layer.fields:
+                raise CommandError(f'No `{field}` attribute, attributes are {layer.fields}')
+
+        created = updated = skipped = 0
+        with transaction.atomic():
+            for feature in layer:
+                boundary = self.boundary(feature)
+                if boundary is None:
+                    skipped += 1
+                    continue
+
+                name = str(feature.get(options['name_field']))
+                code = str(feature.get(options['code_field'])) if options['code_field'] else name
+                parent = None
+                if options['parent_level']:
+                    parent = Region.objects.filter(
+                        level=options['parent_level'],
+                        boundary__contains=boundary.point_on_surface
+                    ).first()
+
+                # Locations within the region are linked when it's saved
+                region, is_new = Region.objects.update_or_create(
+                    level=options['level'], code=code,
+                    defaults={'name': name, 'boundary': boundary, 'parent': parent}
+                )
+                created += is_new
+                updated += not is_new
+
+        self.stdout.write(f'Created {created}, updated {updated} and skipped {skipped} regions')
+
+    def boundary(self, feature):
+        """
+        Return the boundary of `feature` as a multipolygon in WGS 84,
+        None if it's not a polygon.
+        """
+        geometry = feature.geom
+        if geometry.srs is not None and geometry.srid != SRID:
+            geometry.transform(SRID)
+
+        boundary = geometry.geos
+        boundary.srid = SRID
+        if boundary.geom_type == 'Polygon':
+            return MultiPolygon(boundary, srid=SRID)
+        if boundary.geom_type == 'MultiPolygon':
+            return boundary
+        return None
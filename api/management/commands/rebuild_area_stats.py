@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Max, Min
+
+from api import area_stats
+from api.models import Property
+
+
+class Command(BaseCommand):
+    help = 'Rebuild area price statistics of every grid cell from all properties'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Number of id ranges processed in parallel'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=50_000,
+            help='Number of property ids in a range'
+        )
+
+    def rebuild_entries(self, start, end):
+        try:
+            return area_stats.rebuild_entries(start, end)
+        finally:
+            # Every thread has its own connection
+            connections.close_all()
+
+    def handle(self, *args, **options):
+        bounds = Property.objects.aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            area_stats.rebuild_stats()
+            self.stdout.write('There are no properties')
+            return
+
+        batch_size = options['batch_size']
+        ranges = [
+            (start, start + batch_size)
+            for start in range(bounds['first'], bounds['last'] + 1, batch_size)
+        ]
+
+        done = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for count in executor.map(lambda bounds: self.rebuild_entries(*bounds), ranges):
+                done += count
+                self.stdout.write(f'Computed {done} entries')
+
+        area_stats.rebuild_stats()
+        self.stdout.write(self.style.SUCCESS('Area stats rebuilt'))
@@ -0,0 +1,58 @@
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.jobs import Worker
+
+
+def queue_limit(value):
+    queue, _, limit = value.partition('=')
+    if not queue or not limit.isdigit() or int(limit) < 1:
+        raise ValueError(value)
+    return queue, int(limit)
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs until stopped(see api.jobs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='Number of jobs run at once by this worker'
+        )
+        parser.add_argument(
+            '--processes', action='store_true',
+            help='Run jobs in a pool of processes instead of threads'
+        )
+        parser.add_argument(
+            '--queues', nargs='+',
+            help='Queues jobs are taken from, all queues by default'
+        )
+        parser.add_argument(
+            '--limit', type=queue_limit, action='append', default=[],
+            metavar='QUEUE=N',
+            help='Maximum number of running jobs of a queue across all workers'
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once there are no due jobs'
+        )
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1')
+
+        worker = Worker(
+            concurrency=options['concurrency'],
+            processes=options['processes'],
+            queues=options['queues'],
+            limits=dict(options['limit']),
+            burst=options['burst'],
+        )
+        # Running jobs are finished before exiting
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+
+        self.stdout.write(f'Worker {worker.name} running jobs')
+        worker.run()
+        self.stdout.write('Worker stopped')
@@ -0,0 +1,293 @@
+import io
+import csv
+import random
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from api.benchmarks import random_point, DESCRIPTION_WORDS
+from api.models import (
+    Location, Contact, Property, PropertyPicture, SingleRoom, House,
+    Apartment, Hostel, Frame, Land, Office, Amenity, Service, Potential,
+    User, RoomType, Room, ExchangeRate, PROPERTIES_AVAILABILITY, ROOM, HOUSE, APARTMENT,
+    LAND, FRAME, OFFICE, HOSTEL, RENT
+)
+
+
+# Property type => (model, share of all properties)
+PROPERTY_TYPES = {
+    ROOM: (SingleRoom, 25),
+    HOUSE: (House, 25),
+    APARTMENT: (Apartment, 20),
+    LAND: (Land, 15),
+    FRAME: (Frame, 7),
+    OFFICE: (Office, 5),
+    HOSTEL: (Hostel, 3),
+}
+
+# Property types with rooms
+ROOMED_TYPES = (ROOM, HOUSE, APARTMENT, HOSTEL)
+
+# (currency, monthly rent range, sale price range)
+CURRENCIES = [
+    ('TZS', (50_000, 3_000_000), (10_000_000, 900_000_000)),
+    ('USD', (50, 3_000), (10_000, 900_000)),
+]
+
+# Currency => exchange rate used when there is none
+EXCHANGE_RATES = {
+    'TZS': 0.00039,
+    'USD': 1.0,
+}
+
+AMENITIES = [
+    'Air conditioning', 'Swimming pool', 'Gym', 'Wifi', 'Parking',
+    'Garden', 'Balcony', 'Elevator', 'Generator', 'Water tank',
+    'Security guard', 'CCTV', 'Fence', 'Furnished', 'Laundry',
+]
+
+SERVICES = [
+    'Cleaning', 'Water', 'Electricity', 'Garbage collection',
+    'Security', 'Maintenance', 'Internet', 'Cable TV',
+]
+
+POTENTIALS = [
+    'Farming', 'Residential', 'Commercial', 'Industrial',
+    'Tourism', 'Mining', 'Investment',
+]
+
+NULL = '\\N'
+
+
+class Command(BaseCommand):
+    help = 'Generate a large synthetic dataset for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--properties', type=int, default=1_000_000,
+            help='Number of properties to generate'
+        )
+        parser.add_argument(
+            '--users', type=int, default=10_000,
+            help='Number of users to generate'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=10_000,
+            help='Number of properties inserted per transaction'
+        )
+        parser.add_argument(
+            '--favourites', type=int, default=20,
+            help='Maximum number of favourite properties per user'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Random seed, same seed generates the same dataset'
+        )
+
+    def handle(self, *args, **options):
+        self.rnd = random.Random(options['seed'])
+        self.now = timezone.now()
+
+        self.create_reference_data()
+        self.users = self.create_users(options['users'])
+
+        total = options['properties']
+        batch_size = options['batch_size']
+        property_ids = []
+        for start in range(0, total, batch_size):
+            count = min(batch_size, total - start)
+            with transaction.atomic():
+                property_ids.extend(self.create_properties(count))
+            self.stdout.write(f'Created {start + count}/{total} properties')
+
+        with transaction.atomic():
+            self.create_favourites(property_ids, options['favourites'])
+
+        call_command('update_normalized_prices', verbosity=0)
+        call_command('update_favourites_counts', verbosity=0)
+        call_command('rebuild_area_stats', verbosity=0, stdout=io.StringIO())
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.stdout.write(self.style.SUCCESS('Benchmark dataset created'))
+
+    def create_reference_data(self):
+        self.amenities = [Amenity.objects.get_or_create(name=name)[0].id for name in AMENITIES]
+        self.services = [Service.objects.get_or_create(name=name)[0].id for name in SERVICES]
+        self.potentials = [Potential.objects.get_or_create(name=name)[0].id for name in POTENTIALS]
+
+        for currency, rate in EXCHANGE_RATES.items():
+            ExchangeRate.objects.get_or_create(currency=currency, defaults={'rate': rate})
+
+        if not RoomType.objects.exists():
+            call_command('loaddata', 'initial_room_type_data', verbosity=0)
+        self.room_types = list(RoomType.objects.values_list('id', flat=True))
+
+    def create_users(self, count):
+        """
+        Create benchmark users(with auth tokens) and return their ids.
+        """
+        prefix = 'bench_user_'
+        existing = User.objects.filter(username__startswith=prefix).count()
+        password = make_password('benchmark')
+        users = [
+            User(
+                username=f'{prefix}{index}', email=f'{prefix}{index}@example.com',
+                full_name=f'Bench User {index}', password=password
+            )
+            for index in range(existing, count)
+        ]
+        User.objects.bulk_create(users, batch_size=1000)
+
+        ids = list(
+            User.objects.filter(username__startswith=prefix)
+            .order_by('id').values_list('id', flat=True)
+        )
+        with_token = set(Token.objects.filter(user_id__in=ids).values_list('user_id', flat=True))
+        Token.objects.bulk_create(
+            [Token(user_id=id, key=Token.generate_key()) for id in ids if id not in with_token],
+            batch_size=1000
+        )
+        return ids
+
+    def next_ids(self, model, count):
+        """
+        Reserve `count` ids from `model` primary key sequence.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)',
+                [model._meta.db_table, model._meta.pk.column, count]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def copy(self, table, columns, rows):
+        """
+        Insert `rows` into `table` with COPY, `None` values are inserted as NULL.
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([NULL if value is None else value for value in row])
+        buffer.seek(0)
+
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {table} ({', '.join(columns)}) FROM STDIN "
+                f"WITH (FORMAT csv, NULL '{NULL}')",
+                buffer
+            )
+
+    def copy_model(self, model, fields, rows):
+        columns = [model._meta.get_field(field).column for field in fields]
+        self.copy(model._meta.db_table, columns, rows)
+
+    def copy_m2m(self, field, rows):
+        through = field.remote_field.through
+        columns = [field.m2m_column_name(), field.m2m_reverse_name()]
+        self.copy(through._meta.db_table, columns, rows)
+
+    def price(self, available_for):
+        currency, rent_range, sale_range = self.rnd.choice(CURRENCIES)
+        low, high = rent_range if available_for == RENT else sale_range
+        # Log-uniform prices, most properties are cheap
+        price = round(low * (high / low) ** self.rnd.random(), -1)
+        rate_unit = 'month' if available_for == RENT else None
+        return price, currency, rate_unit
+
+    def description(self):
+        return ' '.join(self.rnd.choices(DESCRIPTION_WORDS, k=self.rnd.randint(8, 40)))
+
+    def create_properties(self, count):
+        rnd = self.rnd
+        types = list(PROPERTY_TYPES)
+        weights = [share for model, share in PROPERTY_TYPES.values()]
+
+        location_ids = self.next_ids(Location, count)
+        contact_ids = self.next_ids(Contact, count)
+        property_ids = self.next_ids(Property, count)
+
+        locations, contacts, properties = [], [], []
+        children = {type: [] for type in PROPERTY_TYPES}
+        pictures, rooms, amenities, services, potentials = [], [], [], [], []
+
+        for location_id, contact_id, property_id in zip(location_ids, contact_ids, property_ids):
+            longitude, latitude = random_point(rnd)
+            locations.append((
+                location_id, f'SRID=4326;POINT({longitude:.6f} {latitude:.6f})',
+                f'Plot {rnd.randint(1, 999)}, Street {rnd.randint(1, 200)}'
+            ))
+            contacts.append((
+                contact_id, f'Agent {rnd.randint(1, 5000)}',
+                f'agent{property_id}@example.com', f'+2557{rnd.randint(10_000_000, 99_999_999)}'
+            ))
+
+            type = rnd.choices(types, weights=weights)[0]
+            available_for = rnd.choice(PROPERTIES_AVAILABILITY[type])
+            price, currency, rate_unit = self.price(available_for)
+            post_date = self.now - timedelta(seconds=rnd.randint(0, 2 * 365 * 24 * 3600))
+            properties.append((
+                property_id, type, available_for, price, rate_unit, currency,
+                rnd.choice(['Y', 'N']), self.description(), rnd.randint(1, 5),
+                rnd.choice(self.users), location_id, contact_id, post_date.isoformat(), 0
+            ))
+
+            if type == LAND:
+                children[type].append((
+                    property_id, round(rnd.uniform(200, 20_000), 1), rnd.choice(['Y', 'N'])
+                ))
+            else:
+                children[type].append((property_id,))
+
+            for index in range(rnd.randint(0, 5)):
+                pictures.append((
+                    property_id, index == 0, '',
+                    f'property_photos/bench/{property_id}_{index}.jpg'
+                ))
+
+            if type in ROOMED_TYPES:
+                for room_type in rnd.sample(self.room_types, rnd.randint(1, 4)):
+                    rooms.append((property_id, room_type, rnd.randint(1, 4)))
+
+            amenities.extend((property_id, id) for id in rnd.sample(self.amenities, rnd.randint(0, 6)))
+            services.extend((property_id, id) for id in rnd.sample(self.services, rnd.randint(0, 4)))
+            if type == LAND:
+                potentials.extend((property_id, id) for id in rnd.sample(self.potentials, rnd.randint(1, 3)))
+
+        self.copy_model(Location, ['id', 'point', 'address'], locations)
+        self.copy_model(Contact, ['id', 'name', 'email', 'phone'], contacts)
+        self.copy_model(
+            Property,
+            [
+                'id', 'type', 'available_for', 'price', 'price_rate_unit', 'currency',
+                'is_price_negotiable', 'descriptions', 'rating', 'owner', 'location',
+                'contact', 'post_date', 'favourites_count'
+            ],
+            properties
+        )
+        for type, rows in children.items():
+            model = PROPERTY_TYPES[type][0]
+            fields = ['property_ptr']
+            if type == LAND:
+                fields += ['square_meters', 'is_registered']
+            self.copy_model(model, fields, rows)
+
+        self.copy_model(PropertyPicture, ['property', 'is_main', 'tooltip', 'src'], pictures)
+        self.copy_model(Room, ['property', 'type', 'count'], rooms)
+        self.copy_m2m(Property._meta.get_field('amenities'), amenities)
+        self.copy_m2m(Property._meta.get_field('services'), services)
+        self.copy_m2m(Property._meta.get_field('potentials'), potentials)
+        return property_ids
+
+    def create_favourites(self, property_ids, maximum):
+        rnd = self.rnd
+        favourites = []
+        for user_id in self.users:
+            count = min(rnd.randint(0, maximum), len(property_ids))
+            favourites.extend((user_id, id) for id in rnd.sample(property_ids, count))
+        self.copy_m2m(User._meta.get_field('fav_properties'), favourites)
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import PropertyPicture, ProfilePicture, StoredFile
+from api.storage import picture_storage
+from api.tasks import delete_media_files
+
+
+class Command(BaseCommand):
+    help = (
+        'Move pictures uploaded before content addressed storage to it, '
+        'so that identical pictures are stored once'
+    )
+
+    def handle(self, *args, **options):
+        for model in (PropertyPicture, ProfilePicture):
+            pictures = model.objects.exclude(src='').exclude(
+                src__in=StoredFile.objects.values('name')
+            ).values_list('id', 'src')
+            moved = missing = 0
+            for id, name in pictures.iterator():
+                if not picture_storage.exists(name):
+                    missing += 1
+                    continue
+                with transaction.atomic(), picture_storage.open(name) as content:
+                    stored = picture_storage.save(name, content)
+                    # Updated without signals, the old file isn't counted
+                    model.objects.filter(id=id).update(src=stored)
+                    delete_media_files.delay([name])
+                moved += 1
+            self.stdout.write(
+                f'Moved {moved} {model._meta.verbose_name_plural}, '
+                f'{missing} files were missing'
+            )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from api.models import Property, User
+
+
+class Command(BaseCommand):
+    help = 'Recompute favourites count of all properties from users favourites'
+
+    def handle(self, *args, **options):
+        favourites = (
+            User.fav_properties.through.objects
+            .filter(property=OuterRef('pk'))
+            .order_by().values('property')
+            .annotate(count=Count('*')).values('count')
+        )
+        count = Property.objects.update(
+            favourites_count=Coalesce(Subquery(favourites), 0)
+        )
+        self.stdout.write(f'Updated {count} properties')
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.models import ExchangeRate
+
+
+class Command(BaseCommand):
+    help = 'Recompute normalized price of all properties from exchange rates'
+
+    def handle(self, *args, **options):
+        rates = [(settings.BASE_CURRENCY, 1.0)]
+        rates += list(ExchangeRate.objects.values_list('currency', 'rate'))
+        for currency, rate in rates:
+            count = ExchangeRate.update_prices(currency, rate)
+            self.stdout.write(f'{currency}: updated {count} properties')
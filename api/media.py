@@ -0,0 +1,153 @@
+import os
+import re
+import mimetypes
+import posixpath
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+)
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+
+# Directories of MEDIA_ROOT anyone can download from
+PUBLIC_MEDIA_DIRS = ('property_photos', 'profile_pictures')
+
+# Names with a long hex digest never change content
+HASHED_NAME = re.compile(r'[0-9a-f]{32,}')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+CACHE_CONTROL = 'public, no-cache'
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+CHUNK_SIZE = 64 * 1024
+
+
+def media_file(path):
+    """
+    Return the absolute path of media file at `path` if it can be
+    downloaded, raise `Http404` otherwise.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    parts = path.split('/')
+    if len(parts) < 2 or parts[0] not in PUBLIC_MEDIA_DIRS or '..' in parts:
+        raise Http404('Media file not found')
+
+    full_path = os.path.join(settings.MEDIA_ROOT, *parts)
+    if not os.path.isfile(full_path):
+        raise Http404('Media file not found')
+    return path, full_path
+
+
+def byte_range(header, size):
+    """
+    Return (start, end included) of a single range `header` of a file of
+    `size` bytes, None if the whole file should be sent. Raise ValueError
+    if the range can't be satisfied.
+    """
+    match = RANGE.match(header.strip())
+    if match is None:
+        # Invalid and multiple ranges are ignored
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # Suffix range i.e the last `end` bytes
+        length = int(end)
+        if not length or not size:
+            raise ValueError('Unsatisfiable range')
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    if start >= size:
+        raise ValueError('Unsatisfiable range')
+    if not end:
+        return start, size - 1
+    if int(end) < start:
+        # Invalid ranges are ignored
+        return None
+    return start, min(int(end), size - 1)
+
+
+def read_range(f, start, length):
+    with f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def send_file(request, full_path, content_type):
+    """
+    Return a response sending the file from python, honouring
+    `If-Modified-Since` and `Range` headers.
+    """
+    stat = os.stat(full_path)
+    last_modified = http_date(stat.st_mtime)
+    since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    if since is not None and int(stat.st_mtime) <= since:
+        response = HttpResponseNotModified()
+        response['Last-Modified'] = last_modified
+        return response
+
+    header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if header and if_range and if_range != last_modified:
+        # The client's copy is stale so it gets the whole file
+        header = None
+
+    try:
+        selected = byte_range(header, stat.st_size) if header else None
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    if selected is None:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    else:
+        start, end = selected
+        response = StreamingHttpResponse(
+            read_range(open(full_path, 'rb'), start, end - start + 1),
+            status=206, content_type=content_type
+        )
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+
+    response['Last-Modified'] = last_modified
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+@require_safe
+def serve(request, path):
+    """
+    Send a media file after checking it can be downloaded. The file is
+    sent by the web server in front when MEDIA_SERVER is set, otherwise
+    from python.
+    """
+    path, full_path = media_file(path)
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    if settings.MEDIA_SERVER == 'nginx':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_REDIRECT_URL + path)
+    elif settings.MEDIA_SERVER == 'sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+    else:
+        response = send_file(request, full_path, content_type)
+
+    if HASHED_NAME.search(posixpath.basename(path)):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    else:
+        response['Cache-Control'] = CACHE_CONTROL
+    return response
@@ -0,0 +1,206 @@
+import sys
+import json
+import time
+import hashlib
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import Serializer
+
+from .db_routers import replica_pool, use_replica, reset_replica
+
+
+def pin_key(request):
+    """
+    Return a cache key identifying the client who made the request,
+    `None` for anonymous clients.
+    """
+    credentials = (
+        request.META.get('HTTP_AUTHORIZATION') or
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    if not credentials:
+        return None
+    digest = hashlib.sha1(credentials.encode()).hexdigest()
+    return f'replica-pin:{digest}'
+
+
+class ReadReplicaMiddleware():
+    """
+    Route reads of safe requests on views with `use_read_replica = True`
+    to a healthy replica. Clients who wrote something recently are pinned
+    to the primary for `REPLICA_PIN_SECONDS` so that they see their own writes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.replica_token = None
+        try:
+            response = self.get_response(request)
+        finally:
+            if request.replica_token is not None:
+                reset_replica(request.replica_token)
+
+        key = pin_key(request)
+        is_write = request.method not in SAFE_METHODS
+        if is_write and key is not None and response.status_code < 400:
+            cache.set(key, True, settings.REPLICA_PIN_SECONDS)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None)
+        if not getattr(view_class, 'use_read_replica', False):
+            return None
+
+        if request.method not in SAFE_METHODS:
+            return None
+
+        key = pin_key(request)
+        if key is not None and cache.get(key):
+            # The client has written recently, read from primary
+            return None
+
+        alias = replica_pool.choose()
+        if alias is not None:
+            request.replica_token = use_replica(alias)
+        return None
+
+
+logger = logging.getLogger('api.sql')
+
+
+def serializer_field_origin():
+    """
+    Return `SerializerName.field_name` of the serializer field being
+    rendered by the caller, `None` if the caller is not a serializer.
+    """
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_code.co_name == 'to_representation':
+            owner = frame.f_locals.get('self')
+            field = frame.f_locals.get('field')
+            if isinstance(owner, Serializer) and field is not None:
+                return f'{owner.__class__.__name__}.{field.field_name}'
+        frame = frame.f_back
+    return None
+
+
+class QueryRecorder():
+    """
+    Database execute wrapper which records count, duration and shape
+    of queries. Queries are parametrized so their sql is their shape.
+    """
+
+    def __init__(self, duplicate_threshold):
+        self.duplicate_threshold = duplicate_threshold
+        self.count = 0
+        self.duration = 0.0
+        # sql => [count, duration, origin]
+        self.shapes = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+
+            shape = self.shapes.get(sql)
+            if shape is None:
+                self.shapes[sql] = [1, duration, None]
+            else:
+                shape[0] += 1
+                shape[1] += duration
+                if shape[0] == self.duplicate_threshold:
+                    # Only inspect the stack once per repeated shape
+                    shape[2] = serializer_field_origin()
+
+    def duplicates(self):
+        """
+        Return shapes executed at least `duplicate_threshold` times.
+        """
+        return [
+            {
+                'fingerprint': hashlib.md5(sql.encode()).hexdigest()[:12],
+                'count': count,
+                'duration': round(duration * 1000, 2),
+                'origin': origin,
+                'sql': sql[:200]
+            }
+            for sql, (count, duration, origin) in self.shapes.items()
+            if count >= self.duplicate_threshold
+        ]
+
+
+class QueryInstrumentationMiddleware():
+    """
+    Record queries run by each request, report them in `Server-Timing`
+    header and in `api.sql` logs and flag repeated query shapes as
+    suspected N+1 queries.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SQL_INSTRUMENTATION:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder(settings.SQL_DUPLICATE_THRESHOLD)
+        request.view_name = None
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+        total = (time.perf_counter() - start) * 1000
+        db = recorder.duration * 1000
+
+        response['Server-Timing'] = (
+            f'db;dur={db:.2f};desc="{recorder.count} queries", '
+            f'app;dur={total:.2f}'
+        )
+
+        duplicates = recorder.duplicates()
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': request.view_name,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_duration': round(db, 2),
+            'duration': round(total, 2),
+            'duplicates': duplicates
+        }
+        logger.info(json.dumps(record))
+
+        for duplicate in duplicates:
+            logger.warning(json.dumps({
+                'message': 'Suspected N+1 query',
+                'view': request.view_name,
+                'path': request.path,
+                **duplicate
+            }))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None)
+        if view_class is None:
+            request.view_name = getattr(view_func, '__name__', None)
+            return None
+
+        actions = getattr(view_func, 'actions', None) or {}
+        action = actions.get(request.method.lower())
+        request.view_name = view_class.__name__
+        if action is not None:
+            request.view_name = f'{view_class.__name__}.{action}'
+        return None
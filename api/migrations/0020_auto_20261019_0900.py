@@ -0,0 +1,19 @@
+# Generated by Django 3.0.7 on 2026-10-19 09:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_auto_20200901_0828'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='room',
+            name='type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.RoomType'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.0.7 on 2026-10-19 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_auto_20261019_0900'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('currency', models.CharField(max_length=10, unique=True)),
+                ('rate', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='normalized_price',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['normalized_price'], name='api_propert_normali_e142e1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['available_for', 'normalized_price'], name='api_propert_availab_801a6b_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.0.7 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+# (through table, columns) of indexes used to filter properties
+# by their many to many relations
+THROUGH_INDEXES = [
+    ('api_property_amenities', ('amenity_id', 'property_id')),
+    ('api_property_services', ('service_id', 'property_id')),
+    ('api_property_potentials', ('potential_id', 'property_id')),
+    ('api_user_fav_properties', ('property_id', 'user_id')),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_auto_20261019_0930'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='land',
+            name='square_meters',
+            field=models.FloatField(db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['post_date'], name='api_propert_post_da_affcc2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['type', 'post_date'], name='api_propert_type_1dd7cd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['available_for', 'post_date'], name='api_propert_availab_7d1612_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['price'], name='api_propert_price_63c2ab_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['owner', 'post_date'], name='api_propert_owner_i_20307d_idx'),
+        ),
+    ] + [
+        migrations.RunSQL(
+            f"CREATE INDEX {table}_{'_'.join(columns)} ON {table} ({', '.join(columns)})",
+            f"DROP INDEX {table}_{'_'.join(columns)}"
+        )
+        for table, columns in THROUGH_INDEXES
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.0.7 on 2026-10-19 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_auto_20261019_1000'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='favourites_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['favourites_count'], name='api_propert_favouri_02b262_idx'),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE api_property SET favourites_count = favourites.count
+            FROM (
+                SELECT property_id, COUNT(*) AS count
+                FROM api_user_fav_properties GROUP BY property_id
+            ) AS favourites
+            WHERE api_property.id = favourites.property_id
+            """,
+            migrations.RunSQL.noop
+        ),
+    ]
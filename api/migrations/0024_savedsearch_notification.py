@@ -0,0 +1,48 @@
+# Generated by Django 3.0.7 on 2026-10-19 11:00
+
+from django.conf import settings
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_auto_20261019_1030'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedSearch',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(blank=True, max_length=256)),
+                ('query', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('type', models.CharField(blank=True, db_index=True, editable=False, max_length=256, null=True)),
+                ('available_for', models.CharField(blank=True, choices=[('sale', 'Sale'), ('rent', 'Rent')], db_index=True, editable=False, max_length=5, null=True)),
+                ('centre', django.contrib.gis.db.models.fields.PointField(blank=True, editable=False, null=True, srid=4326)),
+                ('radius', models.FloatField(blank=True, editable=False, null=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_searches', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('is_read', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL)),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.Property')),
+                ('saved_search', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='api.SavedSearch')),
+            ],
+            options={
+                'unique_together': {('saved_search', 'property')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['owner', 'created_at'], name='api_notific_owner_i_0283f7_idx'),
+        ),
+    ]
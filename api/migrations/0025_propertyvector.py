@@ -0,0 +1,22 @@
+# Generated by Django 3.0.7 on 2026-10-19 11:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_savedsearch_notification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyVector',
+            fields=[
+                ('property', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='vector', serialize=False, to='api.Property')),
+                ('vector', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+    ]
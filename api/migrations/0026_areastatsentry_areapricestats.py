@@ -0,0 +1,43 @@
+# Generated by Django 3.0.7 on 2026-10-19 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_propertyvector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AreaPriceStats',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('zoom', models.PositiveSmallIntegerField()),
+                ('cell_x', models.IntegerField()),
+                ('cell_y', models.IntegerField()),
+                ('type', models.CharField(max_length=256)),
+                ('available_for', models.CharField(choices=[('sale', 'Sale'), ('rent', 'Rent')], max_length=5)),
+                ('metric', models.CharField(choices=[('count', 'Count'), ('price', 'Price'), ('price_per_sqm', 'Price per square meter')], max_length=20)),
+                ('bucket', models.IntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('zoom', 'cell_x', 'cell_y', 'type', 'available_for', 'metric', 'bucket')},
+            },
+        ),
+        migrations.CreateModel(
+            name='AreaStatsEntry',
+            fields=[
+                ('property', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='area_stats_entry', serialize=False, to='api.Property')),
+                ('cell_x', models.IntegerField()),
+                ('cell_y', models.IntegerField()),
+                ('type', models.CharField(max_length=256)),
+                ('available_for', models.CharField(choices=[('sale', 'Sale'), ('rent', 'Rent')], max_length=5)),
+                ('price_bucket', models.IntegerField(null=True)),
+                ('price_per_sqm_bucket', models.IntegerField(null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.0.7 on 2026-10-19 12:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0026_areastatsentry_areapricestats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyViewCount',
+            fields=[
+                ('property', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='views', serialize=False, to='api.Property')),
+                ('count', models.BigIntegerField(db_index=True, default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.0.7 on 2026-10-19 14:10
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_propertyviewcount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Region',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=256)),
+                ('level', models.CharField(max_length=50)),
+                ('code', models.CharField(max_length=100)),
+                ('boundary', django.contrib.gis.db.models.fields.MultiPolygonField(srid=4326)),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='children', to='api.Region')),
+            ],
+            options={
+                'unique_together': {('level', 'code')},
+            },
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='regions',
+            field=models.ManyToManyField(blank=True, editable=False, related_name='locations', to='api.Region'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.0.7 on 2026-10-19 14:40
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0028_region'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertySignature',
+            fields=[
+                ('property', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='api.Property')),
+                ('type', models.CharField(max_length=256)),
+                ('available_for', models.CharField(choices=[('sale', 'Sale'), ('rent', 'Rent')], max_length=5)),
+                ('cell_x', models.IntegerField()),
+                ('cell_y', models.IntegerField()),
+                ('price', models.FloatField()),
+                ('currency', models.CharField(max_length=256)),
+                ('normalized_price', models.FloatField(blank=True, null=True)),
+                ('minhash', models.BinaryField()),
+                ('bands', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), size=None)),
+                ('cluster', models.IntegerField(blank=True, db_index=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='propertysignature',
+            index=models.Index(fields=['type', 'available_for', 'cell_x', 'cell_y'], name='api_propert_type_c5ed60_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propertysignature',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['bands'], name='api_propert_bands_1ef3dd_gin'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.0.7 on 2026-10-19 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0029_propertysignature'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('property_id', models.IntegerField(db_index=True)),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=7)),
+                ('transaction_id', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='propertychange',
+            index=models.Index(fields=['transaction_id', 'id'], name='api_propert_transac_6222c9_idx'),
+        ),
+    ]
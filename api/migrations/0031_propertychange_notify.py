@@ -0,0 +1,49 @@
+# Generated by Django 3.0.7 on 2026-10-19 15:30
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0030_propertychange'),
+    ]
+
+    operations = [
+        # Notifies listening workers(see api.live) of every logged change
+        # with the current state of the property, notifications are
+        # delivered when the transaction of the change commits
+        migrations.RunSQL(
+            """
+            CREATE FUNCTION api_notify_property_change() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify('property_changes', (
+                    SELECT json_build_object(
+                        'id', NEW.property_id,
+                        'action', NEW.action,
+                        'type', p.type,
+                        'available_for', p.available_for,
+                        'price', p.price,
+                        'currency', p.currency,
+                        'normalized_price', p.normalized_price,
+                        'longitude', ST_X(l.point),
+                        'latitude', ST_Y(l.point)
+                    )::text
+                    FROM (SELECT NEW.property_id AS id) AS changed
+                    LEFT JOIN api_property p ON p.id = changed.id
+                    LEFT JOIN api_location l ON l.id = p.location_id
+                ));
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            CREATE TRIGGER api_propertychange_notify
+            AFTER INSERT ON api_propertychange
+            FOR EACH ROW EXECUTE PROCEDURE api_notify_property_change();
+            """,
+            """
+            DROP TRIGGER api_propertychange_notify ON api_propertychange;
+            DROP FUNCTION api_notify_property_change();
+            """
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.0.7 on 2026-10-19 17:00
+
+import api.models
+import api.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0032_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('reference_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='profilepicture',
+            name='src',
+            field=models.ImageField(storage=api.storage.ContentAddressedStorage(), upload_to=api.models.profile_picture_path),
+        ),
+        migrations.AlterField(
+            model_name='propertypicture',
+            name='src',
+            field=models.ImageField(storage=api.storage.ContentAddressedStorage(), upload_to=api.models.property_img_path),
+        ),
+    ]
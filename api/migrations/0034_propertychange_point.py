@@ -0,0 +1,50 @@
+# Generated by Django 3.0.7 on 2026-10-19 17:30
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+NOTIFY_FUNCTION = """
+CREATE OR REPLACE FUNCTION api_notify_property_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('property_changes', (
+        SELECT json_build_object(
+            'id', NEW.property_id,
+            'action', NEW.action,
+            'type', p.type,
+            'available_for', p.available_for,
+            'price', p.price,
+            'currency', p.currency,
+            'normalized_price', p.normalized_price,
+            'longitude', ST_X({point}),
+            'latitude', ST_Y({point})
+        )::text
+        FROM (SELECT NEW.property_id AS id) AS changed
+        LEFT JOIN api_property p ON p.id = changed.id
+        LEFT JOIN api_location l ON l.id = p.location_id
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0033_storedfile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertychange',
+            name='point',
+            field=django.contrib.gis.db.models.fields.PointField(blank=True, null=True, srid=4326),
+        ),
+        # Tombstones are notified with the last location of deleted
+        # properties, so they are routed like other changes
+        migrations.RunSQL(
+            NOTIFY_FUNCTION.format(point='COALESCE(l.point, NEW.point)'),
+            NOTIFY_FUNCTION.format(point='l.point'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.0.7 on 2026-10-19 18:00
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0034_propertychange_point'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='savedsearch',
+            name='area',
+            field=django.contrib.gis.db.models.fields.GeometryField(blank=True, editable=False, null=True, srid=4326),
+        ),
+        migrations.AddField(
+            model_name='savedsearch',
+            name='max_price',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='savedsearch',
+            name='min_price',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+    ]
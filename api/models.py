@@ -1,15 +1,29 @@
 import os
+import re
+import json
+import math
 from uuid import uuid4
+from collections import Counter
 
-from django.db.models import Q, Sum
+from django.db import connections, transaction
+from django.db.models import Q, Sum, F, Func, Case, When, Value
+from django.db.models.functions import Greatest
 from django.contrib.gis.db import models
-from django.contrib.gis.geos import Point
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.gis.geos import Point, Polygon, MultiPolygon
 from django.conf import settings
+from django.http import QueryDict
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
-from django.db.models.signals import post_save
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import post_init, pre_save, post_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
 from rest_framework.authtoken.models import Token
 
+from .storage import picture_storage, release
+from .geometry import parse_polygon, radius_in_degrees, SRID
+
 
 # Property availability
 SALE = 'sale'
@@ -47,6 +61,98 @@ PROPERTIES_AVAILABILITY = {
     HOSTEL: [RENT]
 }
 
+# Actions of property changes
+CREATED = 'created'
+UPDATED = 'updated'
+DELETED = 'deleted'
+
+CHANGE_ACTIONS = (
+    (CREATED, 'Created'),
+    (UPDATED, 'Updated'),
+    (DELETED, 'Deleted'),
+)
+
+# Statuses of background jobs, done jobs are deleted
+QUEUED = 'queued'
+RUNNING = 'running'
+FAILED = 'failed'
+
+JOB_STATUSES = (
+    (QUEUED, 'Queued'),
+    (RUNNING, 'Running'),
+    (FAILED, 'Failed'),
+)
+
+# Radius(in meters) of location searches without radius_to_scan
+DEFAULT_RADIUS_TO_SCAN = 1000
+
+# Price rate unit => number of units in a month, used to
+# convert rent prices to their monthly equivalent
+PRICE_RATE_UNITS = {
+    'hour': 730,
+    'day': 30,
+    'night': 30,
+    'week': 52 / 12,
+    'month': 1,
+    'year': 1 / 12,
+}
+
+PRICE_RATE_UNIT_ALIASES = {
+    'hourly': 'hour',
+    'daily': 'day',
+    'nightly': 'night',
+    'weekly': 'week',
+    'monthly': 'month',
+    'yearly': 'year',
+    'annually': 'year',
+    'annual': 'year',
+}
+
+# Every spelling of a price rate unit(in lower case) => number of units in a month
+PRICE_RATE_UNIT_SPELLINGS = {
+    spelling: PRICE_RATE_UNITS[unit]
+    for unit in PRICE_RATE_UNITS
+    for spelling in (unit, f'{unit}s', f'per {unit}', f'a {unit}', f'/{unit}')
+}
+PRICE_RATE_UNIT_SPELLINGS.update({
+    alias: PRICE_RATE_UNITS[unit] for alias, unit in PRICE_RATE_UNIT_ALIASES.items()
+})
+
+
+def monthly_factor(available_for, price_rate_unit):
+    """
+    Return the number to multiply a price with to get its monthly equivalent,
+    sale prices and prices with unknown rate units are left as they are.
+    """
+    if available_for == SALE or not price_rate_unit:
+        return 1
+    return PRICE_RATE_UNIT_SPELLINGS.get(price_rate_unit.strip().lower(), 1)
+
+
+def stripped_iexact(field, value):
+    """
+    Return a condition of `field` being equal to `value` ignoring case
+    and surrounding whitespace, like values are compared in python.
+    """
+    return Q(**{f'{field}__iregex': rf'^\s*{re.escape(value.strip())}\s*$'})
+
+
+def normalized_price_expression(rate):
+    """
+    Return a database expression of normalized price of properties
+    priced in a currency with exchange rate `rate`.
+    """
+    factor = Case(
+        When(available_for=SALE, then=Value(1.0)),
+        *[
+            When(stripped_iexact('price_rate_unit', spelling), then=Value(float(units)))
+            for spelling, units in PRICE_RATE_UNIT_SPELLINGS.items()
+        ],
+        default=Value(1.0),
+        output_field=models.FloatField()
+    )
+    return F('price') * Value(float(rate)) * factor
+
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_auth_token(sender, instance=None, created=False, **kwargs):
@@ -73,15 +179,7 @@ class User(AbstractUser):
 
 class ProfilePicture(models.Model):
     owner = models.OneToOneField(User, on_delete=models.CASCADE, related_name="picture")
-    src = models.ImageField(upload_to=profile_picture_path)
-
-    def delete(self, *args, **kwargs):
-        img_path = settings.MEDIA_ROOT + str(self.src)
-        deletion_info = super(ProfilePicture, self).delete(*args, **kwargs)
-        path_exist = os.path.isfile(img_path)
-        if path_exist:
-            os.remove(img_path)
-        return deletion_info
+    src = models.ImageField(upload_to=profile_picture_path, storage=picture_storage)
 
     def __str__(self):
         return f"{self.src}"
@@ -92,6 +190,11 @@ class Location(models.Model):
     point = models.PointField(default=Point(0.0, 0.0))
     address = models.CharField(max_length=256, blank=True)
 
+    # Regions containing point, kept up to date by receivers
+    regions = models.ManyToManyField(
+        'Region', blank=True, editable=False, related_name='locations'
+    )
+
     @property
     def longitude(self):
         return self.point.x
@@ -160,6 +263,35 @@ class Property(models.Model):
     services = models.ManyToManyField(Service, blank=True, related_name="properties")
     potentials = models.ManyToManyField(Potential, blank=True, related_name="properties")
     post_date = models.DateTimeField(auto_now_add=True)
+
+    # Monthly equivalent of price in settings.BASE_CURRENCY, it's
+    # null when there is no exchange rate for the currency
+    normalized_price = models.FloatField(blank=True, null=True, editable=False)
+
+    # Number of users who have this property in their favourites
+    favourites_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['favourites_count']),
+            models.Index(fields=['normalized_price']),
+            models.Index(fields=['available_for', 'normalized_price']),
+            models.Index(fields=['post_date']),
+            models.Index(fields=['type', 'post_date']),
+            models.Index(fields=['available_for', 'post_date']),
+            models.Index(fields=['price']),
+            models.Index(fields=['owner', 'post_date']),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.normalized_price = self.get_normalized_price()
+        super().save(*args, **kwargs)
+
+    def get_normalized_price(self):
+        rate = ExchangeRate.get_rate(self.currency)
+        if rate is None or self.price is None:
+            return None
+        return self.price * rate * monthly_factor(self.available_for, self.price_rate_unit)
     
     def available_for_options(self):
         return []
@@ -174,6 +306,271 @@ class Property(models.Model):
         )
 
 
+class ExchangeRate(models.Model):
+    """Value of one unit of `currency` in settings.BASE_CURRENCY"""
+    id = models.AutoField(primary_key=True)
+    currency = models.CharField(max_length=10, unique=True)
+    rate = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def get_rate(cls, currency):
+        """
+        Return exchange rate of `currency` or `None` if it's not known.
+        """
+        currency = (currency or '').strip()
+        if currency.upper() == settings.BASE_CURRENCY.upper():
+            return 1.0
+        rate = cls.objects.filter(currency__iexact=currency).values_list('rate', flat=True).first()
+        return rate
+
+    @staticmethod
+    def update_prices(currency, rate):
+        """
+        Recompute normalized price of all properties priced in `currency`.
+        """
+        # Matched like properties get their rate when saved
+        from .tasks import update_currency_vectors
+
+        properties = Property.objects.filter(stripped_iexact('currency', currency))
+        with transaction.atomic():
+            # Sync clients get the new prices
+            record_queryset_changes(properties)
+            # Prices weigh in similarity vectors, updated without signals
+            update_currency_vectors.delay(currency)
+            if rate is None:
+                return properties.update(normalized_price=None)
+            return properties.update(normalized_price=normalized_price_expression(rate))
+
+    def __str__(self):
+        return f"{self.currency} {self.rate}"
+
+
+@receiver(post_save, sender=ExchangeRate)
+def update_prices_on_rate_change(sender, instance=None, **kwargs):
+    ExchangeRate.update_prices(instance.currency, instance.rate)
+
+
+@receiver(post_delete, sender=ExchangeRate)
+def clear_prices_on_rate_deletion(sender, instance=None, **kwargs):
+    ExchangeRate.update_prices(instance.currency, None)
+
+
+class PropertyVector(models.Model):
+    """Feature vector of a property used to find similar properties(see api.similarity)"""
+    property = models.OneToOneField(
+        Property, primary_key=True, on_delete=models.CASCADE, related_name='vector'
+    )
+    vector = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+
+class PropertyViewCount(models.Model):
+    """Number of times a property has been viewed(see api.view_counts)"""
+    property = models.OneToOneField(
+        Property, primary_key=True, on_delete=models.CASCADE, related_name='views'
+    )
+    count = models.BigIntegerField(default=0, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class PropertySignature(models.Model):
+    """
+    Location cell, description MinHash and price of a property used to
+    find listings of the same place posted several times(see api.duplicates).
+    Properties in a cluster of duplicates have `cluster` set to the
+    smallest id of the cluster.
+    """
+    property = models.OneToOneField(
+        Property, primary_key=True, on_delete=models.CASCADE, related_name='signature'
+    )
+    type = models.CharField(max_length=256)
+    available_for = models.CharField(max_length=5, choices=AVAILABILITY_CHOICES)
+    cell_x = models.IntegerField()
+    cell_y = models.IntegerField()
+    price = models.FloatField()
+    currency = models.CharField(max_length=256)
+    normalized_price = models.FloatField(blank=True, null=True)
+    minhash = models.BinaryField()
+    # Hashes of MinHash bands, properties sharing one are compared
+    bands = ArrayField(models.BigIntegerField())
+    cluster = models.IntegerField(blank=True, null=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['type', 'available_for', 'cell_x', 'cell_y']),
+            GinIndex(fields=['bands']),
+        ]
+
+
+class CurrentTransactionId(Func):
+    # 64 bits id of the current transaction, assigned on first call
+    function = 'txid_current'
+    output_field = models.BigIntegerField()
+
+
+class PropertyChange(models.Model):
+    """
+    Entry of the log of property changes read by clients to sync(see
+    api.changes). Entries are written by receivers in the transaction of
+    the change, deleted properties are left as DELETED tombstones.
+    """
+    id = models.BigAutoField(primary_key=True)
+    # Not a foreign key, tombstones outlive properties
+    property_id = models.IntegerField(db_index=True)
+    action = models.CharField(max_length=7, choices=CHANGE_ACTIONS)
+    # Changes are read in (transaction_id, id) order once
+    # every transaction with a smaller id has ended
+    transaction_id = models.BigIntegerField()
+    # Last location of deleted properties, their tombstones are only
+    # sent to live subscriptions around it(see api.live)
+    point = models.PointField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['transaction_id', 'id']),
+        ]
+
+
+class Job(models.Model):
+    """
+    Background job calling a task with `args` and `kwargs`, claimed and
+    run by `run_jobs` workers(see api.jobs). Jobs are added in the
+    transaction of the request so they only run once it commits.
+    """
+    id = models.BigAutoField(primary_key=True)
+    queue = models.CharField(max_length=100, default='default')
+    task = models.CharField(max_length=256)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    # Due jobs with a higher priority run first
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=7, choices=JOB_STATUSES, default=QUEUED)
+    # Not run before this time, retries are delayed with it
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    # When and by which worker the running job was claimed
+    locked_at = models.DateTimeField(blank=True, null=True)
+    worker = models.CharField(max_length=256, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Only queued jobs are scanned when claiming one
+            models.Index(
+                fields=['-priority', 'run_at', 'id'], name='api_job_queued_idx',
+                condition=Q(status=QUEUED)
+            ),
+            models.Index(
+                fields=['queue', 'locked_at'], name='api_job_running_idx',
+                condition=Q(status=RUNNING)
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.id}"
+
+
+class StoredFile(models.Model):
+    """
+    File of a content addressed storage(see api.storage) with the number of
+    pictures referencing it, files are deleted once it drops to zero.
+    """
+    name = models.CharField(max_length=255, primary_key=True)
+    reference_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+def favourites_affected(through, instance, reverse, pk_set):
+    """
+    Return favourites(through table rows) affected by a change of
+    `instance` favourites to `pk_set`, all of them if `pk_set` is None.
+    """
+    if reverse:
+        favourites = through.objects.filter(property_id=instance.pk)
+        if pk_set is not None:
+            favourites = favourites.filter(user_id__in=pk_set)
+    else:
+        favourites = through.objects.filter(user_id=instance.pk)
+        if pk_set is not None:
+            favourites = favourites.filter(property_id__in=pk_set)
+    return favourites
+
+
+def insert_favourites(through, instance, reverse, pk_set, using):
+    """
+    Insert favourites of `instance` to `pk_set` which don't exist yet,
+    return property ids of rows actually inserted by this transaction.
+    """
+    if reverse:
+        users, properties = list(pk_set), [instance.pk] * len(pk_set)
+    else:
+        users, properties = [instance.pk] * len(pk_set), list(pk_set)
+
+    table = through._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (user_id, property_id) "
+            f"SELECT * FROM unnest(%s::bigint[], %s::bigint[]) "
+            f"ON CONFLICT DO NOTHING RETURNING property_id",
+            [users, properties]
+        )
+        return [id for id, in cursor.fetchall()]
+
+
+def delete_favourites(through, instance, reverse, pk_set, using):
+    """
+    Delete favourites of `instance` to `pk_set`(all of them if None),
+    return property ids of rows actually deleted by this transaction.
+    """
+    favourites = favourites_affected(through, instance, reverse, pk_set).using(using)
+    query, params = favourites.values('id').query.sql_with_params()
+    table = through._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {table} WHERE id IN ({query}) RETURNING property_id",
+            params
+        )
+        return [id for id, in cursor.fetchall()]
+
+
+def change_favourites_count(property_ids, sign, using='default'):
+    """
+    Add(sign=1) or subtract(sign=-1) a favourite for every
+    occurrence of a property in `property_ids`.
+    """
+    # Properties changed by the same amount are updated together
+    amounts = {}
+    for id, count in Counter(property_ids).items():
+        amounts.setdefault(count, []).append(id)
+
+    for count, ids in amounts.items():
+        Property.objects.using(using).filter(id__in=ids).update(
+            # Counts which drifted(fixed by update_favourites_counts) stay positive
+            favourites_count=Greatest(F('favourites_count') + sign * count, 0)
+        )
+
+
+@receiver(m2m_changed, sender=User.fav_properties.through)
+def update_favourites_count(sender, instance, action, reverse, pk_set, using, **kwargs):
+    # Rows are written here rather than by the related manager, so that
+    # only the ones this transaction inserted or deleted are counted even
+    # when the same favourites are added or removed concurrently. The
+    # manager then finds nothing left to insert(it ignores conflicts) or
+    # to delete.
+    if action == 'pre_add':
+        change_favourites_count(insert_favourites(sender, instance, reverse, pk_set, using), 1, using)
+
+    elif action in ('pre_remove', 'pre_clear'):
+        change_favourites_count(delete_favourites(sender, instance, reverse, pk_set, using), -1, using)
+
+
 def property_img_path(instance, filename):
     ext = filename.split('.')[-1]  # Get file extension
 
@@ -189,15 +586,7 @@ class PropertyPicture(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name="pictures")
     is_main = models.BooleanField(default=False)
     tooltip = models.CharField(max_length=256, blank=True)
-    src = models.ImageField(upload_to=property_img_path)
-
-    def delete(self, *args, **kwargs):
-        img_path = settings.MEDIA_ROOT + str(self.src)
-        deletion_info = super(PropertyPicture, self).delete(*args, **kwargs)
-        path_exist = os.path.isfile(img_path)
-        if path_exist:
-            os.remove(img_path)
-        return deletion_info
+    src = models.ImageField(upload_to=property_img_path, storage=picture_storage)
 
     def __str__(self):
         return f"{self.src}"
@@ -238,7 +627,7 @@ class Apartment(RoomsCountMixin, Property):
 
 
 class Land(Property):
-    square_meters = models.FloatField()
+    square_meters = models.FloatField(db_index=True)
     is_registered = models.CharField(max_length=5, blank=True, null=True, choices=ANSWER_CHOICES)
 
     def available_for_options(self):
@@ -296,8 +685,573 @@ class RoomType(models.Model):
 class Room(models.Model):
     id = models.AutoField(primary_key=True)
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='rooms')
-    type = models.OneToOneField(RoomType, on_delete=models.CASCADE)
+    type = models.ForeignKey(RoomType, on_delete=models.CASCADE)
     count = models.IntegerField()
 
     class Meta:
         unique_together = ('property', 'type')
+
+
+def search_price_bounds(params):
+    """
+    Return (lowest, highest) normalized price of properties a saved search
+    query can match, None for unbounded sides. Bounds are inclusive, they
+    may let through properties the query excludes but never the reverse.
+    """
+    lowest, highest = [], []
+    try:
+        if 'normalized_price__gt' in params:
+            lowest.append(float(params['normalized_price__gt']))
+        if 'normalized_price__lt' in params:
+            highest.append(float(params['normalized_price__lt']))
+        if 'normalized_price__range' in params:
+            start, end = params['normalized_price__range'].split(',')
+            lowest.append(float(start))
+            highest.append(float(end))
+    except ValueError:
+        return None, None
+    return max(lowest, default=None), min(highest, default=None)
+
+
+def search_area(params):
+    """
+    Return a geometry containing every point a saved search query within
+    a polygon, around origins or in a region can match, None for others.
+    """
+    try:
+        if 'polygon' in params:
+            area = parse_polygon(params['polygon']).envelope
+        elif 'origins' in params:
+            boxes = []
+            for origin in json.loads(params['origins']):
+                point = Point(float(origin['longitude']), float(origin['latitude']), srid=SRID)
+                radius = float(origin.get('radius_to_scan', DEFAULT_RADIUS_TO_SCAN))
+                degrees = radius_in_degrees(point, radius)
+                boxes.append(Polygon.from_bbox(
+                    (point.x - degrees, point.y - degrees, point.x + degrees, point.y + degrees)
+                ))
+            area = MultiPolygon(*boxes)
+        elif 'region' in params:
+            boundary = Region.objects.filter(pk=int(params['region'])).values_list(
+                'boundary', flat=True
+            ).first()
+            area = boundary.envelope if boundary is not None else None
+        else:
+            return None
+    except (ValueError, KeyError, TypeError, AttributeError):
+        # Invalid queries never match, they are candidates of every property
+        return None
+    if area is not None:
+        area.srid = SRID
+    return area
+
+
+class SavedSearch(models.Model):
+    """
+    Search saved by a user to be notified of new properties matching it.
+    `query` is a query string of property endpoints filters e.g
+    `available_for=rent&normalized_price__lt=300&longitude=39.2&latitude=-6.8`
+    """
+    id = models.AutoField(primary_key=True)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_searches')
+    name = models.CharField(max_length=256, blank=True)
+    query = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    # Filters extracted from query, used to find searches matching a
+    # property without running all of them. Null means any value.
+    type = models.CharField(max_length=256, blank=True, null=True, db_index=True, editable=False)
+    available_for = models.CharField(
+        max_length=5, choices=AVAILABILITY_CHOICES, blank=True, null=True,
+        db_index=True, editable=False
+    )
+    centre = models.PointField(blank=True, null=True, editable=False)
+    radius = models.FloatField(blank=True, null=True, editable=False)
+    # Bounding boxes of searches within a polygon, around origins or in a region
+    area = models.GeometryField(blank=True, null=True, editable=False)
+    min_price = models.FloatField(blank=True, null=True, editable=False)
+    max_price = models.FloatField(blank=True, null=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        params = QueryDict(self.query)
+        self.type = params.get('type') or None
+        self.available_for = params.get('available_for') or None
+        self.min_price, self.max_price = search_price_bounds(params)
+        self.area = search_area(params)
+
+        longitude = params.get('longitude')
+        latitude = params.get('latitude')
+        if longitude is not None and latitude is not None:
+            self.centre = Point(float(longitude), float(latitude), srid=4326)
+            self.radius = float(params.get('radius_to_scan', DEFAULT_RADIUS_TO_SCAN))
+        else:
+            self.centre = None
+            self.radius = None
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.name or self.query
+
+
+class Notification(models.Model):
+    """Property matching a saved search, waiting to be delivered to its owner"""
+    id = models.AutoField(primary_key=True)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    saved_search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name='notifications')
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='+')
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('saved_search', 'property')
+        indexes = [
+            models.Index(fields=['owner', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.saved_search}: {self.property_id}"
+
+
+# Size(in degrees) of a side of cells of the finest area stats grid
+AREA_CELL_SIZE = 0.01
+
+# Zoom level => number of finest cells in a side of a cell of that level,
+# cells are about 111km, 11km and 1.1km wide near the equator
+AREA_ZOOM_LEVELS = {0: 100, 1: 10, 2: 1}
+
+# Prices are counted in log scale buckets, bucket `i` holds prices
+# from 10^(i/n) to 10^((i+1)/n) so percentiles are within about 6%
+PRICE_BUCKETS_PER_DECADE = 20
+
+COUNT = 'count'
+PRICE = 'price'
+PRICE_PER_SQM = 'price_per_sqm'
+
+AREA_STATS_METRICS = (
+    (COUNT, 'Count'),
+    (PRICE, 'Price'),
+    (PRICE_PER_SQM, 'Price per square meter'),
+)
+
+
+def price_bucket(price):
+    if price is None or price <= 0:
+        return None
+    return math.floor(math.log10(price) * PRICE_BUCKETS_PER_DECADE)
+
+
+class AreaStatsEntry(models.Model):
+    """Finest grid cell and price buckets a property is counted in"""
+    property = models.OneToOneField(
+        Property, primary_key=True, on_delete=models.CASCADE, related_name='area_stats_entry'
+    )
+    cell_x = models.IntegerField()
+    cell_y = models.IntegerField()
+    type = models.CharField(max_length=256)
+    available_for = models.CharField(max_length=5, choices=AVAILABILITY_CHOICES)
+    price_bucket = models.IntegerField(null=True)
+    price_per_sqm_bucket = models.IntegerField(null=True)
+
+    @classmethod
+    def for_property(cls, property):
+        """
+        Return an unsaved entry of `property` or `None` if it has no location.
+        """
+        location = property.location
+        if location is None or location.point is None:
+            return None
+
+        square_meters = getattr(property, 'square_meters', None)
+        if square_meters is None and property.type == LAND:
+            square_meters = Land.objects.filter(property_ptr_id=property.pk).values_list(
+                'square_meters', flat=True
+            ).first()
+
+        price = property.normalized_price
+        price_per_sqm = None
+        if price is not None and square_meters:
+            price_per_sqm = price / square_meters
+
+        return cls(
+            property_id=property.pk,
+            cell_x=math.floor(location.point.x / AREA_CELL_SIZE),
+            cell_y=math.floor(location.point.y / AREA_CELL_SIZE),
+            type=property.type,
+            available_for=property.available_for,
+            price_bucket=price_bucket(price),
+            price_per_sqm_bucket=price_bucket(price_per_sqm),
+        )
+
+    def key(self):
+        return (
+            self.cell_x, self.cell_y, self.type, self.available_for,
+            self.price_bucket, self.price_per_sqm_bucket
+        )
+
+    def buckets(self):
+        """
+        Return (metric, bucket) pairs this entry is counted in.
+        """
+        buckets = [(COUNT, 0)]
+        if self.price_bucket is not None:
+            buckets.append((PRICE, self.price_bucket))
+        if self.price_per_sqm_bucket is not None:
+            buckets.append((PRICE_PER_SQM, self.price_per_sqm_bucket))
+        return buckets
+
+
+class AreaPriceStats(models.Model):
+    """
+    Number of properties of a type and availability in a price bucket
+    of a grid cell, `COUNT` metric has a single bucket with all of them.
+    """
+    id = models.AutoField(primary_key=True)
+    zoom = models.PositiveSmallIntegerField()
+    cell_x = models.IntegerField()
+    cell_y = models.IntegerField()
+    type = models.CharField(max_length=256)
+    available_for = models.CharField(max_length=5, choices=AVAILABILITY_CHOICES)
+    metric = models.CharField(max_length=20, choices=AREA_STATS_METRICS)
+    bucket = models.IntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = (
+            'zoom', 'cell_x', 'cell_y', 'type', 'available_for', 'metric', 'bucket'
+        )
+
+    def __str__(self):
+        return f"{self.zoom}/{self.cell_x}/{self.cell_y} {self.type} {self.metric}"
+
+
+def change_area_stats(entry, sign, using='default'):
+    """
+    Add(sign=1) or subtract(sign=-1) `entry` to counts of cells
+    containing it at every zoom level.
+    """
+    table = AreaPriceStats._meta.db_table
+    rows = [
+        (
+            zoom, entry.cell_x // factor, entry.cell_y // factor,
+            entry.type, entry.available_for, metric, bucket, sign
+        )
+        for zoom, factor in AREA_ZOOM_LEVELS.items()
+        for metric, bucket in entry.buckets()
+    ]
+    with connections[using].cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {table} "
+            f"(zoom, cell_x, cell_y, type, available_for, metric, bucket, count) "
+            f"VALUES (%s, %s, %s, %s, %s, %s, %s, %s) "
+            f"ON CONFLICT (zoom, cell_x, cell_y, type, available_for, metric, bucket) "
+            f"DO UPDATE SET count = {table}.count + EXCLUDED.count",
+            rows
+        )
+
+    if sign < 0:
+        AreaPriceStats.objects.using(using).filter(
+            cell_x__in={row[1] for row in rows}, cell_y__in={row[2] for row in rows},
+            type=entry.type, available_for=entry.available_for, count__lte=0
+        ).delete()
+
+
+def update_area_stats(property, using='default'):
+    """
+    Move `property` to its current cell and price buckets in area stats.
+    """
+    with transaction.atomic(using=using):
+        # Updates of the same property(e.g through its location) wait for
+        # each other, so each one moves the entry the previous one saved
+        if not Property.objects.using(using).select_for_update().filter(pk=property.pk).exists():
+            return
+
+        old = AreaStatsEntry.objects.using(using).filter(property_id=property.pk).first()
+        new = AreaStatsEntry.for_property(property)
+        if old is not None and new is not None and old.key() == new.key():
+            return
+
+        # Counts are changed by receivers of entries
+        if old is not None:
+            old.delete(using=using)
+        if new is not None:
+            new.save(using=using, force_insert=True)
+
+
+@receiver(post_save, sender=AreaStatsEntry)
+def add_to_area_stats(sender, instance, created, using, **kwargs):
+    if created:
+        change_area_stats(instance, 1, using)
+
+
+@receiver(pre_delete, sender=AreaStatsEntry)
+def remove_from_area_stats(sender, instance, using, **kwargs):
+    # The row is deleted here so that only the transaction which actually
+    # deleted it(e.g of two deleting the same property) subtracts it,
+    # counted values are read from the row rather than the instance
+    columns = ['cell_x', 'cell_y', 'type', 'available_for', 'price_bucket', 'price_per_sqm_bucket']
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {AreaStatsEntry._meta.db_table} WHERE property_id = %s "
+            f"RETURNING {', '.join(columns)}",
+            [instance.pk]
+        )
+        row = cursor.fetchone()
+    if row is not None:
+        entry = AreaStatsEntry(property_id=instance.pk, **dict(zip(columns, row)))
+        change_area_stats(entry, -1, using)
+
+
+@receiver(post_save)
+def update_property_area_stats(sender, instance, raw, using, **kwargs):
+    # Subtypes of Property are senders of their own signals
+    if isinstance(instance, Property) and not raw:
+        update_area_stats(instance, using)
+
+
+@receiver(post_save)
+def update_property_vector(sender, instance, raw, **kwargs):
+    # Also properties saved by the admin or commands, run by workers once committed
+    if isinstance(instance, Property) and not raw:
+        from .tasks import update_property_vectors
+        update_property_vectors.delay([instance.pk])
+
+
+@receiver(post_save, sender=Location)
+def update_location_area_stats(sender, instance, raw, using, **kwargs):
+    if raw:
+        return
+    property = Property.objects.using(using).filter(location=instance).first()
+    if property is not None:
+        update_area_stats(property, using)
+
+
+class Region(models.Model):
+    """
+    Administrative area e.g a region, district or ward loaded from boundary
+    files(see `load_regions` command). Locations are linked to regions
+    containing them when they are saved, so that listing properties of a
+    region is an indexed lookup instead of a containment test.
+    """
+    id = models.AutoField(primary_key=True)
+    name = models.CharField(max_length=256)
+    level = models.CharField(max_length=50)
+    code = models.CharField(max_length=100)
+    parent = models.ForeignKey(
+        'self', blank=True, null=True, on_delete=models.SET_NULL, related_name='children'
+    )
+    boundary = models.MultiPolygonField(srid=4326)
+
+    class Meta:
+        unique_together = ('level', 'code')
+
+    def __str__(self):
+        return f"{self.name}({self.level})"
+
+
+def assign_regions(location, using='default'):
+    """
+    Link `location` to regions containing its point.
+    """
+    regions = Region.objects.using(using).none()
+    if location.point is not None:
+        regions = Region.objects.using(using).filter(boundary__intersects=location.point)
+    location.regions.set(list(regions.values_list('id', flat=True)))
+
+
+def assign_locations(region, using='default'):
+    """
+    Relink all locations within `region` with a single query,
+    return the number of linked locations.
+    """
+    field = Location._meta.get_field('regions')
+    through = field.remote_field.through._meta.db_table
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {through} WHERE {field.m2m_reverse_name()} = %s", [region.pk]
+        )
+        cursor.execute(
+            f"INSERT INTO {through} ({field.m2m_column_name()}, {field.m2m_reverse_name()}) "
+            f"SELECT l.id, r.id FROM {Region._meta.db_table} r "
+            f"JOIN {Location._meta.db_table} l ON ST_Intersects(r.boundary, l.point) "
+            f"WHERE r.id = %s",
+            [region.pk]
+        )
+        return cursor.rowcount
+
+
+@receiver(post_save, sender=Location)
+def assign_location_regions(sender, instance, raw, using, update_fields, **kwargs):
+    if raw or (update_fields is not None and 'point' not in update_fields):
+        return
+    assign_regions(instance, using)
+
+
+@receiver(post_save, sender=Region)
+def assign_region_locations(sender, instance, raw, using, **kwargs):
+    # Boundaries may have changed
+    if not raw:
+        assign_locations(instance, using)
+
+
+@receiver(post_delete, sender=PropertySignature)
+def leave_duplicates_cluster(sender, instance, using, **kwargs):
+    """
+    Give the cluster of a deleted property a new smallest id,
+    or dissolve it when a single property is left.
+    """
+    if instance.cluster is None:
+        return
+    signatures = PropertySignature.objects.using(using).filter(cluster=instance.cluster)
+    members = sorted(signatures.values_list('property_id', flat=True))
+    if len(members) == 1:
+        signatures.update(cluster=None)
+    elif members and instance.cluster == instance.property_id:
+        signatures.update(cluster=members[0])
+
+
+def record_changes(property_ids, action, using='default', point=None):
+    """
+    Add changes of properties with `property_ids` to the change log
+    in the current transaction.
+    """
+    PropertyChange.objects.using(using).bulk_create([
+        PropertyChange(
+            property_id=id, action=action, point=point,
+            transaction_id=CurrentTransactionId()
+        )
+        for id in property_ids
+    ])
+
+
+def record_queryset_changes(properties, action=UPDATED):
+    """
+    Add changes of `properties`(a queryset) to the change log in the
+    current transaction, for bulk updates which don't send signals.
+    """
+    query, params = properties.order_by().values('pk').query.sql_with_params()
+    with connections[properties.db].cursor() as cursor:
+        # Recent Django versions alias the selected column(`AS "pk"`),
+        # the alias list of the subquery names it whatever it is
+        cursor.execute(
+            f"INSERT INTO {PropertyChange._meta.db_table} "
+            f"(property_id, action, transaction_id, created_at) "
+            f"SELECT id, %s, txid_current(), now() FROM ({query}) AS properties (id)",
+            [action, *params]
+        )
+
+
+@receiver(post_save)
+def log_property_save(sender, instance, created, raw, using, **kwargs):
+    # Subtypes of Property are senders of their own signals
+    if isinstance(instance, Property) and not raw:
+        record_changes([instance.pk], CREATED if created else UPDATED, using)
+
+
+@receiver(pre_delete, sender=Property)
+def remember_property_point(sender, instance, using, **kwargs):
+    # The location may be deleted along with the property
+    instance._deleted_point = Location.objects.using(using).filter(
+        pk=instance.location_id
+    ).values_list('point', flat=True).first()
+
+
+@receiver(post_delete, sender=Property)
+def log_property_deletion(sender, instance, using, **kwargs):
+    # Deleting a subtype deletes its Property row too, so
+    # this is sent once for any type
+    point = getattr(instance, '_deleted_point', None)
+    record_changes([instance.pk], DELETED, using, point=point)
+
+
+@receiver([post_save, post_delete], sender=PropertyPicture)
+@receiver([post_save, post_delete], sender=Feature)
+@receiver([post_save, post_delete], sender=Room)
+def log_property_part_change(sender, instance, using, raw=False, **kwargs):
+    if not raw and instance.property_id is not None:
+        record_changes([instance.property_id], UPDATED, using)
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_save, sender=Contact)
+def log_property_detail_change(sender, instance, raw, using, **kwargs):
+    if raw:
+        return
+    field = 'location' if sender is Location else 'contact'
+    ids = Property.objects.using(using).filter(**{field: instance}).values_list('id', flat=True)
+    record_changes(list(ids), UPDATED, using)
+
+
+@receiver([post_save, pre_delete], sender=Amenity)
+@receiver([post_save, pre_delete], sender=Service)
+@receiver([post_save, pre_delete], sender=Potential)
+def log_shared_relation_change(sender, instance, using, created=False, raw=False, **kwargs):
+    """
+    Log changes of properties with a renamed or deleted amenity, service
+    or potential. Rows of the through table deleted with it don't send
+    m2m_changed so they are found before deletion.
+    """
+    if created or raw:
+        return
+    through = sender.properties.through
+    column = through._meta.get_field(sender._meta.model_name).column
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {PropertyChange._meta.db_table} "
+            f"(property_id, action, transaction_id, created_at) "
+            f"SELECT property_id, %s, txid_current(), now() "
+            f"FROM {through._meta.db_table} WHERE {column} = %s",
+            [UPDATED, instance.pk]
+        )
+
+
+@receiver(m2m_changed, sender=Property.amenities.through)
+@receiver(m2m_changed, sender=Property.services.through)
+@receiver(m2m_changed, sender=Property.potentials.through)
+def log_property_relations_change(sender, instance, action, reverse, pk_set, using, **kwargs):
+    if action in ('post_add', 'post_remove') and pk_set:
+        # pk_set contains ids of properties when reverse
+        record_changes(pk_set if reverse else [instance.pk], UPDATED, using)
+    elif action == 'post_clear' and not reverse:
+        record_changes([instance.pk], UPDATED, using)
+    elif action == 'pre_clear' and reverse:
+        # Properties losing an amenity, service or potential are found before clearing
+        ids = sender.objects.using(using).filter(
+            **{instance._meta.model_name: instance}
+        ).values_list('property_id', flat=True)
+        record_changes(list(ids), UPDATED, using)
+
+
+@receiver(post_init, sender=PropertyPicture)
+@receiver(post_init, sender=ProfilePicture)
+def remember_picture_file(sender, instance, **kwargs):
+    # Deferred files aren't loaded, uploads not saved yet have no stored name
+    src = instance.__dict__.get('src')
+    if isinstance(src, FieldFile):
+        src = src.name if src._committed else None
+    instance._stored_src = src if isinstance(src, str) else None
+
+
+@receiver(pre_save, sender=PropertyPicture)
+@receiver(pre_save, sender=ProfilePicture)
+def detect_picture_upload(sender, instance, **kwargs):
+    # Uploaded files are committed(and referenced) while saving
+    instance._src_uploaded = bool(instance.src) and not instance.src._committed
+
+
+@receiver(post_save, sender=PropertyPicture)
+@receiver(post_save, sender=ProfilePicture)
+def release_replaced_picture_file(sender, instance, using, **kwargs):
+    # Also drops the reference added by uploading the same file again
+    stored = getattr(instance, '_stored_src', None)
+    if stored and getattr(instance, '_src_uploaded', False):
+        release(stored, using)
+    instance._stored_src = instance.src.name
+
+
+@receiver(post_delete, sender=PropertyPicture)
+@receiver(post_delete, sender=ProfilePicture)
+def release_deleted_picture_file(sender, instance, using, **kwargs):
+    # Also sent for pictures deleted in bulk or with their property/owner
+    if instance.src:
+        # Removed by a worker once its last reference is deleted and committed
+        release(instance.src.name, using)
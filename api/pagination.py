@@ -0,0 +1,101 @@
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+
+
+def estimated_count(queryset, threshold=None):
+    """
+    Return the number of rows of `queryset` and whether it's approximate.
+    It's estimated by PostgreSQL from table statistics when the queryset
+    isn't filtered or from the query plan otherwise, results estimated to
+    have less than `threshold` rows are counted exactly.
+    """
+    if threshold is None:
+        threshold = settings.ESTIMATED_COUNT_THRESHOLD
+
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count(), False
+
+    queryset = queryset.order_by()
+    with connection.cursor() as cursor:
+        if not queryset.query.where and not queryset.query.distinct:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table]
+            )
+            estimate = cursor.fetchone()[0]
+        else:
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = plan[0]['Plan']['Plan Rows']
+
+    if estimate < threshold:
+        # Also covers tables which have never been analyzed(-1)
+        return queryset.count(), False
+    return int(estimate), True
+
+
+class EstimatedCountPage(Page):
+    def has_next(self):
+        if self.paginator.approximate:
+            # Only a full page may be followed by more rows
+            return len(self.object_list) == self.paginator.per_page
+        return super().has_next()
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator of large tables which doesn't run a COUNT(*) of all rows.
+    Pages after the last estimated page can be requested when the
+    count is approximate since there may be more rows.
+    """
+
+    @cached_property
+    def count(self):
+        count, self.approximate = estimated_count(self.object_list)
+        return count
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if not self.approximate or int(number) < 1:
+                raise
+            return int(number)
+
+    def _get_page(self, *args, **kwargs):
+        return EstimatedCountPage(*args, **kwargs)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.approximate:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(self.object_list[bottom:bottom + self.per_page], number, self)
+
+
+class EstimatedCountPagination(PageNumberPagination):
+    """
+    Page number pagination with estimated counts of large results,
+    `approximate_count` tells whether `count` is approximate.
+    """
+    django_paginator_class = EstimatedCountPaginator
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('approximate_count', self.page.paginator.approximate),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
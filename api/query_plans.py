@@ -0,0 +1,201 @@
+import json
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .models import Amenity, Service, Potential, Property, RoomType, User
+from . import views
+
+
+# Endpoint => (viewset, parameters sent with every request,
+# filter combinations specific to the endpoint)
+ENDPOINTS = {
+    'properties': (views.PropertyViewSet, {}, []),
+    'rooms': (
+        views.SingleRoomViewSet, {},
+        [{'rooms__type': 'ROOM_TYPE'}, {'rooms__count': 2}]
+    ),
+    'houses': (views.HouseViewSet, {}, [{'price_rate_unit': 'month'}]),
+    'apartments': (views.ApartmentViewSet, {}, [{'price_rate_unit': 'month'}]),
+    'lands': (
+        views.LandViewSet, {},
+        [{'square_meters__gt': 1000}, {'square_meters__lt': 500}]
+    ),
+    'frames': (views.FrameViewSet, {}, []),
+    'offices': (views.OfficeViewSet, {}, []),
+    'hostels': (views.HostelViewSet, {}, []),
+    'my-fav-properties': (views.FavouritePropertiesViewSet, {}, []),
+    'nearby-properties': (
+        views.NearbyPropertiesViewSet,
+        {'longitude': 39.2083, 'latitude': -6.7924, 'radius_to_scan': 2000},
+        []
+    ),
+}
+
+# Filter combinations checked on every endpoint, upper case
+# values are replaced with ids of existing objects
+FILTER_COMBINATIONS = [
+    {},
+    {'type': 'house'},
+    {'available_for': 'rent'},
+    {'available_for': 'sale', 'type': 'land'},
+    {'price__lt': 1000},
+    {'price__gt': 100, 'price__lt': 1000},
+    {'available_for': 'rent', 'normalized_price__range': '100,500'},
+    {'normalized_price__lt': 200, 'ordering': 'normalized_price'},
+    {'currency': 'USD'},
+    {'owner': 'OWNER'},
+    {'id__in': 'PROPERTY_IDS'},
+    {'post_date__gt': 'LAST_WEEK'},
+    {'available_for': 'rent', 'post_date__gt': 'LAST_WEEK'},
+    {'amenities__contains': 'AMENITIES'},
+    {'services__contains': 'SERVICES'},
+    {'potentials__contains': 'POTENTIALS'},
+    {'available_for': 'rent', 'amenities__contains': 'AMENITIES', 'price__lt': 1000},
+]
+
+
+def placeholders():
+    """
+    Return values of placeholders used in filter combinations.
+    """
+    property_ids = list(Property.objects.order_by('-id').values_list('id', flat=True)[:5])
+    owner = Property.objects.filter(owner__isnull=False).values_list('owner', flat=True).first()
+    return {
+        'OWNER': owner or 0,
+        'PROPERTY_IDS': ','.join(str(id) for id in property_ids) or '0',
+        'LAST_WEEK': (timezone.now() - timedelta(days=7)).isoformat(),
+        'AMENITIES': json.dumps(list(Amenity.objects.values_list('id', flat=True)[:2])),
+        'SERVICES': json.dumps(list(Service.objects.values_list('id', flat=True)[:1])),
+        'POTENTIALS': json.dumps(list(Potential.objects.values_list('id', flat=True)[:1])),
+        'ROOM_TYPE': RoomType.objects.values_list('id', flat=True).first() or 0,
+    }
+
+
+def resolve(params, values):
+    return {
+        key: values.get(value, value) if isinstance(value, str) else value
+        for key, value in params.items()
+    }
+
+
+def list_queryset(viewset, params, user):
+    """
+    Return the queryset of a page of `viewset` list filtered with `params`.
+    """
+    queryset = views.build_queryset(viewset, urlencode(params), user)
+    return queryset[:settings.REST_FRAMEWORK['PAGE_SIZE']]
+
+
+def unordered_sql(viewset, params, user):
+    """
+    Return the SQL of `viewset` list filtered with `params` without
+    ordering, which only differs by the filters applied.
+    """
+    queryset = views.build_queryset(viewset, urlencode(params), user).order_by()
+    sql, params = queryset.query.sql_with_params()
+    return sql, tuple(params)
+
+
+def explain(queryset):
+    """
+    Return the root node of the json plan of `queryset`.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def table_sizes(using='default'):
+    """
+    Return estimated number of rows of every table.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT relname, reltuples FROM pg_class "
+            "WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace"
+        )
+        return dict(cursor.fetchall())
+
+
+def check_plans(baseline=None, max_seq_scan_rows=10_000, max_cost_increase=20):
+    """
+    Explain list queries of every endpoint with every filter combination.
+
+    Return a result per query with its estimated cost, sequentially scanned
+    tables having more than `max_seq_scan_rows` rows and cost increase(in
+    percent) compared to `baseline` if it's more than `max_cost_increase`.
+    Combinations not changing the query of the unfiltered list are
+    marked as ignored, their filters aren't applied by the endpoint.
+    """
+    baseline = baseline or {}
+    values = placeholders()
+    sizes = table_sizes()
+    user = (
+        User.objects.filter(fav_properties__isnull=False).first() or
+        User.objects.first()
+    )
+
+    results = {}
+    for endpoint, (viewset, base_params, combinations) in ENDPOINTS.items():
+        unfiltered = unordered_sql(viewset, resolve(base_params, values), user)
+        for combination in FILTER_COMBINATIONS + combinations:
+            params = resolve({**base_params, **combination}, values)
+            name = f'{endpoint}?{urlencode(params)}' if params else endpoint
+            plan = explain(list_queryset(viewset, params, user))
+            ignored = bool(combination) and unordered_sql(viewset, params, user) == unfiltered
+
+            seq_scans = sorted({
+                node['Relation Name'] for node in plan_nodes(plan)
+                if node['Node Type'] == 'Seq Scan' and
+                sizes.get(node['Relation Name'], 0) > max_seq_scan_rows
+            })
+
+            cost = plan['Total Cost']
+            regression = None
+            previous = baseline.get(endpoint, {}).get(urlencode(combination))
+            if previous:
+                increase = (cost - previous) / previous * 100
+                if increase > max_cost_increase:
+                    regression = round(increase, 1)
+
+            results.setdefault(endpoint, {})[urlencode(combination)] = {
+                'name': name,
+                'cost': cost,
+                'seq_scans': seq_scans,
+                'regression': regression,
+                'ignored': ignored,
+            }
+    return results
+
+
+def failures(results):
+    return [
+        result
+        for combinations in results.values()
+        for result in combinations.values()
+        if result['seq_scans'] or result['regression'] is not None or result['ignored']
+    ]
+
+
+def costs(results):
+    """
+    Return a baseline made of estimated costs of `results`.
+    """
+    return {
+        endpoint: {key: result['cost'] for key, result in combinations.items()}
+        for endpoint, combinations in results.items()
+    }
@@ -0,0 +1,53 @@
+import msgpack
+import orjson
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+
+# Converts values json and msgpack can't encode the way DRF does
+encoder = JSONEncoder()
+
+# UTF-8 encoded U+2028 and U+2029
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """
+    JSON renderer encoding with orjson, its output is the same as
+    DRF's compact output except for floats written with an exponent
+    (below 1e-4 or from 1e16), e.g `1e16` instead of `1e+16`.
+    """
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            # Indented output is for humans, speed doesn't matter
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=encoder.default, option=self.options)
+        except orjson.JSONEncodeError:
+            # e.g integers over 64 bits, which the standard encoder handles
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escaped like DRF does, they are line terminators in javascript
+        return ret.replace(LINE_SEPARATOR, b'\\u2028').replace(PARAGRAPH_SEPARATOR, b'\\u2029')
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """
+    Renderer of MessagePack, a compact binary equivalent of JSON.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encoder.default, use_bin_type=True)
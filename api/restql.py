@@ -0,0 +1,152 @@
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django_restql.parser import QueryParser
+from rest_framework import serializers
+
+
+# Number of distinct restql query strings kept parsed by each worker
+PARSED_QUERIES_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=PARSED_QUERIES_CACHE_SIZE)
+def parse_query(raw_query):
+    """
+    Parse a restql query string, parsed queries are never
+    modified so they are shared by requests.
+    """
+    return QueryParser().parse(raw_query)
+
+
+def field_tree(serializer):
+    """
+    Return readable fields of `serializer` as a dict of
+    field name => (source, tree of nested fields or None, many).
+    Source is '*' for method fields and None for url fields.
+    """
+    tree = {}
+    for name, field in serializer.get_fields().items():
+        if field.write_only:
+            continue
+
+        source = field.source or name
+        if isinstance(field, serializers.HyperlinkedIdentityField):
+            source = None
+
+        many = isinstance(field, (serializers.ListSerializer, serializers.ManyRelatedField))
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        children = field_tree(nested) if isinstance(nested, serializers.BaseSerializer) else None
+        tree[name] = (source, children, many)
+    return tree
+
+
+@lru_cache(maxsize=None)
+def serializer_tree(serializer_class):
+    return field_tree(serializer_class())
+
+
+def selected_fields(query, tree):
+    """
+    Return fields of `tree` selected by `query`(a restql query as a dict)
+    as a dict of field name => nested query or True for whole fields.
+    """
+    included = {
+        name: value for name, value in query.items()
+        if value is not False and name != '*'
+    }
+    excluded = {name for name, value in query.items() if value is False}
+
+    if '*' in query or excluded:
+        selected = {name: True for name in tree if name not in excluded}
+        selected.update(included)
+        return selected
+    return included
+
+
+def attribute_dependencies(model, name, dependencies):
+    """
+    Return fields read by `name` attribute of `model` which
+    is not a field, or None if they are not known.
+    """
+    for klass, attributes in dependencies.items():
+        if issubclass(model, klass) and name in attributes:
+            return attributes[name]
+    return None
+
+
+def only_fields(model, tree, query, dependencies, selected_relations=(), prefix=''):
+    """
+    Return lookups of fields of `model` needed to serialize fields selected
+    by `query`, to be used with `QuerySet.only()`. Return None if they can't
+    be known i.e a selected attribute which isn't a field is not in
+    `dependencies`(a dict of model => {attribute: fields it reads}).
+
+    Nested fields are narrowed down only for relations in
+    `selected_relations`, other relations are loaded on access.
+    """
+    lookups = []
+    for name, subquery in selected_fields(query, tree).items():
+        if name not in tree:
+            # Unknown fields are reported by restql
+            continue
+
+        source, children, many = tree[name]
+        if source is None:
+            # Urls only need primary keys which are always loaded
+            continue
+
+        try:
+            field = model._meta.get_field(source) if source != '*' else None
+        except FieldDoesNotExist:
+            field = None
+
+        if field is None:
+            fields = attribute_dependencies(model, name if source == '*' else source, dependencies)
+            if fields is None:
+                return None
+            lookups.extend(prefix + field for field in fields)
+
+        elif field.many_to_many or field.one_to_many or not field.concrete:
+            # Loaded with prefetches or on access
+            continue
+
+        elif field.is_relation:
+            lookups.append(prefix + source)
+            relation = prefix + source
+            if relation in selected_relations and children and isinstance(subquery, dict):
+                nested = only_fields(
+                    field.related_model, children, subquery, dependencies,
+                    selected_relations, relation + '__'
+                )
+                if nested is None:
+                    return None
+                lookups.extend(nested)
+
+        else:
+            lookups.append(prefix + source)
+    return lookups
+
+
+def limited_prefetch(model, lookup, tree, query, dependencies):
+    """
+    Return a prefetch of `lookup` loading only fields of related
+    objects selected by `query`, or `lookup` if it can't be limited.
+    """
+    if not isinstance(lookup, str) or '__' in lookup or not isinstance(query, dict):
+        return lookup
+
+    try:
+        relation = model._meta.get_field(lookup)
+    except FieldDoesNotExist:
+        return lookup
+    if not (relation.many_to_many or relation.one_to_many) or not tree:
+        return lookup
+
+    fields = only_fields(relation.related_model, tree, query, dependencies)
+    if fields is None:
+        return lookup
+    if relation.one_to_many:
+        # Foreign key is used to attach related objects
+        fields.append(relation.field.name)
+    return Prefetch(lookup, queryset=relation.related_model.objects.only(*fields))
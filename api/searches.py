@@ -0,0 +1,123 @@
+from django.db.models import Q
+from django.http import QueryDict
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from .models import SavedSearch, Notification, DEFAULT_RADIUS_TO_SCAN
+from .geometry import radius_in_degrees
+
+
+# Saved searches can't scan a radius(in meters) larger than this
+MAX_RADIUS_TO_SCAN = 50_000
+
+
+def search_viewset(type):
+    """
+    Return the viewset whose filters are used by saved searches of `type`.
+    """
+    from . import views
+    return views.TYPE_VIEWSETS.get(type, views.PropertyViewSet)
+
+
+def search_queryset(search):
+    from . import views
+    return views.build_queryset(search_viewset(search.type), search.query, search.owner)
+
+
+def query_params(viewset):
+    """
+    Return names of query parameters filtering lists of `viewset`.
+    """
+    filters = {
+        field if lookup == 'exact' else f'{field}__{lookup}'
+        for field, lookups in viewset.filterset_fields.items()
+        for lookup in lookups
+    }
+    return filters | set(viewset.filter_params) | {'search'}
+
+
+def check_query(query, user):
+    """
+    Raise a validation error if `query` is not a valid saved search query.
+    """
+    from . import views
+
+    params = QueryDict(query)
+    # Misspelled filters would be ignored and match any property
+    unknown = set(params) - query_params(search_viewset(params.get('type')))
+    if unknown:
+        raise serializers.ValidationError(f'Unknown filters: {", ".join(sorted(unknown))}')
+
+    radius = params.get('radius_to_scan', DEFAULT_RADIUS_TO_SCAN)
+    try:
+        if float(radius) > MAX_RADIUS_TO_SCAN:
+            raise serializers.ValidationError(
+                f'radius_to_scan must not be greater than {MAX_RADIUS_TO_SCAN}'
+            )
+        queryset = views.build_queryset(search_viewset(params.get('type')), query, user)
+        # Compile the query to catch invalid lookups
+        str(queryset.query)
+    except ValidationError as error:
+        raise serializers.ValidationError(error.detail)
+    except (ValueError, TypeError) as error:
+        raise serializers.ValidationError(str(error))
+
+
+def candidate_searches(property):
+    """
+    Return saved searches which may match `property`, they are found with
+    indexes on type, availability, centre and area of searches and with
+    price bounds. Searches filtering neither by location nor by price
+    are candidates of every property of their type and availability.
+    """
+    searches = SavedSearch.objects.filter(
+        Q(type__isnull=True) | Q(type=property.type),
+        Q(available_for__isnull=True) | Q(available_for=property.available_for),
+    )
+
+    price = property.normalized_price
+    if price is None:
+        searches = searches.filter(min_price__isnull=True, max_price__isnull=True)
+    else:
+        searches = searches.filter(
+            Q(min_price__isnull=True) | Q(min_price__lte=price),
+            Q(max_price__isnull=True) | Q(max_price__gte=price),
+        )
+
+    location = property.location
+    anywhere = Q(centre__isnull=True, area__isnull=True)
+    if location is None:
+        return searches.filter(anywhere)
+
+    degrees = radius_in_degrees(location.point, MAX_RADIUS_TO_SCAN)
+    return searches.filter(
+        anywhere |
+        Q(centre__dwithin=(location.point, degrees)) |
+        Q(area__intersects=location.point)
+    )
+
+
+def match_saved_searches(property):
+    """
+    Notify owners of saved searches matching `property`.
+    """
+    searches = candidate_searches(property).select_related('owner')
+    if property.owner_id is not None:
+        searches = searches.exclude(owner_id=property.owner_id)
+
+    notifications = []
+    for search in searches:
+        # Candidates are checked with all filters of their query
+        try:
+            matches = search_queryset(search).filter(id=property.id).exists()
+        except (ValidationError, ValueError, TypeError):
+            continue
+
+        if matches:
+            notifications.append(
+                Notification(owner=search.owner, saved_search=search, property_id=property.id)
+            )
+
+    # Properties already notified to a search are skipped
+    Notification.objects.bulk_create(notifications, ignore_conflicts=True)
+    return notifications
@@ -8,8 +8,18 @@ from django_restql.serializers import NestedModelSerializer
 from .models import (
     Location, Contact, Service, Potential, Property, Feature,
     PropertyPicture, SingleRoom, House, Apartment, Hostel, Frame, Land,
-    Office, Amenity, User, ProfilePicture, RoomType, Room
+    Office, Amenity, User, ProfilePicture, RoomType, Room, SavedSearch,
+    Notification, Region, AVAILABILITY_CHOICES, AREA_ZOOM_LEVELS,
+    DEFAULT_RADIUS_TO_SCAN
 )
+from .searches import check_query
+from .area_stats import heatmap_size, MAX_HEATMAP_CELLS
+from .geometry import parse_polygon, simplify_polygon
+from .changes import parse_cursor, MAX_CHANGES
+
+
+# Nearby searches can't have more origins than this
+MAX_NEARBY_ORIGINS = 10
 
 
 class ProfilePictureSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
@@ -86,6 +96,12 @@ class ContactSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
         fields = ('id', 'url', 'name', 'email', 'phone')
 
 
+class RegionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Region
+        fields = ('id', 'url', 'name', 'level', 'code', 'parent')
+
+
 class AmenitySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Amenity
@@ -144,10 +160,12 @@ class PropertySerializer(DynamicFieldsMixin, NestedModelSerializer):
     )
     owner = UserSerializer(many=False, read_only=True, exclude=['fav_properties'])
     is_my_favourite = serializers.SerializerMethodField()
+    views_count = serializers.SerializerMethodField()
     type = serializers.CharField(read_only=True)
 
     # This is used when retrieving nearby properties
     distance = serializers.CharField(default=None)
+    nearest_origin = serializers.SerializerMethodField()
 
     class Meta:
         model = Property
@@ -156,7 +174,8 @@ class PropertySerializer(DynamicFieldsMixin, NestedModelSerializer):
             'price_rate_unit', 'payment_terms', 'is_price_negotiable', 'rating',
             'currency', 'descriptions', 'location', 'owner', 'amenities',
             'services', 'potentials', 'pictures', 'other_features', 'contact',
-            'post_date', 'is_my_favourite', 'distance'
+            'post_date', 'is_my_favourite', 'distance', 'nearest_origin',
+            'normalized_price', 'favourites_count', 'views_count'
         )
         
     def get_is_my_favourite(self, obj):
@@ -167,6 +186,22 @@ class PropertySerializer(DynamicFieldsMixin, NestedModelSerializer):
             return user.fav_properties.all().filter(id=obj.id).exists()
         return False
 
+    def get_nearest_origin(self, obj):
+        """Index of the nearest origin of searches around several origins"""
+        return getattr(obj, 'nearest_origin', None)
+
+    def get_views_count(self, obj):
+        """Views are only shown to the owner of the property"""
+        request = self.context.get('request')
+        user = request.user
+
+        if not user.is_authenticated or obj.owner_id != user.id:
+            return None
+        try:
+            return obj.views.count
+        except ObjectDoesNotExist:
+            return 0
+
     def create(self, validated_data):
         """function for creating a property """
         request = self.context.get('request')
@@ -252,7 +287,147 @@ class HostelSerializer(PropertySerializer):
     Meta.fields = PropertySerializer.Meta.fields + Meta.fields
 
 
+class SavedSearchSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = SavedSearch
+        fields = (
+            'id', 'url', 'name', 'query', 'type', 'available_for',
+            'created_at'
+        )
+
+    def validate_query(self, value):
+        request = self.context.get('request')
+        check_query(value, request.user)
+        return value
+
+    def create(self, validated_data):
+        """function for creating a saved search """
+        request = self.context.get('request')
+        user = request.user
+
+        validated_data.update({"owner": user})
+        return super().create(validated_data)
+
+
+class NotificationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Notification
+        fields = (
+            'id', 'url', 'saved_search', 'property', 'is_read', 'created_at'
+        )
+        read_only_fields = (
+            'saved_search', 'property'
+        )
+
+
+class FavouritesSerializer(serializers.Serializer):
+    properties = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=100
+    )
+
+
+class SimilarPropertiesSerializer(serializers.Serializer):
+    k = serializers.IntegerField(default=10, min_value=1, max_value=50)
+
+
+class AreaStatsSerializer(serializers.Serializer):
+    zoom = serializers.ChoiceField(choices=list(AREA_ZOOM_LEVELS), default=max(AREA_ZOOM_LEVELS))
+    type = serializers.CharField(required=False)
+    available_for = serializers.ChoiceField(choices=AVAILABILITY_CHOICES, required=False)
+
+    def filters(self):
+        return {
+            key: self.validated_data[key]
+            for key in ('type', 'available_for') if key in self.validated_data
+        }
+
+
+class CellStatsSerializer(AreaStatsSerializer):
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+
+
+class HeatmapSerializer(AreaStatsSerializer):
+    west = serializers.FloatField(min_value=-180, max_value=180)
+    south = serializers.FloatField(min_value=-90, max_value=90)
+    east = serializers.FloatField(min_value=-180, max_value=180)
+    north = serializers.FloatField(min_value=-90, max_value=90)
+
+    def validate(self, data):
+        if data['west'] > data['east'] or data['south'] > data['north']:
+            raise serializers.ValidationError('west and south must be less than east and north')
+
+        size = heatmap_size(data['west'], data['south'], data['east'], data['north'], data['zoom'])
+        if size > MAX_HEATMAP_CELLS:
+            raise serializers.ValidationError(
+                f'Bounds have {size} cells at zoom {data["zoom"]}, at most '
+                f'{MAX_HEATMAP_CELLS} are allowed, use a lower zoom'
+            )
+        return data
+
+
+class RegionFilterSerializer(serializers.Serializer):
+    region = serializers.IntegerField(min_value=1)
+
+
+class RegionCountsSerializer(serializers.Serializer):
+    level = serializers.CharField()
+
+
+class PolygonSearchSerializer(serializers.Serializer):
+    polygon = serializers.CharField()
+
+    def validate_polygon(self, value):
+        try:
+            return simplify_polygon(parse_polygon(value))
+        except ValueError as error:
+            raise serializers.ValidationError(str(error))
+
+
 class NearbyLocationSerializer(serializers.Serializer):
     longitude = serializers.FloatField(required=True)
     latitude = serializers.FloatField(required=True)
     radius_to_scan = serializers.FloatField(required=True)
+
+
+class NearbyOriginSerializer(serializers.Serializer):
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    radius_to_scan = serializers.FloatField(min_value=0, default=DEFAULT_RADIUS_TO_SCAN)
+
+
+class NearbyOriginsSerializer(serializers.Serializer):
+    origins = serializers.ListField(
+        child=NearbyOriginSerializer(),
+        allow_empty=False,
+        max_length=MAX_NEARBY_ORIGINS
+    )
+
+
+class ChangesSerializer(serializers.Serializer):
+    since = serializers.CharField(required=False)
+    limit = serializers.IntegerField(default=100, min_value=1, max_value=MAX_CHANGES)
+
+    def validate_since(self, value):
+        try:
+            return parse_cursor(value)
+        except ValueError:
+            raise serializers.ValidationError('Invalid cursor, use one returned by the feed')
+
+
+class LiveSubscriptionSerializer(serializers.Serializer):
+    west = serializers.FloatField(min_value=-180, max_value=180)
+    south = serializers.FloatField(min_value=-90, max_value=90)
+    east = serializers.FloatField(min_value=-180, max_value=180)
+    north = serializers.FloatField(min_value=-90, max_value=90)
+    type = serializers.CharField(required=False)
+    available_for = serializers.ChoiceField(choices=AVAILABILITY_CHOICES, required=False)
+    normalized_price__gt = serializers.FloatField(required=False)
+    normalized_price__lt = serializers.FloatField(required=False)
+
+    def validate(self, data):
+        if data['west'] > data['east'] or data['south'] > data['north']:
+            raise serializers.ValidationError('west and south must be less than east and north')
+        return data
@@ -0,0 +1,277 @@
+import math
+import time
+import threading
+from datetime import datetime
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    Property, PropertyChange, PropertyVector, Room, DELETED, ROOM, HOUSE, APARTMENT, LAND, FRAME,
+    OFFICE, HOSTEL, SALE, RENT
+)
+
+
+TYPES = [ROOM, HOUSE, APARTMENT, LAND, FRAME, OFFICE, HOSTEL]
+AVAILABILITIES = [SALE, RENT]
+
+# Number of buckets room types, amenities, services and potentials
+# ids are hashed into, so that vectors have a fixed size
+ROOM_BUCKETS = 12
+AMENITY_BUCKETS = 32
+SERVICE_BUCKETS = 16
+POTENTIAL_BUCKETS = 16
+
+# Weight of each feature in distances between vectors
+PRICE_WEIGHT = 2.0          # per factor of 10 in price
+LOCATION_WEIGHT = 6371 / 20 # Earth radius in kms / 20 kms
+TYPE_WEIGHT = 2.0
+AVAILABILITY_WEIGHT = 3.0
+ROOM_WEIGHT = 0.5           # per room
+AMENITY_WEIGHT = 0.3
+SERVICE_WEIGHT = 0.3
+POTENTIAL_WEIGHT = 0.3
+
+PRICE = 0
+LOCATION = slice(1, 4)
+TYPE = 4
+AVAILABILITY = TYPE + len(TYPES)
+ROOMS = AVAILABILITY + len(AVAILABILITIES)
+AMENITIES = ROOMS + ROOM_BUCKETS
+SERVICES = AMENITIES + AMENITY_BUCKETS
+POTENTIALS = SERVICES + SERVICE_BUCKETS
+DIMENSIONS = POTENTIALS + POTENTIAL_BUCKETS
+
+# Number of properties whose vectors are recomputed and saved together
+UPDATE_BATCH_SIZE = 1000
+
+
+def compute_vectors(ids):
+    """
+    Return feature vectors of properties with `ids` as a
+    dict of property id => vector.
+    """
+    rows = Property.objects.filter(id__in=ids).values_list(
+        'id', 'type', 'available_for', 'price', 'normalized_price', 'location__point'
+    )
+
+    vectors = {}
+    for id, type, available_for, price, normalized_price, point in rows:
+        vector = np.zeros(DIMENSIONS, dtype=np.float32)
+
+        price = normalized_price if normalized_price is not None else price
+        vector[PRICE] = PRICE_WEIGHT * math.log10(1 + max(price or 0, 0))
+
+        if point is not None:
+            # Point on a unit sphere, distances between them are
+            # proportional to distances on Earth for nearby points
+            longitude, latitude = math.radians(point.x), math.radians(point.y)
+            vector[LOCATION] = LOCATION_WEIGHT * np.array([
+                math.cos(latitude) * math.cos(longitude),
+                math.cos(latitude) * math.sin(longitude),
+                math.sin(latitude)
+            ])
+
+        if type in TYPES:
+            vector[TYPE + TYPES.index(type)] = TYPE_WEIGHT
+        if available_for in AVAILABILITIES:
+            vector[AVAILABILITY + AVAILABILITIES.index(available_for)] = AVAILABILITY_WEIGHT
+        vectors[id] = vector
+
+    ids = list(vectors)
+    rooms = Room.objects.filter(property_id__in=ids).values_list('property_id', 'type_id', 'count')
+    for id, type_id, count in rooms:
+        vectors[id][ROOMS + type_id % ROOM_BUCKETS] += ROOM_WEIGHT * count
+
+    relations = [
+        ('amenities', AMENITIES, AMENITY_BUCKETS, AMENITY_WEIGHT),
+        ('services', SERVICES, SERVICE_BUCKETS, SERVICE_WEIGHT),
+        ('potentials', POTENTIALS, POTENTIAL_BUCKETS, POTENTIAL_WEIGHT),
+    ]
+    for name, start, buckets, weight in relations:
+        field = Property._meta.get_field(name)
+        through = field.remote_field.through
+        pairs = through.objects.filter(property_id__in=ids).values_list(
+            f'{field.m2m_field_name()}_id', f'{field.m2m_reverse_field_name()}_id'
+        )
+        for id, related_id in pairs:
+            vectors[id][start + related_id % buckets] = weight
+
+    return vectors
+
+
+def save_vectors(vectors):
+    """
+    Save `vectors` so that every worker picks them when syncing.
+    """
+    with transaction.atomic():
+        PropertyVector.objects.filter(property_id__in=list(vectors)).delete()
+        PropertyVector.objects.bulk_create([
+            PropertyVector(property_id=id, vector=vector.tobytes())
+            for id, vector in vectors.items()
+        ])
+
+
+class SimilarityIndex():
+    """
+    In memory matrix of property feature vectors. It's loaded from the
+    snapshot built by `build_similarity_index` command and kept up to date
+    with vectors saved after the snapshot.
+    """
+
+    def __init__(self):
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.vectors = np.zeros((0, DIMENSIONS), dtype=np.float32)
+        self.norms = np.zeros(0, dtype=np.float32)
+        self.positions = {}
+        # Ids of deleted properties left in the matrix
+        self.removed = set()
+        self.synced_at = None
+        self.checked_at = 0
+        self.lock = threading.Lock()
+
+    def load(self, path):
+        try:
+            snapshot = np.load(path)
+        except FileNotFoundError:
+            return False
+
+        if snapshot['vectors'].shape[1] != DIMENSIONS:
+            # Snapshot built with other features
+            return False
+
+        self.set(snapshot['ids'], snapshot['vectors'])
+        self.synced_at = datetime.fromisoformat(str(snapshot['built_at']))
+        return True
+
+    def save(self, path, built_at):
+        np.savez(path, ids=self.ids, vectors=self.vectors, built_at=built_at.isoformat())
+
+    def set(self, ids, vectors):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, DIMENSIONS)
+        self.norms = np.einsum('ij,ij->i', self.vectors, self.vectors)
+        self.positions = {id: position for position, id in enumerate(self.ids.tolist())}
+        self.remove(list(self.removed))
+
+    def update(self, vectors):
+        """
+        Add or replace `vectors`(a dict of property id => vector).
+        """
+        new_ids, new_vectors = [], []
+        for id, vector in vectors.items():
+            position = self.positions.get(id)
+            if position is None:
+                new_ids.append(id)
+                new_vectors.append(vector)
+            else:
+                self.vectors[position] = vector
+                self.norms[position] = vector @ vector
+
+        if new_ids:
+            self.set(
+                np.concatenate([self.ids, new_ids]),
+                np.vstack([self.vectors] + new_vectors)
+            )
+
+    def remove(self, ids):
+        """
+        Leave properties with `ids` out of results, their vectors are
+        dropped with the next snapshot.
+        """
+        for id in ids:
+            self.removed.add(id)
+            position = self.positions.get(id)
+            if position is not None:
+                self.norms[position] = np.inf
+
+    def sync(self):
+        """
+        Load vectors saved and drop properties deleted since the last
+        sync, at most once every SIMILARITY_SYNC_INTERVAL seconds.
+        """
+        now = time.monotonic()
+        if now - self.checked_at < settings.SIMILARITY_SYNC_INTERVAL:
+            return
+
+        with self.lock:
+            if self.synced_at is None:
+                self.load(settings.SIMILARITY_INDEX_PATH)
+
+            vectors = PropertyVector.objects.all()
+            # Vectors are deleted with their property, tombstones of the
+            # change log tell which ones are gone
+            deleted = PropertyChange.objects.none()
+            if self.synced_at is not None:
+                vectors = vectors.filter(updated_at__gte=self.synced_at)
+                deleted = PropertyChange.objects.filter(
+                    action=DELETED, created_at__gte=self.synced_at
+                )
+
+            synced_at = timezone.now()
+            self.update({
+                id: np.frombuffer(vector, dtype=np.float32)
+                for id, vector in vectors.values_list('property_id', 'vector').iterator()
+            })
+            self.remove(deleted.values_list('property_id', flat=True))
+            self.synced_at = synced_at
+            self.checked_at = now
+
+    def vector(self, id):
+        with self.lock:
+            position = self.positions.get(id)
+            if position is None or not np.isfinite(self.norms[position]):
+                return None
+            return self.vectors[position].copy()
+
+    def most_similar(self, vector, k, exclude=()):
+        """
+        Return ids of `k` properties closest to `vector`.
+        """
+        with self.lock:
+            return self._most_similar(vector, k, exclude)
+
+    def _most_similar(self, vector, k, exclude):
+        if not len(self.ids):
+            return []
+
+        # Squared euclidean distance without the constant |vector|^2
+        distances = self.norms - 2 * (self.vectors @ vector)
+        for id in exclude:
+            position = self.positions.get(id)
+            if position is not None:
+                distances[position] = np.inf
+
+        k = min(k, len(self.ids))
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest])]
+        return [int(self.ids[position]) for position in nearest if np.isfinite(distances[position])]
+
+
+index = SimilarityIndex()
+
+
+def update_vectors(ids):
+    """
+    Recompute vectors of properties with `ids` after they have been
+    saved, properties deleted since are skipped.
+    """
+    ids = list(ids)
+    for start in range(0, len(ids), UPDATE_BATCH_SIZE):
+        vectors = compute_vectors(ids[start:start + UPDATE_BATCH_SIZE])
+        save_vectors(vectors)
+        with index.lock:
+            index.update(vectors)
+
+
+def similar_properties(property, k):
+    """
+    Return ids of `k` properties most similar to `property`.
+    """
+    index.sync()
+    vector = index.vector(property.pk)
+    if vector is None:
+        vector = compute_vectors([property.pk])[property.pk]
+    return index.most_similar(vector, k, exclude=[property.pk])
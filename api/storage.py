@@ -0,0 +1,120 @@
+import os
+import hashlib
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import connections, transaction
+from django.utils.deconstruct import deconstructible
+
+
+# Levels of subdirectories named after the first bytes of digests, so
+# that directories stay small with millions of files
+SHARD_DEPTH = 2
+
+# Longest extension kept from uploaded names, names must fit in 100 characters
+MAX_EXTENSION_LENGTH = 5
+
+CHUNK_SIZE = 64 * 1024
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hashed_name(name, digest):
+    """
+    Return the name of a file with `digest` uploaded as `name`, e.g
+    `property_photos/3f/a2/3fa2...e1.jpg` for `property_photos/12.JPG`
+    """
+    directory, basename = posixpath.split(name.replace('\\', '/'))
+    extension = os.path.splitext(basename)[1].lower()
+    if len(extension) > MAX_EXTENSION_LENGTH or not extension[1:].isalnum():
+        extension = ''
+    shards = [digest[i * 2:i * 2 + 2] for i in range(SHARD_DEPTH)]
+    return posixpath.join(directory, *shards, digest + extension)
+
+
+def reference(name, using='default'):
+    """
+    Count a new reference to stored file `name`. The row is locked until
+    the transaction ends, so the file can't be deleted meanwhile.
+    """
+    from .models import StoredFile
+
+    table = StoredFile._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (name, reference_count, created_at) VALUES (%s, 1, now()) "
+            f"ON CONFLICT (name) DO UPDATE SET reference_count = {table}.reference_count + 1",
+            [name]
+        )
+
+
+def release(name, using='default'):
+    """
+    Remove a reference to stored file `name`, the file is deleted by a
+    worker once the last reference is gone and the transaction commits.
+    """
+    from .models import StoredFile
+    from .tasks import delete_media_files, delete_unreferenced_files
+
+    table = StoredFile._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET reference_count = reference_count - 1 "
+            f"WHERE name = %s RETURNING reference_count",
+            [name]
+        )
+        row = cursor.fetchone()
+
+    if row is None:
+        # Stored before files were counted, it's not shared
+        delete_media_files.delay([name])
+    elif row[0] <= 0:
+        delete_unreferenced_files.delay([name])
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage naming files after the sha256 digest of their
+    content in sharded subdirectories of the directory they are uploaded
+    to. Identical uploads are stored once and references to each file are
+    counted in StoredFile table, only the directory and extension of
+    names given by `upload_to` are kept.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = hashed_name(name, content_hash(content))
+
+        with transaction.atomic():
+            # Waits for a worker deleting the same file, which is then written again
+            reference(name)
+            if self.exists(name):
+                return name
+            return super().save(name, content, max_length=max_length)
+
+    def delete_unreferenced(self, name):
+        """
+        Delete file `name` if nothing references it anymore,
+        return whether it was deleted.
+        """
+        from .models import StoredFile
+
+        with transaction.atomic():
+            deleted, _ = StoredFile.objects.filter(name=name, reference_count__lte=0).delete()
+            if deleted:
+                # Before committing so that a new reference finds no file and writes it
+                self.delete(name)
+        return bool(deleted)
+
+
+picture_storage = ContentAddressedStorage()
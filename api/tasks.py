@@ -0,0 +1,78 @@
+import os
+
+from django.conf import settings
+from django.core.management import call_command
+
+from .jobs import task
+from .models import Property, stripped_iexact
+from .searches import match_saved_searches
+from .similarity import update_vectors
+from .duplicates import update_duplicates
+from .storage import picture_storage
+
+
+# Commands rebuilding read models which can be run as jobs
+REBUILD_COMMANDS = {
+    'build_similarity_index', 'compact_changes', 'detect_duplicates',
+    'rebuild_area_stats', 'update_favourites_counts', 'update_normalized_prices',
+}
+
+
+@task(queue='properties', priority=10)
+def update_saved_property(property_id):
+    """
+    Update duplicate clusters of a created or updated property
+    and notify owners of saved searches matching it.
+    """
+    property = Property.objects.select_related('location').filter(pk=property_id).first()
+    if property is None:
+        # Deleted since
+        return
+    update_duplicates(property)
+    match_saved_searches(property)
+
+
+@task(queue='properties', priority=10)
+def update_property_vectors(property_ids):
+    """
+    Recompute similarity vectors of saved properties, however they were saved.
+    """
+    update_vectors(property_ids)
+
+
+@task(queue='properties', priority=-10)
+def update_currency_vectors(currency):
+    """
+    Recompute similarity vectors of properties priced in `currency`
+    after its exchange rate changed.
+    """
+    properties = Property.objects.filter(stripped_iexact('currency', currency))
+    update_vectors(properties.values_list('id', flat=True).iterator())
+
+
+@task(queue='files')
+def delete_media_files(names):
+    """
+    Delete files of deleted objects, `names` are relative to MEDIA_ROOT.
+    """
+    for name in names:
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        if os.path.isfile(path):
+            os.remove(path)
+
+
+@task(queue='files')
+def delete_unreferenced_files(names):
+    """
+    Delete stored pictures which lost their last reference, unless they
+    were uploaded again since.
+    """
+    for name in names:
+        picture_storage.delete_unreferenced(name)
+
+
+@task(queue='rebuilds', priority=-10, max_attempts=1)
+def rebuild(command, *args):
+    if command not in REBUILD_COMMANDS:
+        raise ValueError(f'{command} is not a rebuild command')
+    call_command(command, *args)
@@ -1,3 +1,1372 @@
-from django.test import TestCase
+import os
+import json
+import math
+import uuid
+import tempfile
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from urllib.parse import urlencode
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.gis.geos import MultiPolygon, Point, Polygon
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.http import Http404
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from django.utils.translation import gettext_lazy
+import msgpack
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer as DRFJSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from . import (
+    area_stats, duplicates, jobs, live, media, query_plans, restql, similarity, tasks, view_counts
+)
+from .db_routers import replica_pool
+from .models import (
+    Amenity, AreaPriceStats, AreaStatsEntry, Contact, ExchangeRate, Feature, Land, Location,
+    ProfilePicture, Property, Job, PropertyPicture, PropertySignature, PropertyVector,
+    PropertyViewCount, Region, SavedSearch, Service, StoredFile, User, assign_locations,
+    price_bucket, update_area_stats,
+    RENT, SALE, QUEUED, RUNNING, FAILED
+)
+from .geometry import MAX_INPUT_POINTS, MAX_POLYGON_POINTS, parse_polygon, simplify_polygon
+from .searches import candidate_searches, check_query, match_saved_searches
+from .parsers import MessagePackParser
+from .renderers import JSONRenderer, MessagePackRenderer
+from .serializers import MAX_NEARBY_ORIGINS, ContactSerializer, PropertySerializer
+from .storage import picture_storage
+
+
+REPLICA = 'replica_1'
+
+
+def create_property(using='default', **kwargs):
+    location = Location.objects.using(using).create(address='Kinondoni')
+    return Property.objects.using(using).create(**{
+        'available_for': RENT, 'price': 100, 'currency': 'USD',
+        'location': location, **kwargs
+    })
+
+
+@skipUnless(
+    REPLICA in settings.DATABASES,
+    "Set DB_REPLICA_URLS to a second local database to run replica tests"
+)
+class ReadReplicaTests(TestCase):
+    """
+    Primary and replica are two separate test databases, so a row
+    created on the replica only is visible iff reads went to the replica.
+    """
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        replica_pool.health.clear()
+        self.user = User.objects.create_user('john', password='secret')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.user.auth_token.key}')
+        self.property = create_property(using=REPLICA)
+
+    def test_safe_requests_read_from_replica(self):
+        response = self.client.get('/properties/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['id'], self.property.id)
+
+    def test_writes_go_to_primary(self):
+        response = self.client.patch(f'/users/{self.user.id}/', {'full_name': 'John Doe'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(User.objects.using('default').get(id=self.user.id).full_name, 'John Doe')
+        self.assertFalse(User.objects.using(REPLICA).filter(id=self.user.id).exists())
+
+    def test_writer_is_pinned_to_primary(self):
+        self.client.patch(f'/users/{self.user.id}/', {'full_name': 'John Doe'})
+
+        response = self.client.get('/properties/')
+        self.assertEqual(response.data['count'], 0)
+
+        # Other clients still read from replica
+        response = APIClient().get('/properties/')
+        self.assertEqual(response.data['count'], 1)
+
+    @override_settings(REPLICA_HEALTH_CHECK_INTERVAL=3600)
+    def test_unhealthy_replica_is_skipped(self):
+        replica_pool.mark_unhealthy(REPLICA)
+        response = APIClient().get('/properties/')
+        self.assertEqual(response.data['count'], 0)
+
+
+class QueryPlanTests(TestCase):
+    """
+    List queries of every endpoint with every filter combination
+    must be index backed on a seeded database.
+    """
+    baseline = 'query_plan_baseline.json'
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_benchmark', properties=20_000, users=200,
+            batch_size=5_000, stdout=StringIO()
+        )
+
+    def test_query_plans(self):
+        baseline = None
+        if os.path.exists(self.baseline):
+            with open(self.baseline) as f:
+                baseline = json.load(f)
+
+        results = query_plans.check_plans(baseline=baseline, max_seq_scan_rows=5_000)
+        failures = [
+            f"{failure['name']}: seq scans {failure['seq_scans']}, "
+            f"cost increase {failure['regression']}%, "
+            f"filters ignored {failure['ignored']}"
+            for failure in query_plans.failures(results)
+        ]
+        self.assertEqual(failures, [])
+
+
+class DatabaseRenderedListTests(TestCase):
+    """
+    Property list pages rendered by the database must be
+    identical to pages rendered by the serializer.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user('owner', password='secret', full_name='Owner')
+        ProfilePicture.objects.create(owner=owner, src='profile_pictures/owner.jpg')
+        other = User.objects.create_user('other', password='secret')
+        amenities = [Amenity.objects.create(name=name) for name in ('Wifi', 'Parking', 'Gym')]
+        service = Service.objects.create(name='Cleaning')
+
+        for index, user in enumerate([owner, other, None]):
+            property = create_property(owner=user, descriptions=f'Property {index}')
+            property.location.point = Point(39.2083 + index / 1000, -6.7924, srid=4326)
+            property.location.save()
+            property.amenities.set(amenities[:index + 1])
+            property.services.add(service)
+            PropertyPicture.objects.create(
+                property=property, is_main=True, src=f'property_photos/{index}.jpg'
+            )
+            Feature.objects.create(property=property, name='Floor', value=str(index))
+
+        property.contact = Contact.objects.create(
+            name='Agent', email='agent@example.com', phone='+255700000000'
+        )
+        property.save()
+
+    def get(self, url, rendered_in_db):
+        with override_settings(DB_RENDERED_LISTS=rendered_in_db):
+            response = APIClient().get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_pages_match_serializer_output(self):
+        for url in ['/properties/', '/properties/?ordering=-post_date', '/trending-properties/']:
+            with self.subTest(url=url):
+                rendered = self.get(url, True)
+                serialized = self.get(url, False)
+                self.assertEqual(json.loads(rendered.content), json.loads(serialized.content))
+
+    def test_pages_are_rendered_in_db(self):
+        self.assertNotIsInstance(self.get('/properties/', True), Response)
+        self.assertIsInstance(self.get('/properties/', False), Response)
+
+
+@override_settings(DB_RENDERED_LISTS=False)
+class RestqlQueryTests(TestCase):
+    """
+    Lists filtered by a restql query load only columns and relations of
+    selected fields, without queries per property compared to full lists.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user('owner', password='secret')
+        amenity = Amenity.objects.create(name='Wifi')
+        cls.ids = []
+        for index in range(3):
+            property = create_property(owner=owner, descriptions=f'Property {index}')
+            property.location.point = Point(39.2083 + index / 1000, -6.7924, srid=4326)
+            property.location.save()
+            property.amenities.add(amenity)
+            PropertyPicture.objects.create(property=property, src=f'property_photos/{index}.jpg')
+            Feature.objects.create(property=property, name='Floor', value=str(index))
+            cls.ids.append(property.id)
+
+    def get(self, ids, query=None):
+        params = {'id__in': ','.join(str(id) for id in ids)}
+        if query is not None:
+            params['query'] = query
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get('/properties/', params)
+        self.assertEqual(response.status_code, 200)
+        results = sorted(response.data['results'], key=lambda property: property['id'])
+        return results, [query['sql'] for query in queries.captured_queries]
+
+    def queries_per_property(self, query=None):
+        return len(self.get(self.ids, query)[1]) - len(self.get(self.ids[:1], query)[1])
+
+    def test_only_selected_columns_are_loaded(self):
+        query = '{id, price, location{address}, pictures{id}}'
+        results, queries = self.get(self.ids, query)
+        pictures = dict(PropertyPicture.objects.values_list('property_id', 'id'))
+        self.assertEqual(results, [
+            {
+                'id': id, 'price': 100, 'location': {'address': 'Kinondoni'},
+                'pictures': [{'id': pictures[id]}]
+            }
+            for id in self.ids
+        ])
+
+        [properties] = [
+            sql for sql in queries
+            if '"api_property"."price"' in sql and not sql.startswith('EXPLAIN')
+        ]
+        self.assertIn('"api_location"."address"', properties)
+        self.assertNotIn('"api_property"."descriptions"', properties)
+        self.assertNotIn('"api_location"."point"', properties)
+
+        [prefetch] = [sql for sql in queries if 'FROM "api_propertypicture"' in sql]
+        self.assertNotIn('"api_propertypicture"."src"', prefetch)
+        self.assertFalse([sql for sql in queries if 'FROM "api_amenity"' in sql])
+        self.assertEqual(self.queries_per_property(query), 0)
+
+    def test_selected_fields_are_loaded_like_full_lists(self):
+        full, _ = self.get(self.ids)
+        baseline = self.queries_per_property()
+        for name in restql.serializer_tree(PropertySerializer):
+            query = f'{{id, {name}}}'
+            with self.subTest(field=name):
+                results, _ = self.get(self.ids, query)
+                self.assertEqual(results, [{'id': item['id'], name: item[name]} for item in full])
+                # Deferred columns would be loaded once per property
+                self.assertLessEqual(self.queries_per_property(query), baseline)
+
+
+class EstimatedCountTests(TestCase):
+    """
+    Property lists above ESTIMATED_COUNT_THRESHOLD rows
+    get approximate counts from PostgreSQL statistics.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        for _ in range(3):
+            create_property()
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Property._meta.db_table}")
+
+    def get(self, url):
+        response = APIClient().get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_small_lists_are_counted_exactly(self):
+        data = self.get('/properties/')
+        self.assertEqual(data['count'], 3)
+        self.assertFalse(data['approximate_count'])
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=1)
+    def test_large_lists_are_estimated(self):
+        data = self.get('/properties/')
+        self.assertEqual(data['count'], 3)
+        self.assertTrue(data['approximate_count'])
+
+        data = self.get(f'/properties/?available_for={RENT}')
+        self.assertTrue(data['approximate_count'])
+        self.assertEqual(len(data['results']), 3)
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=1)
+    def test_pages_after_estimated_count_can_be_requested(self):
+        data = self.get('/properties/?page=2')
+        self.assertEqual(data['results'], [])
+        self.assertIsNone(data['next'])
+
+
+class DuplicateListingsTests(TestCase):
+    """
+    Properties posted more than once, with the same location, price
+    and a reworded description, are put in one cluster.
+    """
+    description = (
+        'Spacious two bedroom apartment with a sea view, fully furnished '
+        'kitchen, parking and a backup generator close to the beach'
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.properties = []
+        listings = [
+            (cls.description, 500, 39.2083),
+            ('Spacious two bedroom apartment with a sea view, furnished '
+             'kitchen, parking and a backup generator close to the beach', 510, 39.2085),
+            (cls.description, 900, 39.2084),
+            ('Office space in the city centre', 500, 39.2083),
+        ]
+        for description, price, longitude in listings:
+            property = create_property(descriptions=description, price=price)
+            property.location.point = Point(longitude, -6.7924, srid=4326)
+            property.location.save()
+            cls.properties.append(property)
+
+    def clusters(self):
+        return dict(PropertySignature.objects.values_list('property_id', 'cluster'))
+
+    def test_duplicates_are_clustered_when_saved(self):
+        for property in self.properties:
+            duplicates.update_duplicates(property)
+        first, second, expensive, office = [property.pk for property in self.properties]
+        self.assertEqual(
+            self.clusters(), {first: first, second: first, expensive: None, office: None}
+        )
+
+    def test_command_rebuilds_clusters(self):
+        call_command('detect_duplicates', stdout=StringIO())
+        first, second, expensive, office = [property.pk for property in self.properties]
+        self.assertEqual(
+            self.clusters(), {first: first, second: first, expensive: None, office: None}
+        )
+
+        response = APIClient().get('/properties/?collapse_duplicates=true')
+        ids = {property['id'] for property in response.data['results']}
+        self.assertEqual(ids, {first, expensive, office})
+
+    def test_deleting_a_duplicate_dissolves_its_cluster(self):
+        call_command('detect_duplicates', stdout=StringIO())
+        self.properties[0].delete()
+        self.assertIsNone(self.clusters()[self.properties[1].pk])
+
+
+class NormalizedPriceTests(TestCase):
+    """
+    Prices are normalized to the base currency and a month when saved
+    and when exchange rates change, lists are filtered by them.
+    """
+
+    def ids(self, url):
+        response = APIClient().get(url)
+        self.assertEqual(response.status_code, 200)
+        return sorted(property['id'] for property in response.data['results'])
+
+    def test_filter_by_normalized_price(self):
+        cheap = create_property(price=100)
+        expensive = create_property(price=1000)
+
+        self.assertEqual(self.ids('/properties/?normalized_price__range=50,500'), [cheap.pk])
+        self.assertEqual(self.ids('/properties/?normalized_price__gt=500'), [expensive.pk])
+        self.assertEqual(self.ids('/properties/?normalized_price__lt=50'), [])
+
+    def test_rate_changes_match_properties_like_saving(self):
+        rate = ExchangeRate.objects.create(currency='TZS', rate=0.0004)
+        property = create_property(price=250000, currency=' tzs ', price_rate_unit='Per Week ')
+        self.assertAlmostEqual(property.normalized_price, 250000 * 0.0004 * 52 / 12, places=2)
+
+        rate.rate = 0.0005
+        rate.save()
+        property.refresh_from_db()
+        self.assertAlmostEqual(property.normalized_price, property.get_normalized_price())
+        self.assertAlmostEqual(property.normalized_price, 250000 * 0.0005 * 52 / 12, places=2)
+
+
+class FavouritesTests(TestCase):
+    """
+    Favourites counts follow rows actually added to or removed from
+    users favourites, trending properties are ranked by them.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('fan', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def counts(self, *properties):
+        return [Property.objects.get(id=property.id).favourites_count for property in properties]
+
+    def test_favourites_are_counted_once(self):
+        first, second = create_property(), create_property()
+        other = User.objects.create_user('other', password='secret')
+
+        response = self.client.post(
+            '/my-fav-properties/add/', {'properties': [first.id, second.id, 0]}, format='json'
+        )
+        self.assertCountEqual(response.data['properties'], [first.id, second.id])
+        self.client.post('/my-fav-properties/add/', {'properties': [first.id]}, format='json')
+        first.user_set.add(other, self.user)
+        self.assertEqual(self.counts(first, second), [2, 1])
+
+        response = self.client.post(
+            '/my-fav-properties/remove/', {'properties': [second.id, second.id]}, format='json'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.client.post('/my-fav-properties/remove/', {'properties': [second.id]}, format='json')
+        self.assertEqual(self.counts(first, second), [2, 0])
+
+        first.user_set.clear()
+        self.assertEqual(self.counts(first, second), [0, 0])
+        self.assertFalse(self.user.fav_properties.exists())
+
+    def test_drifted_counts_stay_positive(self):
+        property = create_property()
+        self.user.fav_properties.add(property)
+        Property.objects.filter(id=property.id).update(favourites_count=0)
+
+        self.user.fav_properties.remove(property)
+        self.assertEqual(self.counts(property), [0])
+
+    def test_trending_properties_are_ranked_by_decayed_favourites(self):
+        old, new, unfavoured = create_property(), create_property(), create_property()
+        Property.objects.filter(id=old.id).update(post_date=timezone.now() - timedelta(days=10))
+        for username in ('a', 'b', 'c'):
+            User.objects.create_user(username).fav_properties.add(old)
+        self.user.fav_properties.add(new)
+
+        response = APIClient().get('/trending-properties/')
+        self.assertEqual(response.status_code, 200)
+        ranked = [property['id'] for property in response.data['results']]
+        self.assertEqual(ranked, [new.id, old.id])
+
+
+class AreaStatsMathTests(SimpleTestCase):
+    """
+    Prices are counted in log scale buckets of grid cells,
+    percentiles are estimated from bucket counts.
+    """
+
+    def test_price_buckets(self):
+        self.assertEqual(price_bucket(100), 40)
+        self.assertEqual(price_bucket(99.9), 39)
+        self.assertIsNone(price_bucket(0))
+        self.assertIsNone(price_bucket(None))
+        # Values of buckets are within their bounds
+        self.assertTrue(100 <= area_stats.bucket_value(40) < 10 ** (41 / 20))
+
+    def test_percentiles(self):
+        low, high = round(area_stats.bucket_value(40), 2), round(area_stats.bucket_value(60), 2)
+        self.assertEqual(
+            area_stats.percentiles({60: 3, 40: 1}),
+            {'p10': low, 'p25': low, 'p50': high, 'p75': high, 'p90': high}
+        )
+        self.assertEqual(
+            area_stats.percentiles({40: 1}, percents=(0, 100)), {'p0': low, 'p100': low}
+        )
+        self.assertIsNone(area_stats.percentiles({}))
+
+    def test_cells(self):
+        self.assertEqual(area_stats.cell_of(39.27, -6.81, 0), (39, -7))
+        self.assertEqual(area_stats.cell_of(39.27, -6.81, 1), (392, -69))
+        self.assertEqual(area_stats.cell_bounds(39, -7, 0), [39, -7, 40, -6])
+        self.assertEqual(area_stats.heatmap_size(39.05, -6.95, 39.25, -6.75, 1), 9)
+
+
+class AreaStatsTests(TestCase):
+    """
+    Area stats changed when properties are saved or deleted must be
+    identical to area stats rebuilt from all properties.
+    """
+
+    def create_property(self, longitude, latitude, **kwargs):
+        location = Location.objects.create(address='Kinondoni', point=Point(longitude, latitude))
+        return create_property(location=location, **kwargs)
+
+    def stats(self):
+        return set(AreaPriceStats.objects.filter(count__gt=0).values_list(
+            'zoom', 'cell_x', 'cell_y', 'type', 'available_for', 'metric', 'bucket', 'count'
+        ))
+
+    def test_incremental_stats_match_rebuilt_stats(self):
+        self.create_property(39.27, -6.81, price=100)
+        self.create_property(39.28, -6.82, price=3000, available_for=SALE)
+        Land.objects.create(
+            location=Location.objects.create(address='Bagamoyo', point=Point(38.9, -6.4)),
+            available_for=SALE, price=5000, currency='USD', square_meters=250
+        )
+
+        moved = self.create_property(36.8, -3.4, price=250)
+        moved.location.point = Point(39.27, -6.81)
+        moved.location.save()
+        moved.price = 700
+        moved.save()
+
+        self.create_property(39.27, -6.81, price=1000).delete()
+        # Properties without a point aren't counted
+        create_property(price=1000)
+
+        incremental = self.stats()
+        self.assertIn((2, 3927, -681, 'generic', RENT, 'count', 0, 2), incremental)
+        counted = sum(
+            count for zoom, *_, metric, bucket, count in incremental
+            if zoom == 0 and metric == 'count'
+        )
+        self.assertEqual(counted, 4)
+
+        last = Property.objects.order_by('-id').values_list('id', flat=True).first()
+        area_stats.rebuild_entries(0, last + 1)
+        area_stats.rebuild_stats()
+        self.assertEqual(self.stats(), incremental)
+
+    def test_entries_are_subtracted_once(self):
+        property = self.create_property(39.27, -6.81, price=100)
+        stats = self.stats()
+
+        entry = AreaStatsEntry.objects.get(property=property)
+        entry.delete()
+        # Like a transaction deleting an entry another one already deleted
+        entry.delete()
+        self.assertEqual(self.stats(), set())
+
+        update_area_stats(property)
+        self.assertEqual(self.stats(), stats)
+
+
+class ViewCountTests(TestCase):
+    """
+    Views counted in memory are added to saved counts in batches,
+    counts are shown to owners and properties are sorted by them.
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', password='secret')
+        self.counter = view_counts.ViewCounter()
+        # Flushed by tests rather than by a background thread
+        self.counter.pid = os.getpid()
+
+    def counts(self):
+        return dict(PropertyViewCount.objects.values_list('property_id', 'count'))
+
+    def test_views_are_added_to_saved_counts(self):
+        first, second, deleted = create_property(), create_property(), create_property()
+        for id in [first.id, first.id, second.id, deleted.id, first.id]:
+            self.counter.add(id)
+        deleted.delete()
+
+        self.counter.flush()
+        self.assertEqual(self.counts(), {first.id: 3, second.id: 1})
+        self.assertFalse(self.counter.counts)
+
+        self.counter.add(second.id)
+        self.counter.flush()
+        self.assertEqual(self.counts(), {first.id: 3, second.id: 2})
+
+    def test_counts_are_kept_when_writing_fails(self):
+        property = create_property()
+        self.counter.add(property.id)
+        with mock.patch.object(view_counts, 'write_counts', side_effect=DatabaseError), \
+                self.assertLogs('api.view_counts', 'ERROR'):
+            self.counter.flush()
+        self.assertEqual(self.counter.counts, {property.id: 1})
+
+        self.counter.add(property.id)
+        self.counter.flush()
+        self.assertEqual(self.counts(), {property.id: 2})
+
+    def test_views_are_counted_and_shown_to_owners(self):
+        property = create_property(owner=self.owner)
+        other = User.objects.create_user('other', password='secret')
+        view_counts.write_counts({property.id: 7})
+
+        with mock.patch('api.views.view_counter', self.counter):
+            for user, views_count in [(self.owner, 7), (other, None), (None, None)]:
+                client = APIClient()
+                client.force_authenticate(user)
+                response = client.get(f'/properties/{property.id}/')
+                self.assertEqual(response.data['views_count'], views_count)
+
+        # Owners' views aren't counted
+        self.assertEqual(self.counter.counts, {property.id: 2})
+
+    def test_order_by_views(self):
+        unseen, popular, seen = create_property(), create_property(), create_property()
+        view_counts.write_counts({popular.id: 10, seen.id: 2})
+
+        response = APIClient().get('/properties/?ordering=-views__count')
+        self.assertEqual(response.status_code, 200)
+        ranked = [property['id'] for property in response.data['results']]
+        self.assertEqual(ranked, [popular.id, seen.id, unseen.id])
+
+
+class ChangeFeedTests(TransactionTestCase):
+    """
+    Changes are only read once their transaction has ended, so
+    these tests commit instead of running in a transaction.
+    """
+
+    def get(self, url, status=200):
+        response = APIClient().get(url)
+        self.assertEqual(response.status_code, status)
+        return response.data
+
+    def changes(self, cursor):
+        data = self.get(f'/changes/?since={cursor}')
+        return [(item['id'], item['action']) for item in data['results']], data
+
+    def test_changes_since_cursor(self):
+        cursor = self.get('/changes/')['cursor']
+        property = create_property(descriptions='Old')
+
+        changes, data = self.changes(cursor)
+        self.assertEqual(changes, [(property.pk, 'created')])
+        self.assertEqual(data['results'][0]['property']['descriptions'], 'Old')
+
+        cursor = data['cursor']
+        property.descriptions = 'New'
+        property.save()
+        other = create_property()
+        Feature.objects.create(property=property, name='Floor', value='2')
+
+        changes, data = self.changes(cursor)
+        self.assertEqual(changes, [(other.pk, 'created'), (property.pk, 'updated')])
+        self.assertEqual(data['results'][1]['property']['descriptions'], 'New')
+
+        cursor = data['cursor']
+        id = property.pk
+        property.delete()
+        changes, data = self.changes(cursor)
+        self.assertEqual(changes, [(id, 'deleted')])
+        self.assertIsNone(data['results'][0]['property'])
+
+        changes, data = self.changes(data['cursor'])
+        self.assertEqual(changes, [])
+
+    def test_bulk_price_updates_are_logged(self):
+        property = create_property()
+        cursor = self.get('/changes/')['cursor']
+
+        ExchangeRate.objects.create(currency='USD', rate=2300)
+        changes, data = self.changes(cursor)
+        self.assertEqual(changes, [(property.pk, 'updated')])
+
+    def test_pages_of_changes(self):
+        cursor = self.get('/changes/')['cursor']
+        properties = [create_property() for _ in range(3)]
+
+        data = self.get(f'/changes/?since={cursor}&limit=2')
+        self.assertTrue(data['has_more'])
+        changes, data = self.changes(data['cursor'])
+        self.assertEqual(changes, [(properties[2].pk, 'created')])
+        self.assertFalse(data['has_more'])
+
+    def test_invalid_cursor(self):
+        self.get('/changes/?since=abc', status=400)
+
+
+class LiveSubscriptionTests(SimpleTestCase):
+    """
+    Events are sent to subscriptions whose box and filters they
+    match, and to subscriptions which were sent the property before.
+    """
+
+    def event(self, **kwargs):
+        return {
+            'id': 1, 'action': 'created', 'type': 'house', 'available_for': RENT,
+            'price': 100, 'currency': 'USD', 'normalized_price': 100,
+            'longitude': 39.27, 'latitude': -6.81, **kwargs
+        }
+
+    def received(self, subscription):
+        actions = []
+        while not subscription.queue.empty():
+            actions.append(subscription.queue.get_nowait()[0])
+        return actions
+
+    def test_events_are_dispatched_to_matching_subscriptions(self):
+        index = live.SubscriptionIndex()
+        city = live.Subscription(39.0, -7.0, 39.5, -6.5, available_for=RENT)
+        world = live.Subscription(-180, -90, 180, 90)
+        elsewhere = live.Subscription(30.0, -3.0, 30.5, -2.5)
+        for subscription in (city, world, elsewhere):
+            index.add(subscription)
+        self.assertEqual(index.unindexed, {world})
+
+        index.dispatch(self.event())
+        index.dispatch(self.event(action='updated', longitude=10.0))
+        index.dispatch(self.event(action='deleted', type=None, longitude=39.27))
+        index.dispatch(self.event(id=2, longitude=10.0))
+        index.dispatch(self.event(id=2, action='deleted', type=None, longitude=None, latitude=None))
+
+        self.assertEqual(self.received(city), ['created', 'removed', 'deleted'])
+        self.assertEqual(self.received(world), ['created', 'updated', 'deleted', 'created', 'deleted'])
+        self.assertEqual(self.received(elsewhere), [])
+
+        for subscription in (city, world, elsewhere):
+            index.remove(subscription)
+        self.assertEqual((index.cells, index.watchers), ({}, {}))
+
+    def test_slow_clients_are_reset(self):
+        subscription = live.Subscription(-180, -90, 180, 90)
+        for id in range(live.QUEUE_SIZE + 1):
+            subscription.deliver(self.event(id=id))
+        self.assertEqual(self.received(subscription), [live.RESET])
+
+
+ran_jobs = []
+
+
+@jobs.task(queue='tests', max_attempts=2)
+def record_job(value):
+    ran_jobs.append(value)
+
+
+@jobs.task(queue='tests', max_attempts=2)
+def failing_job():
+    raise ValueError('Failed')
+
+
+class JobQueueTests(TestCase):
+    """
+    Jobs are claimed by priority, retried with backoff
+    and queues are limited across workers.
+    """
+
+    def setUp(self):
+        ran_jobs.clear()
+
+    def test_jobs_of_rolled_back_transactions_are_dropped(self):
+        with self.assertRaises(ValueError), transaction.atomic():
+            record_job.delay(1)
+            raise ValueError('Rolled back')
+        self.assertFalse(Job.objects.exists())
+
+    def test_jobs_are_claimed_by_priority(self):
+        low = jobs.enqueue('api.tests.record_job', [1], queue='tests')
+        high = jobs.enqueue('api.tests.record_job', [2], queue='tests', priority=5)
+        jobs.enqueue('api.tests.record_job', [3], queue='tests', delay=60)
+
+        claimed = [jobs.claim('worker'), jobs.claim('worker'), jobs.claim('worker')]
+        self.assertEqual([job and job.id for job in claimed], [high.id, low.id, None])
+        self.assertEqual(Job.objects.get(id=high.id).status, RUNNING)
+
+        for job in claimed[:2]:
+            jobs.run(job)
+        self.assertEqual(ran_jobs, [2, 1])
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_failed_jobs_are_retried_then_failed(self):
+        job = failing_job.delay()
+        jobs.run(jobs.claim('worker'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (QUEUED, 1))
+        self.assertIn('Failed', job.last_error)
+        self.assertIsNone(jobs.claim('worker'))
+
+        Job.objects.filter(id=job.id).update(run_at=job.created_at)
+        jobs.run(jobs.claim('worker'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (FAILED, 2))
+
+    def test_queue_limits(self):
+        record_job.delay(1)
+        record_job.delay(2)
+        self.assertIsNotNone(jobs.claim('worker', limits={'tests': 1}))
+        self.assertIsNone(jobs.claim('worker', limits={'tests': 1}))
+        self.assertIsNone(jobs.claim('worker', queues=['other']))
+        self.assertIsNotNone(jobs.claim('worker', queues=['tests']))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), JOBS_EAGER=False)
+class PictureStorageTests(TestCase):
+    """
+    Pictures are named by content hash, identical uploads are stored
+    once and files are deleted with their last reference.
+    """
+
+    def upload(self, property, content=b'picture', name='photo.JPG'):
+        return PropertyPicture.objects.create(
+            property=property, src=SimpleUploadedFile(name, content)
+        )
+
+    def references(self, name):
+        return StoredFile.objects.get(name=name).reference_count
+
+    def test_identical_uploads_are_stored_once(self):
+        property = create_property()
+        first = self.upload(property)
+        second = self.upload(create_property(), name='copy.jpg')
+        other = self.upload(property, content=b'other picture')
+
+        digest = '2cea274d0bedc39ec4ab6ba9e59ec889e3ed6fb56a1cf088a64d9b383378dc97'
+        self.assertEqual(first.src.name, f'property_photos/2c/ea/{digest}.jpg')
+        self.assertEqual(first.src.name, second.src.name)
+        self.assertNotEqual(first.src.name, other.src.name)
+        self.assertEqual(self.references(first.src.name), 2)
+        self.assertTrue(picture_storage.exists(first.src.name))
+
+    def test_files_are_deleted_with_their_last_reference(self):
+        first = self.upload(create_property())
+        second = self.upload(create_property())
+        name = first.src.name
+
+        deletions = Job.objects.filter(task__startswith='api.tasks.delete_')
+        first.delete()
+        self.assertEqual(self.references(name), 1)
+        self.assertFalse(deletions.exists())
+
+        second.delete()
+        self.assertEqual(self.references(name), 0)
+        job = deletions.get()
+        self.assertEqual((job.task, job.args), ('api.tasks.delete_unreferenced_files', [[name]]))
+        self.assertTrue(picture_storage.delete_unreferenced(name))
+        self.assertFalse(picture_storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_files_of_cascade_deleted_pictures_are_released(self):
+        property = create_property()
+        first = self.upload(property)
+        other = self.upload(property, content=b'other picture')
+        kept = self.upload(create_property())
+
+        property.delete()
+        self.assertEqual(self.references(first.src.name), 1)
+        self.assertEqual(self.references(other.src.name), 0)
+
+        PropertyPicture.objects.filter(id=kept.id).delete()
+        self.assertEqual(self.references(kept.src.name), 0)
+        jobs = Job.objects.filter(task='api.tasks.delete_unreferenced_files')
+        self.assertCountEqual(
+            jobs.values_list('args', flat=True), [[[first.src.name]], [[other.src.name]]]
+        )
+
+    def test_uploaded_again_files_are_kept(self):
+        picture = self.upload(create_property())
+        name = picture.src.name
+        picture.delete()
+
+        self.upload(create_property())
+        self.assertFalse(picture_storage.delete_unreferenced(name))
+        self.assertTrue(picture_storage.exists(name))
+
+    def test_replaced_files_are_released(self):
+        picture = self.upload(create_property())
+        name = picture.src.name
+
+        picture = PropertyPicture.objects.get(id=picture.id)
+        picture.src = SimpleUploadedFile('photo.jpg', b'picture')
+        picture.save()
+        self.assertEqual(self.references(name), 1)
+
+        picture.src = SimpleUploadedFile('photo.jpg', b'new picture')
+        picture.save()
+        self.assertEqual(self.references(name), 0)
+        self.assertEqual(self.references(picture.src.name), 1)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), MEDIA_SERVER='')
+class MediaTests(SimpleTestCase):
+    """
+    Only files of public media directories are served, with single
+    byte ranges, conditional requests and long caching of hashed names.
+    """
+    hashed = 'property_photos/2c/ea/' + 'a' * 64 + '.jpg'
+    plain = 'profile_pictures/12.jpg'
+    content = bytes(range(100))
+
+    def setUp(self):
+        for name in (self.hashed, self.plain, 'private/secret.txt'):
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(self.content)
+        self.modified = http_date(os.stat(os.path.join(settings.MEDIA_ROOT, self.plain)).st_mtime)
+
+    def get(self, path, **headers):
+        return media.serve(RequestFactory().get(f'/media/{path}', **headers), path)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_only_public_directories_are_served(self):
+        self.assertEqual(media.media_file(self.plain)[0], self.plain)
+        self.assertEqual(
+            media.media_file('/property_photos/../profile_pictures/12.jpg')[0], self.plain
+        )
+        for path in [
+            'private/secret.txt', 'property_photos/../private/secret.txt', '../private/secret.txt',
+            'profile_pictures', 'profile_pictures/missing.jpg', 'property_photos/2c',
+        ]:
+            with self.subTest(path=path), self.assertRaises(Http404):
+                media.media_file(path)
+
+    def test_byte_ranges(self):
+        self.assertEqual(media.byte_range('bytes=10-19', 100), (10, 19))
+        self.assertEqual(media.byte_range('bytes=90-200', 100), (90, 99))
+        # Open ended and suffix ranges
+        self.assertEqual(media.byte_range('bytes=95-', 100), (95, 99))
+        self.assertEqual(media.byte_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(media.byte_range('bytes=-200', 100), (0, 99))
+        # Invalid and multiple ranges get the whole file
+        for header in ['bytes=20-10', 'bytes=-', 'items=0-10', 'bytes=0-1,5-6', 'bytes=a-b']:
+            with self.subTest(header=header):
+                self.assertIsNone(media.byte_range(header, 100))
+        for header, size in [('bytes=100-', 100), ('bytes=-0', 100), ('bytes=-5', 0)]:
+            with self.subTest(header=header, size=size), self.assertRaises(ValueError):
+                media.byte_range(header, size)
+
+    def test_range_requests(self):
+        response = self.get(self.plain, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(self.body(response), self.content[10:20])
+
+        response = self.get(self.plain, HTTP_RANGE='bytes=100-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+        # Ranges of a stale copy aren't sent
+        response = self.get(self.plain, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE=self.modified)
+        self.assertEqual(response.status_code, 206)
+        response = self.get(
+            self.plain, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='Thu, 01 Jan 2015 00:00:00 GMT'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+
+    def test_conditional_requests(self):
+        response = self.get(self.plain, HTTP_IF_MODIFIED_SINCE=self.modified)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['Last-Modified'], self.modified)
+
+        response = self.get(self.plain, HTTP_IF_MODIFIED_SINCE='Thu, 01 Jan 2015 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(self.body(response), self.content)
+
+    def test_cache_headers(self):
+        self.assertEqual(self.get(self.hashed)['Cache-Control'], media.IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(self.get(self.plain)['Cache-Control'], media.CACHE_CONTROL)
+        self.assertEqual(
+            self.get(self.plain, HTTP_IF_MODIFIED_SINCE=self.modified)['Cache-Control'],
+            media.CACHE_CONTROL
+        )
+
+    @override_settings(MEDIA_SERVER='nginx', MEDIA_ACCEL_REDIRECT_URL='/protected-media/')
+    def test_files_are_sent_by_the_web_server(self):
+        response = self.get(self.hashed)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.hashed}')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Cache-Control'], media.IMMUTABLE_CACHE_CONTROL)
+        with self.assertRaises(Http404):
+            self.get('private/secret.txt')
+
+
+class SimilarityIndexTests(SimpleTestCase):
+    """
+    Deleted properties are left out of similar properties
+    even after vectors are added to the index.
+    """
+
+    def test_removed_properties_are_left_out(self):
+        index = similarity.SimilarityIndex()
+        vectors = [[i] + [0] * (similarity.DIMENSIONS - 1) for i in range(4)]
+        index.set([1, 2, 3, 4], vectors)
+        index.remove([2])
+        index.update({5: index.vector(4) * 0.5})
+
+        origin = index.vector(1)
+        self.assertIsNone(index.vector(2))
+        self.assertEqual(index.most_similar(origin, 3, exclude=[1]), [5, 3, 4])
+
+
+class SimilarityVectorTests(TestCase):
+    """
+    Vectors are recomputed by workers whenever properties are saved,
+    also outside of the API, and when exchange rates change prices.
+    """
+
+    def vector(self, property):
+        return bytes(PropertyVector.objects.get(property=property).vector)
+
+    def run_jobs(self, task):
+        for job in Job.objects.filter(task=f'api.tasks.{task}'):
+            getattr(tasks, task)(*job.args, **job.kwargs)
+            job.delete()
+
+    def test_vectors_follow_saves_and_rates(self):
+        property = create_property(price=250000, currency='TZS')
+        self.run_jobs('update_property_vectors')
+        expected = similarity.compute_vectors([property.pk])[property.pk].tobytes()
+        self.assertEqual(self.vector(property), expected)
+
+        ExchangeRate.objects.create(currency='TZS', rate=0.0004)
+        self.run_jobs('update_currency_vectors')
+        self.assertNotEqual(self.vector(property), expected)
+        self.assertEqual(
+            self.vector(property), similarity.compute_vectors([property.pk])[property.pk].tobytes()
+        )
+
+
+class SavedSearchTests(TestCase):
+    """
+    Owners of saved searches are notified of properties matching every
+    filter of their query, queries with unknown filters are rejected.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(username='searcher')
+
+    def search(self, **params):
+        return SavedSearch.objects.create(owner=self.owner, query=urlencode(params))
+
+    def create_property(self, **kwargs):
+        location = Location.objects.create(address='Kinondoni', point=Point(39.27, -6.81))
+        return create_property(location=location, **kwargs)
+
+    def matched(self, property):
+        return {notification.saved_search_id for notification in match_saved_searches(property)}
+
+    def test_properties_matching_every_filter_are_notified(self):
+        polygon = {
+            'type': 'Polygon',
+            'coordinates': [
+                [[39.2, -6.9], [39.3, -6.9], [39.3, -6.7], [39.2, -6.7], [39.2, -6.9]]
+            ],
+        }
+        cheap = self.search(available_for=RENT, normalized_price__lt=300)
+        in_tzs = self.search(currency='TZS')
+        nearby = self.search(longitude=39.27, latitude=-6.81, radius_to_scan=1000)
+        far = self.search(longitude=30.0, latitude=-3.0)
+        within = self.search(polygon=json.dumps(polygon))
+        around = self.search(origins=json.dumps([{'longitude': 30.0, 'latitude': -3.0}]))
+
+        cheap_property = self.create_property(price=100)
+        self.assertEqual(self.matched(cheap_property), {cheap.pk, nearby.pk, within.pk})
+        self.assertEqual(self.matched(self.create_property(price=1000)), {nearby.pk, within.pk})
+
+        # Searches elsewhere or out of price aren't even run
+        expensive = self.create_property(price=1000)
+        candidates = set(candidate_searches(expensive).values_list('id', flat=True))
+        self.assertEqual(candidates, {in_tzs.pk, nearby.pk, within.pk})
+        self.assertNotIn(far.pk, candidates)
+        self.assertNotIn(around.pk, candidates)
+
+    def test_unknown_filters_are_rejected(self):
+        for query in ['normalised_price__lt=300', 'price__lte=3', 'rooms__count__gte=2']:
+            with self.subTest(query=query), self.assertRaises(serializers.ValidationError):
+                check_query(query, self.owner)
+
+        check_query('type=house&rooms__count__gte=2&normalized_price__range=100,500', self.owner)
+        with self.assertRaises(serializers.ValidationError):
+            check_query('normalized_price__range=cheap', self.owner)
+
+
+class RegionTests(TestCase):
+    """
+    Locations are linked to regions containing them, properties
+    are listed and counted by region with these links.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        def region(name, level, code, bounds, parent=None):
+            return Region.objects.create(
+                name=name, level=level, code=code, parent=parent,
+                boundary=MultiPolygon(Polygon.from_bbox(bounds))
+            )
+
+        cls.dar = region('Dar es Salaam', 'region', '02', (39.0, -7.0, 39.5, -6.5))
+        cls.arusha = region('Arusha', 'region', '01', (36.0, -4.0, 37.0, -3.0))
+        cls.kinondoni = region(
+            'Kinondoni', 'district', '0201', (39.2, -6.85, 39.3, -6.75), cls.dar
+        )
+
+        cls.inside = cls.create_property(39.27, -6.81, price=100)
+        cls.coast = cls.create_property(39.1, -6.9, price=1000)
+        cls.north = cls.create_property(36.7, -3.4, price=100)
+        cls.nowhere = create_property()
+
+    @staticmethod
+    def create_property(longitude, latitude, **kwargs):
+        location = Location.objects.create(address='Kinondoni', point=Point(longitude, latitude))
+        return create_property(location=location, **kwargs)
+
+    def get(self, url):
+        response = APIClient().get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def ids(self, url):
+        return sorted(item['id'] for item in self.get(url)['results'])
+
+    def regions(self, property):
+        location = Location.objects.get(id=property.location_id)
+        return set(location.regions.values_list('id', flat=True))
+
+    def test_locations_are_linked_to_regions_containing_them(self):
+        self.assertEqual(self.regions(self.inside), {self.dar.id, self.kinondoni.id})
+        self.assertEqual(self.regions(self.coast), {self.dar.id})
+        self.assertEqual(self.regions(self.nowhere), set())
+
+        location = self.inside.location
+        location.point = Point(36.5, -3.5)
+        location.save()
+        self.assertEqual(self.regions(self.inside), {self.arusha.id})
+
+    def test_locations_are_relinked_with_region_boundaries(self):
+        # Updated without signals, like boundaries loaded in bulk
+        Region.objects.filter(id=self.kinondoni.id).update(
+            boundary=MultiPolygon(Polygon.from_bbox((39.0, -7.0, 39.15, -6.85)))
+        )
+        self.assertEqual(assign_locations(self.kinondoni), 1)
+        self.assertEqual(self.regions(self.inside), {self.dar.id})
+        self.assertEqual(self.regions(self.coast), {self.dar.id, self.kinondoni.id})
+
+    def test_filter_properties_by_region(self):
+        self.assertEqual(
+            self.ids(f'/properties/?region={self.dar.id}'), [self.inside.id, self.coast.id]
+        )
+        self.assertEqual(self.ids(f'/properties/?region={self.kinondoni.id}'), [self.inside.id])
+        url = f'/properties/?region={self.dar.id}&normalized_price__lt=500'
+        self.assertEqual(self.ids(url), [self.inside.id])
+        self.assertEqual(APIClient().get('/properties/?region=0').status_code, 400)
+
+    def test_region_counts(self):
+        self.assertEqual(self.get('/properties/region-counts/?level=region'), [
+            {'id': self.dar.id, 'name': 'Dar es Salaam', 'count': 2},
+            {'id': self.arusha.id, 'name': 'Arusha', 'count': 1},
+        ])
+        self.assertEqual(self.get('/properties/region-counts/?level=region&price__lt=500'), [
+            {'id': self.arusha.id, 'name': 'Arusha', 'count': 1},
+            {'id': self.dar.id, 'name': 'Dar es Salaam', 'count': 1},
+        ])
+        self.assertEqual(APIClient().get('/properties/region-counts/').status_code, 400)
+
+    def test_filter_regions(self):
+        self.assertEqual(self.ids('/regions/?level=district'), [self.kinondoni.id])
+        self.assertEqual(self.ids(f'/regions/?parent={self.dar.id}'), [self.kinondoni.id])
+        self.assertEqual(self.ids('/regions/?name__icontains=ARUSHA'), [self.arusha.id])
+
+
+def circle(longitude, latitude, radius, points):
+    """
+    Return a GeoJSON polygon approximating a circle with `points` points.
+    """
+    ring = [
+        [longitude + radius * math.cos(2 * math.pi * i / points),
+         latitude + radius * math.sin(2 * math.pi * i / points)]
+        for i in range(points)
+    ]
+    return json.dumps({'type': 'Polygon', 'coordinates': [ring + ring[:1]]})
+
+
+class PolygonSearchTests(TestCase):
+    """
+    Properties are searched within valid, fixed or simplified polygons,
+    polygons which can't be used are rejected.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.inside = cls.create_property(39.27, -6.81)
+        cls.outside = cls.create_property(39.1, -6.9)
+
+    @staticmethod
+    def create_property(longitude, latitude):
+        location = Location.objects.create(address='Kinondoni', point=Point(longitude, latitude))
+        return create_property(location=location)
+
+    def search(self, polygon, **params):
+        return APIClient().get('/properties/', {'polygon': polygon, **params})
+
+    def ids(self, polygon):
+        response = self.search(polygon)
+        self.assertEqual(response.status_code, 200)
+        return [property['id'] for property in response.data['results']]
+
+    def test_properties_within_polygons(self):
+        square = {
+            'type': 'Polygon',
+            'coordinates': [
+                [[39.2, -6.85], [39.3, -6.85], [39.3, -6.75], [39.2, -6.75], [39.2, -6.85]]
+            ],
+        }
+        self.assertEqual(self.ids(json.dumps(square)), [self.inside.id])
+        feature = {'type': 'Feature', 'properties': {}, 'geometry': square}
+        self.assertEqual(self.ids(json.dumps(feature)), [self.inside.id])
+        multipolygon = {'type': 'MultiPolygon', 'coordinates': [square['coordinates']]}
+        self.assertEqual(self.ids(json.dumps(multipolygon)), [self.inside.id])
+
+    def test_invalid_polygons_are_rejected(self):
+        for polygon in [
+            'not json', '[1, 2]', json.dumps({'type': 'Point', 'coordinates': [39.27, -6.81]}),
+            json.dumps({'type': 'Polygon', 'coordinates': [[[39.2, -6.8], [39.3]]]}),
+        ]:
+            with self.subTest(polygon=polygon):
+                self.assertEqual(self.search(polygon).status_code, 400)
+
+        response = self.search(circle(39.27, -6.81, 0.1, 10), longitude=39.27, latitude=-6.81)
+        self.assertEqual(response.status_code, 400)
+
+    def test_self_intersecting_polygons_are_fixed(self):
+        # Bow tie crossing itself around the property
+        bow_tie = {
+            'type': 'Polygon',
+            'coordinates': [
+                [[39.2, -6.9], [39.3, -6.7], [39.3, -6.9], [39.2, -6.7], [39.2, -6.9]]
+            ],
+        }
+        polygon = parse_polygon(json.dumps(bow_tie))
+        self.assertTrue(polygon.valid)
+        self.assertFalse(polygon.empty)
+        self.assertNotIn(self.outside.id, self.ids(json.dumps(bow_tie)))
+
+    def test_large_polygons_are_simplified_or_rejected(self):
+        polygon = parse_polygon(circle(39.27, -6.81, 0.1, 1000))
+        simplified = simplify_polygon(polygon)
+        self.assertLessEqual(simplified.num_points, MAX_POLYGON_POINTS)
+        self.assertEqual(simplified.srid, polygon.srid)
+        self.assertAlmostEqual(simplified.area, polygon.area, delta=polygon.area * 0.01)
+        self.assertEqual(self.ids(circle(39.27, -6.81, 0.1, 1000)), [self.inside.id])
+
+        response = self.search(circle(39.27, -6.81, 0.1, MAX_INPUT_POINTS + 1))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(MAX_INPUT_POINTS), str(response.data))
+
+
+class OriginsSearchTests(TestCase):
+    """
+    Properties within radius of several origins are listed once,
+    by distance to their nearest origin.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.west = cls.create_property(39.27, -6.81)
+        cls.east = cls.create_property(39.275, -6.81)
+        cls.far = cls.create_property(39.3, -6.81)
+
+    @staticmethod
+    def create_property(longitude, latitude):
+        location = Location.objects.create(address='Kinondoni', point=Point(longitude, latitude))
+        return create_property(location=location)
+
+    def search(self, origins, url='/nearby-properties/', **params):
+        if not isinstance(origins, str):
+            origins = json.dumps(origins)
+        return APIClient().get(url, {'origins': origins, **params})
+
+    def test_properties_are_listed_once_by_nearest_origin(self):
+        # Both properties are within 1000 meters of the first origin,
+        # the west one is also 55 meters from the second one
+        origins = [
+            {'longitude': 39.276, 'latitude': -6.81, 'radius_to_scan': 1000},
+            {'longitude': 39.2695, 'latitude': -6.81, 'radius_to_scan': 500},
+        ]
+        for url in ['/nearby-properties/', '/properties/']:
+            with self.subTest(url=url):
+                response = self.search(origins, url)
+                self.assertEqual(response.status_code, 200)
+                results = response.data['results']
+                ids = [property['id'] for property in results]
+                self.assertEqual(ids, [self.west.id, self.east.id])
+                self.assertEqual([property['nearest_origin'] for property in results], [1, 0])
+                distances = [float(property['distance'].split()[0]) for property in results]
+                self.assertAlmostEqual(distances[0], 55, delta=2)
+                self.assertAlmostEqual(distances[1], 110, delta=2)
+
+        response = self.search([{'longitude': 39.3, 'latitude': -6.81, 'radius_to_scan': 10}])
+        self.assertEqual([property['id'] for property in response.data['results']], [self.far.id])
+
+    def test_invalid_origins_are_rejected(self):
+        origin = {'longitude': 39.27, 'latitude': -6.81}
+        for origins in [
+            'not json', [], [{'longitude': 39.27}], [{**origin, 'latitude': 91}],
+            [{**origin, 'radius_to_scan': -1}], [origin] * (MAX_NEARBY_ORIGINS + 1),
+        ]:
+            with self.subTest(origins=origins):
+                self.assertEqual(self.search(origins).status_code, 400)
+
+    def test_origins_and_point_are_exclusive(self):
+        response = self.search([{'longitude': 39.27, 'latitude': -6.81}], longitude=39.27)
+        self.assertEqual(response.status_code, 400)
+        response = self.search(
+            [{'longitude': 39.27, 'latitude': -6.81}], url='/properties/', latitude=-6.81
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class RendererTests(SimpleTestCase):
+    """
+    JSON rendered with orjson is byte for byte DRF's compact JSON,
+    MessagePack carries the same data.
+    """
+
+    def data(self):
+        context = {'request': RequestFactory().get('/contacts/')}
+        contacts = [
+            Contact(id=1, name='Agent \u2028 \u00e9', email='agent@example.com', phone=''),
+            Contact(id=2, name='Other', email='', phone='+255'),
+        ]
+        return {
+            'contact': ContactSerializer(contacts[0], context=context).data,
+            'contacts': ContactSerializer(contacts, many=True, context=context).data,
+            'created': datetime(2026, 10, 19, 17, 0, 0, 123456, tzinfo=dt_timezone.utc),
+            'naive': datetime(2026, 10, 19, 17, 0),
+            'date': date(2026, 10, 19),
+            'time': time(17, 0, 30),
+            'duration': timedelta(hours=1),
+            'decimal': Decimal('12.50'),
+            'uuid': uuid.UUID(int=1),
+            'lazy': gettext_lazy('Not found.'),
+            'numbers': [0, -1, 2 ** 63 - 1, 0.1, 100.0, 1234.5678, True, None],
+            'keys': {1: 'one', None: 'none'},
+            'tuple': (1, 2),
+            'text': 'Kariakoo \u2029 "quoted" \\ \n',
+        }
+
+    def test_json_is_drf_compact_json(self):
+        data = self.data()
+        self.assertEqual(JSONRenderer().render(data), DRFJSONRenderer().render(data))
+        contacts = data['contacts']
+        self.assertEqual(JSONRenderer().render(contacts), DRFJSONRenderer().render(contacts))
+        self.assertEqual(JSONRenderer().render(2 ** 64), DRFJSONRenderer().render(2 ** 64))
+        self.assertEqual(JSONRenderer().render(None), b'')
+
+    def test_messagepack_is_json_equivalent(self):
+        data = self.data()
+        del data['keys']
+        packed = MessagePackRenderer().render(data)
+        self.assertEqual(
+            MessagePackParser().parse(BytesIO(packed)),
+            json.loads(DRFJSONRenderer().render(data))
+        )
+
+
+class MessagePackTests(TestCase):
+    """
+    Write endpoints accept and answer MessagePack like JSON.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('agent', password='secret'))
+
+    def test_create_with_messagepack(self):
+        contact = {'name': 'Agent', 'email': 'agent@example.com', 'phone': '+255700000000'}
+        response = self.client.post(
+            '/contacts/', msgpack.packb(contact), content_type='application/msgpack',
+            HTTP_ACCEPT='application/msgpack'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        created = msgpack.unpackb(response.content, raw=False)
+        self.assertEqual({key: created[key] for key in contact}, contact)
+
+        response = self.client.get(f"/contacts/{created['id']}/")
+        self.assertEqual(json.loads(response.content), created)
+
+    def test_invalid_messagepack_is_rejected(self):
+        response = self.client.post('/contacts/', b'\xc1', content_type='application/msgpack')
+        self.assertEqual(response.status_code, 400)
@@ -13,6 +13,7 @@ router.register(r'users', views.UserViewSet)
 router.register(r'profile-pictures', views.ProfilePictureViewSet)
 router.register(r'groups', views.GroupViewSet)
 router.register(r'locations', views.LocationViewSet)
+router.register(r'regions', views.RegionViewSet)
 router.register(r'contacts', views.ContactViewSet)
 router.register(r'services', views.ServiceViewSet)
 router.register(r'potentials', views.PotentialViewSet)
@@ -29,6 +30,8 @@ router.register(r'lands', views.LandViewSet)
 router.register(r'frames', views.FrameViewSet)
 router.register(r'offices', views.OfficeViewSet)
 router.register(r'hostels', views.HostelViewSet)
+router.register(r'saved-searches', views.SavedSearchViewSet)
+router.register(r'notifications', views.NotificationViewSet)
 
 router.register(
     r'properties-availability',
@@ -48,6 +51,24 @@ router.register(
     basename='my-fav-properties'
 )
 
+router.register(
+    r'trending-properties',
+    views.TrendingPropertiesViewSet,
+    basename='trending-properties'
+)
+
+router.register(
+    r'area-stats',
+    views.AreaStatsViewSet,
+    basename='area-stats'
+)
+
+router.register(
+    r'changes',
+    views.ChangesViewSet,
+    basename='changes'
+)
+
 
 
 urlpatterns = [
@@ -0,0 +1,94 @@
+import os
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connections
+
+from .models import Property, PropertyViewCount
+
+
+logger = logging.getLogger(__name__)
+
+# Number of properties upserted per statement
+FLUSH_BATCH_SIZE = 1000
+
+
+class ViewCounter():
+    """
+    Count property views in memory and write them to PropertyViewCount
+    from a background thread every VIEW_COUNTS_FLUSH_INTERVAL seconds,
+    so that a view costs no query.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        self.pid = None
+        self.stopped = threading.Event()
+
+    def add(self, property_id):
+        with self.lock:
+            if self.pid != os.getpid():
+                # First view in this process(workers may be forked)
+                self.pid = os.getpid()
+                self.counts = Counter()
+                self.start()
+            self.counts[property_id] += 1
+
+    def start(self):
+        thread = threading.Thread(target=self.run, name='view-counts', daemon=True)
+        thread.start()
+
+    def run(self):
+        while not self.stopped.wait(settings.VIEW_COUNTS_FLUSH_INTERVAL):
+            close_old_connections()
+            self.flush()
+
+    def flush(self, using='default'):
+        """
+        Write counts of views since the last flush.
+        """
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+        if not counts:
+            return
+
+        try:
+            write_counts(counts, using)
+        except DatabaseError:
+            logger.exception('Failed to write %s property view counts', len(counts))
+            # Keep them for the next flush
+            with self.lock:
+                self.counts.update(counts)
+
+
+def write_counts(counts, using='default'):
+    """
+    Add `counts`(a dict of property id => views) to saved counts.
+    """
+    table = PropertyViewCount._meta.db_table
+    properties = Property._meta.db_table
+    # Sorted ids make workers lock rows in the same order
+    items = sorted(counts.items())
+    with connections[using].cursor() as cursor:
+        for start in range(0, len(items), FLUSH_BATCH_SIZE):
+            batch = items[start:start + FLUSH_BATCH_SIZE]
+            values = ', '.join(['(%s, %s)'] * len(batch))
+            # Views of properties deleted since are dropped by the join
+            cursor.execute(
+                f"INSERT INTO {table} (property_id, count, updated_at) "
+                f"SELECT v.id, v.count, now() FROM (VALUES {values}) AS v (id, count) "
+                f"JOIN {properties} p ON p.id = v.id "
+                f"ON CONFLICT (property_id) DO UPDATE "
+                f"SET count = {table}.count + EXCLUDED.count, updated_at = EXCLUDED.updated_at",
+                [value for item in batch for value in item]
+            )
+
+
+view_counter = ViewCounter()
+
+# Views counted since the last flush are written when the worker exits
+atexit.register(view_counter.flush)
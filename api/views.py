@@ -1,20 +1,33 @@
 import json
 
-from django.db.models import Value
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import (
+    Value, F, Q, Func, FloatField, IntegerField, ExpressionWrapper, Count, Case, When
+)
 from rest_framework import views, viewsets, status, generics
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.http import HttpRequest, HttpResponse, QueryDict
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.request import Request
 from rest_framework.authtoken.models import Token
 from django_restql.mixins import (
     EagerLoadingMixin, QueryArgumentsMixin
 )
+from django_restql.settings import restql_settings
 from django.contrib.auth.models import Group
-from django.db.models.functions import Concat, Replace
+from django.db.models.functions import Concat, Replace, Power, Least
 from django.contrib.gis.geos import Point
 from django.contrib.gis.db.models.functions import Distance
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.permissions import (
-    IsAuthenticatedOrReadOnly, IsAuthenticated, AllowAny
+    SAFE_METHODS, IsAuthenticatedOrReadOnly, IsAuthenticated, AllowAny
 )
 
 from api.permissions import (
@@ -24,7 +37,8 @@ from api.permissions import (
 from .models import (
     Location, Contact, Service, Potential, Property, PropertyPicture, SingleRoom,
     House, Apartment, Hostel, Frame, Land, Office, Feature, Amenity, User,
-    ProfilePicture, PROPERTIES_AVAILABILITY, RoomType
+    ProfilePicture, PROPERTIES_AVAILABILITY, RoomType, SavedSearch, Notification, ROOM, HOUSE, APARTMENT,
+    LAND, FRAME, OFFICE, HOSTEL, Region, DELETED
 )
 from .serializers import (
     UserSerializer, GroupSerializer, LocationSerializer, FeatureSerializer,
@@ -32,8 +46,32 @@ from .serializers import (
     PropertySerializer, PropertyPictureSerializer, SingleRoomSerializer, HouseSerializer,
     ApartmentSerializer, HostelSerializer, FrameSerializer, LandSerializer,
     OfficeSerializer, AmenitySerializer, ProfilePictureSerializer,
-    NearbyLocationSerializer, RoomTypeSerializer
+    NearbyLocationSerializer, RoomTypeSerializer, FavouritesSerializer,
+    SavedSearchSerializer, NotificationSerializer, SimilarPropertiesSerializer,
+    CellStatsSerializer, HeatmapSerializer, RegionSerializer, RegionFilterSerializer,
+    RegionCountsSerializer, PolygonSearchSerializer, NearbyOriginsSerializer,
+    ChangesSerializer
 )
+from .similarity import similar_properties
+from .geometry import radius_in_degrees
+from . import area_stats, restql, db_json, changes, tasks
+from .view_counts import view_counter
+from .pagination import EstimatedCountPagination
+
+
+def build_queryset(viewset, query, user=None):
+    """
+    Return the queryset listed by `viewset` when it's requested
+    with `query` string by `user`.
+    """
+    http_request = HttpRequest()
+    http_request.method = 'GET'
+    http_request.GET = QueryDict(query)
+    request = Request(http_request)
+    request.user = user or AnonymousUser()
+
+    view = viewset(request=request, action='list', format_kwarg=None, args=(), kwargs={})
+    return view.filter_queryset(view.get_queryset())
 
 
 def fields(*args):
@@ -101,12 +139,38 @@ class RegisterUserViewSet(viewsets.ViewSet):
         return Response(data)
 
 
+class AtomicWritesMixin():
+    """
+    Write objects in one transaction with entries they add to the change
+    log of properties(see api.changes) and jobs they add(see api.jobs)
+    """
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+            self.saved(serializer.instance)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            super().perform_update(serializer)
+            self.saved(serializer.instance)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            super().perform_destroy(instance)
+
+    def saved(self, instance):
+        """
+        Called in the transaction of a created or updated object
+        """
+
+
 class ProfilePictureViewSet(QueryArgumentsMixin, viewsets.ModelViewSet):
     """API endpoint that allows Profile Picture to be viewed or edited."""
     queryset = ProfilePicture.objects.all()
     serializer_class = ProfilePictureSerializer
     permission_classes = (IsAuthenticated, IsOwnerOrReadOnly)
-    filter_fields = fields('id',)
+    filterset_fields = fields('id',)
 
 
 class UserViewSet(QueryArgumentsMixin, viewsets.ModelViewSet):
@@ -115,7 +179,7 @@ class UserViewSet(QueryArgumentsMixin, viewsets.ModelViewSet):
     serializer_class = UserSerializer
     permission_classes = (IsAllowedUser, HasGroupPermission)
     http_method_names = ['get', 'put', 'patch', 'head', 'delete']
-    filter_fields = fields(
+    filterset_fields = fields(
         'id', {'email': ['exact', 'icontains']}, 'full_name',
         'groups', {'username': ['exact', 'icontains']}
     )
@@ -138,62 +202,77 @@ class GroupViewSet(QueryArgumentsMixin, viewsets.ModelViewSet):
     queryset = Group.objects.all()
     serializer_class = GroupSerializer
     permission_classes = (IsAuthenticatedOrReadOnly, IsAllowedUser)
-    filter_fields = fields('id', 'name')
+    filterset_fields = fields('id', 'name')
 
 
-class LocationViewSet(QueryArgumentsMixin, viewsets.ModelViewSet):
+class LocationViewSet(AtomicWritesMixin, QueryArgumentsMixin, viewsets.ModelViewSet):
     """API endpoint that allows locations to be viewed or edited."""
     queryset = Location.objects.all()
     serializer_class = LocationSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
-    filter_fields = fields(
+    filterset_fields = fields(
         'id', 'address'
     )
 
 
-class ContactViewSet(QueryArgumentsMixin, viewsets.ModelViewSet):
+class RegionViewSet(QueryArgumentsMixin, viewsets.ReadOnlyModelViewSet):
+    """API endpoint that allows regions to be viewed."""
+    # Boundaries are large and not serialized
+    queryset = Region.objects.defer('boundary').order_by('level', 'name')
+    serializer_class = RegionSerializer
+    use_read_replica = True
+    filterset_fields = fields(
+        'id', 'level', 'code', 'parent', {'name': ['exact', 'icontains']},
+    )
+
+
+class ContactViewSet(AtomicWritesMixin, QueryArgumentsMixin, viewsets.ModelViewSet):
     """API endpoint that allows contacts to be viewed or edited."""
     queryset = Contact.objects.all()
     serializer_class = ContactSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
-    filter_fields = fields(
+    filterset_fields = fields(
         'id', 'name', {'email': ['exact', 'icontains']},
         'phone',
     )
 
 
-class AmenityViewSet(QueryArgumentsMixin, viewsets.ModelViewSet):
+class AmenityViewSet(AtomicWritesMixin, QueryArgumentsMixin, viewsets.ModelViewSet):
     """API endpoint that allows amenities to be viewed or edited."""
     queryset = Amenity.objects.all()
     serializer_class = AmenitySerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
-    filter_fields = fields('id', {'name': ['icontains', 'startswith']})
+    filterset_fields = fields('id', {'name': ['icontains', 'startswith']})
 
 
-class ServiceViewSet(QueryArgumentsMixin, viewsets.ModelViewSet):
+class ServiceViewSet(AtomicWritesMixin, QueryArgumentsMixin, viewsets.ModelViewSet):
     """API endpoint that allows services to be viewed or edited."""
     queryset = Service.objects.all()
     serializer_class = ServiceSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
-    filter_fields = fields('id', {'name': ['icontains', 'startswith']})
+    filterset_fields = fields('id', {'name': ['icontains', 'startswith']})
 
 
-class PotentialViewSet(QueryArgumentsMixin, viewsets.ModelViewSet):
+class PotentialViewSet(AtomicWritesMixin, QueryArgumentsMixin, viewsets.ModelViewSet):
     """API endpoint that allows potentials to be viewed or edited."""
     queryset = Potential.objects.all()
     serializer_class = PotentialSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
-    filter_fields = fields('id', {'name': ['icontains', 'startswith']})
+    filterset_fields = fields('id', {'name': ['icontains', 'startswith']})
 
 
-class PropertyViewSetMixin(QueryArgumentsMixin, EagerLoadingMixin):
+class PropertyViewSetMixin(AtomicWritesMixin, QueryArgumentsMixin, EagerLoadingMixin):
     """Mixin that allows properties to be viewed or edited."""
     queryset = Property.objects.all().order_by('-post_date')
 
+    # Serve safe requests from read replicas(see api.middleware)
+    use_read_replica = True
+
     select_related = {
         'location': 'location', 
         'contact': 'contact', 
-        'owner': 'owner'
+        'owner': 'owner',
+        'views_count': 'views'
     }
     prefetch_related = {
         'pictures': 'pictures', 
@@ -205,16 +284,115 @@ class PropertyViewSetMixin(QueryArgumentsMixin, EagerLoadingMixin):
 
     serializer_class = PropertySerializer
     permission_classes = (IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly)
-    filter_fields = fields(
+    pagination_class = EstimatedCountPagination
+    filterset_fields = fields(
         {'id': ['exact', 'in']},  'available_for', {'price': ['exact', 'lt', 'gt']},
         'is_price_negotiable', 'currency', 'location', 'owner',
         {'contact': ['exact', 'in']}, 'type',
         {'post_date': ['exact', 'lt', 'gt', 'range']},
+        {'normalized_price': ['lt', 'gt', 'range']},
     )
     search_fields = [
         'location__address',
         'descriptions'
     ]
+    ordering_fields = ['post_date', 'normalized_price', 'views__count']
+
+    # Query parameters read by get_queryset besides filterset_fields
+    filter_params = (
+        'longitude', 'latitude', 'radius_to_scan', 'origins', 'polygon', 'region',
+        'services__contains', 'amenities__contains', 'potentials__contains',
+        'collapse_duplicates',
+    )
+
+    # Model attributes which aren't fields => fields they read, used to
+    # load only columns needed by restql queries(see api.restql)
+    restql_dependencies = {
+        Property: {
+            'available_for_options': [], 'rooms_count': [], 'distance': [],
+            'is_my_favourite': [], 'views_count': ['owner'], 'nearest_origin': [],
+        },
+        Location: {'latitude': ['point'], 'longitude': ['point'], 'srid': ['point']},
+    }
+
+    @classmethod
+    def get_parsed_restql_query_from_req(cls, request):
+        # Serializers reuse the query parsed here through the request
+        if not hasattr(request, 'parsed_restql_query'):
+            raw_query = request.GET[restql_settings.QUERY_PARAM_NAME]
+            request.parsed_restql_query = restql.parse_query(raw_query)
+        return request.parsed_restql_query
+
+    def apply_eager_loading(self, queryset):
+        """
+        Select and prefetch relations in restql query, loading
+        only columns of fields in the query
+        """
+        if self.request.method not in SAFE_METHODS:
+            # Instances may be saved so all their fields are loaded
+            return super().apply_eager_loading(queryset)
+
+        query = self.get_dict_parsed_restql_query(self.parsed_restql_query)
+        tree = restql.serializer_tree(self.get_serializer_class())
+
+        to_select = self.get_related_fields(self.get_select_related_mapping(), query)
+        to_prefetch = []
+        for key, lookup in self.get_prefetch_related_mapping().items():
+            if self.get_related_fields({key: lookup}, query):
+                children = tree.get(key, (None, None, False))[1]
+                to_prefetch.append(restql.limited_prefetch(
+                    queryset.model, lookup, children, query.get(key), self.restql_dependencies
+                ))
+
+        if to_select:
+            queryset = queryset.select_related(*to_select)
+        if to_prefetch:
+            queryset = queryset.prefetch_related(*to_prefetch)
+
+        if query != {'*': True}:
+            only = restql.only_fields(
+                queryset.model, tree, query, self.restql_dependencies, to_select
+            )
+            if only is not None:
+                queryset = queryset.only(*only)
+        return queryset
+
+    def can_render_in_db(self, request):
+        """
+        Whether the database can render this list exactly like the serializer
+        """
+        params = request.query_params
+        return (
+            settings.DB_RENDERED_LISTS and
+            not request.user.is_authenticated and
+            not self.has_restql_query_param(request) and
+            self.get_serializer_class() is PropertySerializer and
+            request.accepted_renderer.format == 'json' and
+            self.format_kwarg is None and
+            # Distances are rendered by the serializer
+            'longitude' not in params and 'latitude' not in params and
+            'origins' not in params
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.can_render_in_db(request):
+            return super().list(request, *args, **kwargs)
+
+        # Only ids of the page are fetched, the page is rendered by the
+        # database and its json is sent as it is(see api.db_json)
+        queryset = self.filter_queryset(self.get_queryset())
+        ids = queryset.prefetch_related(None).values_list('id', flat=True)
+        page = self.paginate_queryset(ids)
+        results = db_json.render_properties(
+            page if page is not None else ids, request, using=queryset.db
+        )
+        if page is not None:
+            results = db_json.paginated_body(self.get_paginated_response([]).data, results)
+        return HttpResponse(results, content_type='application/json')
+
+    def saved(self, instance):
+        # Run by workers once the property is committed(see api.jobs)
+        tasks.update_saved_property.delay(instance.pk)
 
     def destroy(self, request, pk=None):
         """Function for deleting property and its associated components"""
@@ -223,26 +401,30 @@ class PropertyViewSetMixin(QueryArgumentsMixin, EagerLoadingMixin):
         contact = property.contact
         pictures = property.pictures
 
-        # Don't use bulk deletion because it doesn't use overriden delete
-        # on Picture Model, so with it picture files won't be deleted
-        for picture in pictures.get_queryset():
-            picture.delete()
+        with transaction.atomic():
+            # Don't use bulk deletion because it doesn't use overriden delete
+            # on Picture Model, so with it picture files won't be deleted
+            for picture in pictures.get_queryset():
+                picture.delete()
 
-        property.delete()
-        location.delete()
-        contact.delete()
+            property.delete()
+            location.delete()
+            contact.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def contains_lookup(self, request, queryset, field):
         ids = json.loads(request.query_params.get(field, "[]"))
-        field = field.replace("__contains", "__in")
 
         if(not ids):
             return queryset
 
-        lookup = {field: ids}
-        queryset = queryset.filter(**lookup).distinct()
-        return queryset
+        # Filter with a subquery on the through table instead of a join
+        # so that rows are not duplicated and no DISTINCT is needed
+        relation = Property._meta.get_field(field.replace("__contains", ""))
+        through = relation.remote_field.through
+        lookup = {f'{relation.m2m_reverse_field_name()}__in': ids}
+        matches = through.objects.filter(**lookup).values(relation.m2m_field_name())
+        return queryset.filter(id__in=matches)
 
     def filter_with_contains_lookup(self, queryset):
         request = self.request
@@ -251,11 +433,168 @@ class PropertyViewSetMixin(QueryArgumentsMixin, EagerLoadingMixin):
         qs = self.contains_lookup(request, qs, "potentials__contains")
         return qs
 
+    def filter_by_region(self, queryset):
+        """
+        Return properties located in `region` query parameter
+        """
+        region = self.request.query_params.get('region')
+        if region is None:
+            return queryset
+
+        serializer = RegionFilterSerializer(data={'region': region})
+        serializer.is_valid(raise_exception=True)
+
+        # Locations are linked to regions containing them when saved
+        through = Location.regions.through
+        locations = through.objects.filter(
+            region_id=serializer.validated_data['region']
+        ).values('location_id')
+        return queryset.filter(location_id__in=locations)
+
+    @action(detail=False, url_path='region-counts')
+    def region_counts(self, request):
+        """
+        Return number of properties matching filters in each region of a level
+        """
+        serializer = RegionCountsSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        counts = (
+            Location.regions.through.objects
+            .filter(
+                region__level=serializer.validated_data['level'],
+                location_id__in=queryset.order_by().values('location_id')
+            )
+            .values('region_id', 'region__name')
+            .annotate(count=Count('*'))
+            .order_by('-count', 'region__name')
+        )
+        return Response([
+            {'id': row['region_id'], 'name': row['region__name'], 'count': row['count']}
+            for row in counts
+        ])
+
+    def filter_within_radius(self, queryset, point, radius):
+        """
+        Return properties within `radius` meters from `point` ordered by distance
+        """
+        # Prefilter locations with the spatial index
+        degrees = radius_in_degrees(point, radius)
+        qs = queryset.filter(location__point__dwithin=(point, degrees))
+        qs = qs.annotate(
+            distance=Distance('location__point', point)
+        )
+        qs = qs.filter(
+            distance__lt=radius
+        )
+        return qs.order_by('distance')
+
+    def filter_within_polygon(self, queryset):
+        """
+        Return properties within a GeoJSON `polygon`, an alternative
+        to searching around a point
+        """
+        params = self.request.query_params
+        if 'polygon' not in params:
+            return queryset
+        if 'longitude' in params or 'latitude' in params:
+            raise ValidationError('Search either within a polygon or around a point')
+
+        serializer = PolygonSearchSerializer(data={'polygon': params['polygon']})
+        serializer.is_valid(raise_exception=True)
+        polygon = serializer.validated_data['polygon']
+
+        # Bounding boxes overlap(&&) is answered by the spatial index of
+        # points, only its matches are tested against the simplified polygon
+        return queryset.filter(
+            location__point__bboverlaps=polygon,
+            location__point__intersects=polygon
+        )
+
+    def filter_duplicates(self, queryset):
+        """
+        Return only the first property of each cluster of duplicate
+        listings when `collapse_duplicates` is true(see api.duplicates)
+        """
+        value = self.request.query_params.get('collapse_duplicates', '')
+        if value.lower() not in ('true', '1'):
+            return queryset
+        return queryset.filter(
+            Q(signature__cluster__isnull=True) | Q(signature__cluster=F('id'))
+        )
+
+    def filter_near_origins(self, queryset, origins):
+        """
+        Return properties within radius of any of `origins`(a list of
+        (point, radius in meters)) once, annotated with the distance to
+        and the index of their nearest origin and ordered by distance
+        """
+        # Prefilter locations with the spatial index, one scan per origin
+        qs = queryset.filter(reduce(or_, [
+            Q(location__point__dwithin=(point, radius_in_degrees(point, radius)))
+            for point, radius in origins
+        ]))
+        qs = qs.annotate(**{
+            f'origin_{index}_distance': Distance('location__point', point)
+            for index, (point, radius) in enumerate(origins)
+        })
+
+        within = [
+            Q(**{f'origin_{index}_distance__lt': radius})
+            for index, (point, radius) in enumerate(origins)
+        ]
+        qs = qs.filter(reduce(or_, within))
+
+        # Origins out of radius are null which LEAST ignores
+        distances = [
+            Case(When(condition, then=F(f'origin_{index}_distance')))
+            for index, condition in enumerate(within)
+        ]
+        qs = qs.annotate(distance=Least(*distances) if len(distances) > 1 else distances[0])
+        qs = qs.annotate(nearest_origin=Case(
+            *[
+                When(condition & Q(distance=F(f'origin_{index}_distance')), then=Value(index))
+                for index, condition in enumerate(within)
+            ],
+            output_field=IntegerField()
+        ))
+        return qs.order_by('distance', 'id')
+
+    def get_origins(self):
+        """
+        Return origins of a search around several origins as a list of
+        (point, radius in meters), None if it's not one
+        """
+        params = self.request.query_params
+        if 'origins' not in params:
+            return None
+        if 'longitude' in params or 'latitude' in params:
+            raise ValidationError('Search either around origins or around a point')
+
+        try:
+            origins = json.loads(params['origins'])
+        except ValueError:
+            raise ValidationError({'origins': 'Must be a json list of origins'})
+
+        serializer = NearbyOriginsSerializer(data={'origins': origins})
+        serializer.is_valid(raise_exception=True)
+
+        SRID = 4326
+        return [
+            (Point(origin['longitude'], origin['latitude'], srid=SRID), origin['radius_to_scan'])
+            for origin in serializer.validated_data['origins']
+        ]
+
     def get_nearby_properties(self, queryset):
         """
         Return nearby properties
         """
         DEFAULT_RADIUS_TO_SCAN = 1000 # In meters
+
+        origins = self.get_origins()
+        if origins is not None:
+            return self.filter_near_origins(queryset, origins)
         
         longitude = self.request.query_params.get('longitude', None)
         latitude = self.request.query_params.get('latitude', None)
@@ -284,22 +623,19 @@ class PropertyViewSetMixin(QueryArgumentsMixin, EagerLoadingMixin):
             srid=SRID
         )
 
-        qs = queryset.annotate(
-            distance=Distance('location__point', location_to_scan_from)
+        return self.filter_within_radius(
+            queryset,
+            location_to_scan_from,
+            serializer.data.get('radius_to_scan')
         )
-        
-        qs = qs.filter(
-            distance__lt=serializer.data.get('radius_to_scan')
-        )
-
-        qs = qs.order_by('distance')
-
-        return qs
 
     def get_queryset(self):
         """Do a custom search of location in every field of Location model"""
         queryset = super().get_queryset()
         qs = self.filter_with_contains_lookup(queryset)
+        qs = self.filter_by_region(qs)
+        qs = self.filter_within_polygon(qs)
+        qs = self.filter_duplicates(qs)
         qs = self.get_nearby_properties(qs)
         return qs
 
@@ -307,91 +643,133 @@ class PropertyViewSetMixin(QueryArgumentsMixin, EagerLoadingMixin):
 class PropertyViewSet(PropertyViewSetMixin, viewsets.ModelViewSet):
     """API endpoint that allows Property to be viewed or edited."""
 
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        if instance.owner_id is None or instance.owner_id != request.user.id:
+            # Counted in memory and written in batches(see api.view_counts)
+            view_counter.add(instance.pk)
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
+
+    @action(detail=True)
+    def similar(self, request, pk=None):
+        """
+        Return properties most similar to this property
+        """
+        property = self.get_object()
+        serializer = SimilarPropertiesSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
 
-class PropertyPictureViewSet(QueryArgumentsMixin, viewsets.ModelViewSet):
+        ids = similar_properties(property, serializer.validated_data['k'])
+        # Similar properties can be of any type
+        queryset = Property.objects.filter(id__in=ids).select_related(
+            *self.select_related.values()
+        ).prefetch_related(*self.prefetch_related.values())
+        properties = {property.id: property for property in queryset}
+
+        serializer = PropertySerializer(
+            [properties[id] for id in ids if id in properties],
+            many=True, context=self.get_serializer_context()
+        )
+        return Response(serializer.data)
+
+
+class PropertyPictureViewSet(AtomicWritesMixin, QueryArgumentsMixin, viewsets.ModelViewSet):
     """API endpoint that allows Property Picture to be viewed or edited."""
     queryset = PropertyPicture.objects.all()
     serializer_class = PropertyPictureSerializer
     permission_classes = (IsAuthenticated, BelongsToPropertyOwnedByAuthenticatedUser)
-    filter_fields = fields('id', 'property', 'tooltip')
+    filterset_fields = fields('id', 'property', 'tooltip')
 
 
 class SingleRoomViewSet(PropertyViewSet):
     """API endpoint that allows SingleRoom to be viewed or edited."""
-    queryset = SingleRoom.objects.all().order_by('-post_date')
+    queryset = SingleRoom.objects.filter(type=ROOM).order_by('-post_date')
     serializer_class = SingleRoomSerializer
-    filter_fields = fields(
-        'price_rate_unit', 'rooms__type', 'rooms__count'
+    filterset_fields = fields(
+        'price_rate_unit', 'rooms__type', {'rooms__count': ['exact', 'gte']}
     )
-    filter_fields = {**PropertyViewSet.filter_fields, **filter_fields}
+    filterset_fields = {**PropertyViewSet.filterset_fields, **filterset_fields}
 
 
 class HouseViewSet(PropertyViewSet):
     """API endpoint that allows House to be viewed or edited."""
-    queryset = House.objects.all().order_by('-post_date')
+    queryset = House.objects.filter(type=HOUSE).order_by('-post_date')
     serializer_class = HouseSerializer
-    filter_fields = fields(
-        'price_rate_unit',
+    filterset_fields = fields(
+        'price_rate_unit', 'rooms__type', {'rooms__count': ['exact', 'gte']}
     )
-    filter_fields = {**PropertyViewSet.filter_fields, **filter_fields}
+    filterset_fields = {**PropertyViewSet.filterset_fields, **filterset_fields}
 
 
 class ApartmentViewSet(PropertyViewSet):
     """API endpoint that allows Apartment to be viewed or edited."""
-    queryset = Apartment.objects.all().order_by('-post_date')
+    queryset = Apartment.objects.filter(type=APARTMENT).order_by('-post_date')
     serializer_class = ApartmentSerializer
-    filter_fields = fields(
-        'price_rate_unit',
+    filterset_fields = fields(
+        'price_rate_unit', 'rooms__type', {'rooms__count': ['exact', 'gte']}
     )
-    filter_fields = {**PropertyViewSet.filter_fields, **filter_fields}
+    filterset_fields = {**PropertyViewSet.filterset_fields, **filterset_fields}
 
 
 class LandViewSet(PropertyViewSet):
     """API endpoint that allows Land to be viewed or edited."""
-    queryset = Land.objects.all().order_by('-post_date')
+    queryset = Land.objects.filter(type=LAND).order_by('-post_date')
     serializer_class = LandSerializer
-    filter_fields = fields(
+    filterset_fields = fields(
         {'square_meters': ['gt', 'lt', 'exact']}
     )
-    filter_fields = {**PropertyViewSet.filter_fields, **filter_fields}
+    filterset_fields = {**PropertyViewSet.filterset_fields, **filterset_fields}
 
 
 class FrameViewSet(PropertyViewSet):
     """API endpoint that allows Frame to be viewed or edited."""
-    queryset = Frame.objects.all().order_by('-post_date')
+    queryset = Frame.objects.filter(type=FRAME).order_by('-post_date')
     serializer_class = FrameSerializer
-    filter_fields = fields(
+    filterset_fields = fields(
         'price_rate_unit',
     )
-    filter_fields = {**PropertyViewSet.filter_fields, **filter_fields}
+    filterset_fields = {**PropertyViewSet.filterset_fields, **filterset_fields}
 
 
 class OfficeViewSet(PropertyViewSet):
     """API endpoint that allows Office to be viewed or edited."""
-    queryset = Office.objects.all().order_by('-post_date')
+    queryset = Office.objects.filter(type=OFFICE).order_by('-post_date')
     serializer_class = OfficeSerializer
-    filter_fields = fields(
+    filterset_fields = fields(
         'price_rate_unit',
     )
-    filter_fields = {**PropertyViewSet.filter_fields, **filter_fields}
+    filterset_fields = {**PropertyViewSet.filterset_fields, **filterset_fields}
 
 
 class HostelViewSet(PropertyViewSet):
     """API endpoint that allows Hostel to be viewed or edited."""
-    queryset = Hostel.objects.all().order_by('-post_date')
+    queryset = Hostel.objects.filter(type=HOSTEL).order_by('-post_date')
     serializer_class = HostelSerializer
-    filter_fields = fields(
-        'price_rate_unit',
+    filterset_fields = fields(
+        'price_rate_unit', 'rooms__type', {'rooms__count': ['exact', 'gte']}
     )
-    filter_fields = {**PropertyViewSet.filter_fields, **filter_fields}
+    filterset_fields = {**PropertyViewSet.filterset_fields, **filterset_fields}
+
 
+# Property type => viewset listing properties of that type
+TYPE_VIEWSETS = {
+    ROOM: SingleRoomViewSet,
+    HOUSE: HouseViewSet,
+    APARTMENT: ApartmentViewSet,
+    LAND: LandViewSet,
+    FRAME: FrameViewSet,
+    OFFICE: OfficeViewSet,
+    HOSTEL: HostelViewSet,
+}
 
-class FeatureViewSet(QueryArgumentsMixin, viewsets.ModelViewSet):
+
+class FeatureViewSet(AtomicWritesMixin, QueryArgumentsMixin, viewsets.ModelViewSet):
     """API endpoint that allows PropertyFeature to be viewed or edited."""
     queryset = Feature.objects.all().order_by('-id')
     serializer_class = FeatureSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
-    filter_fields = fields('id', 'property', 'name', 'value')
+    filterset_fields = fields('id', 'property', 'name', 'value')
 
 
 class PropertyAvailabilityViewSet(viewsets.ViewSet):
@@ -419,7 +797,7 @@ class RoomTypeViewSet(QueryArgumentsMixin, viewsets.ModelViewSet):
     queryset = RoomType.objects.all().order_by('-id')
     serializer_class = RoomTypeSerializer
     permission_classes = (IsAuthenticatedOrReadOnly, IsAdminOrReadOnly)
-    filter_fields = fields('id', 'code', 'name')
+    filterset_fields = fields('id', 'code', 'name')
     pagination_class = None
 
 
@@ -436,7 +814,71 @@ class FavouritePropertiesViewSet(PropertyViewSetMixin, viewsets.ReadOnlyModelVie
         fav_ids = user.fav_properties.values_list('id')
         qs = queryset.filter(id__in=fav_ids)
         return qs
-        
+
+    @action(detail=False, methods=['post'])
+    def add(self, request):
+        """
+        Add properties to user's favourites
+        """
+        serializer = FavouritesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['properties']
+
+        existing = list(Property.objects.filter(id__in=ids).values_list('id', flat=True))
+        # Only missing rows are inserted into the through table
+        request.user.fav_properties.add(*existing)
+        return Response({'properties': existing})
+
+    @action(detail=False, methods=['post'])
+    def remove(self, request):
+        """
+        Remove properties from user's favourites
+        """
+        serializer = FavouritesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['properties']
+
+        request.user.fav_properties.remove(*ids)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class TrendingPropertiesViewSet(PropertyViewSetMixin, viewsets.ReadOnlyModelViewSet):
+    """API endpoint that returns properties trending in users favourites"""
+    permission_classes = (AllowAny,)
+
+    # Number of most favourited properties which are ranked
+    candidates = 1000
+
+    # How fast favourites of old properties lose their weight
+    gravity = 1.5
+
+    def filter_queryset(self, queryset):
+        """
+        Rank most favourited properties by favourites decayed with age
+        """
+        queryset = super().filter_queryset(queryset)
+
+        # Uses index on favourites count
+        candidates = (
+            queryset.filter(favourites_count__gt=0)
+            .order_by('-favourites_count')
+            .values('id')[:self.candidates]
+        )
+
+        age_in_hours = Func(
+            F('post_date'),
+            template="EXTRACT(EPOCH FROM (NOW() - %(expressions)s)) / 3600",
+            output_field=FloatField()
+        )
+        score = ExpressionWrapper(
+            F('favourites_count') / Power(age_in_hours + 2, self.gravity),
+            output_field=FloatField()
+        )
+
+        qs = queryset.filter(id__in=candidates)
+        qs = qs.annotate(trending_score=score)
+        return qs.order_by('-trending_score', '-id')
+
 
 class NearbyPropertiesViewSet(PropertyViewSetMixin, viewsets.ReadOnlyModelViewSet):
     """API endpoint that returns nearby properties from a specified point"""
@@ -446,6 +888,10 @@ class NearbyPropertiesViewSet(PropertyViewSetMixin, viewsets.ReadOnlyModelViewSe
         """
         Return nearby properties
         """
+        if 'origins' in self.request.query_params:
+            # Searched around several origins by the mixin
+            return super().get_queryset()
+
         DEFAULT_RADIUS_TO_SCAN = 1000 # In meters
         
         longitude = self.request.query_params.get('longitude', None)
@@ -472,14 +918,118 @@ class NearbyPropertiesViewSet(PropertyViewSetMixin, viewsets.ReadOnlyModelViewSe
 
         queryset = super().get_queryset()
 
-        qs = queryset.annotate(
-            distance=Distance('location__point', location_to_scan_from)
+        return self.filter_within_radius(
+            queryset,
+            location_to_scan_from,
+            serializer.data.get('radius_to_scan')
         )
-        
-        qs = qs.filter(
-            distance__lt=serializer.data.get('radius_to_scan')
+
+
+class AreaStatsViewSet(viewsets.ViewSet):
+    """API endpoint that returns price statistics of areas"""
+    permission_classes = (AllowAny,)
+
+    # Serve safe requests from read replicas(see api.middleware)
+    use_read_replica = True
+
+    def list(self, request):
+        """
+        Return count and price percentiles by availability of the grid
+        cell containing a point, broken down by type and availability
+        """
+        serializer = CellStatsSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        stats = area_stats.cell_stats(
+            data['longitude'], data['latitude'], data['zoom'], serializer.filters()
         )
+        return Response(stats)
 
-        qs = qs.order_by('distance')
+    @action(detail=False)
+    def heatmap(self, request):
+        """
+        Return count and median prices by availability of every grid cell within bounds
+        """
+        serializer = HeatmapSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
 
-        return qs
+        cells = area_stats.heatmap(
+            data['west'], data['south'], data['east'], data['north'],
+            data['zoom'], serializer.filters()
+        )
+        return Response({'zoom': data['zoom'], 'cells': cells})
+
+
+class ChangesViewSet(viewsets.ViewSet):
+    """API endpoint that returns properties changed since a cursor"""
+    permission_classes = (AllowAny,)
+
+    # Serve safe requests from read replicas(see api.middleware)
+    use_read_replica = True
+
+    def list(self, request):
+        """
+        Return properties created, updated or deleted after `since`
+        cursor and the cursor to send on the next request
+        """
+        serializer = ChangesSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        log, cursor, has_more = changes.read_changes(data.get('since'), data['limit'])
+        properties = self.serialize_properties([id for id, change in log if change != DELETED])
+
+        results = []
+        for id, change in log:
+            if change == DELETED:
+                results.append({'id': id, 'action': change, 'property': None})
+            elif id in properties:
+                # Properties missing here were deleted after the cursor,
+                # their tombstone comes on a following page
+                results.append({'id': id, 'action': change, 'property': properties[id]})
+        return Response({'cursor': cursor, 'has_more': has_more, 'results': results})
+
+    def serialize_properties(self, ids):
+        """
+        Return properties with `ids` as a dict of id => data, each
+        serialized like on the endpoint of its type
+        """
+        ids_by_type = {}
+        for id, type in Property.objects.filter(id__in=ids).values_list('id', 'type'):
+            ids_by_type.setdefault(type, []).append(id)
+
+        context = {'request': self.request, 'format': self.format_kwarg, 'view': self}
+        properties = {}
+        for type, type_ids in ids_by_type.items():
+            viewset = TYPE_VIEWSETS.get(type, PropertyViewSet)
+            queryset = viewset.queryset.model.objects.filter(id__in=type_ids).select_related(
+                *viewset.select_related.values()
+            ).prefetch_related(*viewset.prefetch_related.values())
+            serializer = viewset.serializer_class(queryset, many=True, context=context)
+            properties.update((item['id'], item) for item in serializer.data)
+        return properties
+
+
+class SavedSearchViewSet(QueryArgumentsMixin, viewsets.ModelViewSet):
+    """API endpoint that allows user's saved searches to be viewed or edited."""
+    queryset = SavedSearch.objects.all().order_by('-created_at')
+    serializer_class = SavedSearchSerializer
+    permission_classes = (IsAuthenticated, IsOwnerOrReadOnly)
+    filterset_fields = fields('id', 'type', 'available_for')
+
+    def get_queryset(self):
+        return super().get_queryset().filter(owner=self.request.user)
+
+
+class NotificationViewSet(QueryArgumentsMixin, viewsets.ModelViewSet):
+    """API endpoint that returns properties matching user's saved searches."""
+    queryset = Notification.objects.all().order_by('-created_at')
+    serializer_class = NotificationSerializer
+    permission_classes = (IsAuthenticated, IsOwnerOrReadOnly)
+    http_method_names = ['get', 'patch', 'head', 'delete']
+    filterset_fields = fields('id', 'saved_search', 'property', 'is_read')
+
+    def get_queryset(self):
+        return super().get_queryset().filter(owner=self.request.user)
@@ -0,0 +1,106 @@
+import time
+import inspect
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.contrib.gis.geos import Point
+from django.urls import get_resolver, reverse
+from django_restql.mixins import DynamicFieldsMixin
+from rest_framework.serializers import BaseSerializer
+
+from . import restql, serializers
+from .similarity import index
+
+
+def load_urls():
+    # Builds the router's url patterns and the reverse lookup tables
+    resolver = get_resolver()
+    resolver.resolve('/properties/')
+    reverse('property-detail', args=[1])
+
+
+def load_serializers():
+    """
+    Instantiate every serializer of `api.serializers` so that
+    their fields and models' meta caches are built.
+    """
+    for name, serializer_class in inspect.getmembers(serializers, inspect.isclass):
+        if (not issubclass(serializer_class, BaseSerializer) or
+                serializer_class.__module__ != serializers.__name__):
+            continue
+        serializer_class().fields
+        if issubclass(serializer_class, DynamicFieldsMixin):
+            restql.serializer_tree(serializer_class)
+
+
+def load_geo_libraries():
+    # GEOS and GDAL are loaded with ctypes on first use
+    point = Point(39.27, -6.81, srid=4326)
+    point.transform(3857, clone=True)
+    point.ewkb
+
+
+def load_restql_parser():
+    restql.parse_query('{id, price, location{address}}')
+
+
+def load_similarity_index():
+    # Reads the snapshot only, vectors saved after it are synced on demand
+    with index.lock:
+        if index.synced_at is None:
+            index.load(settings.SIMILARITY_INDEX_PATH)
+
+
+STEPS = [
+    ('urls', load_urls),
+    ('serializers', load_serializers),
+    ('geo_libraries', load_geo_libraries),
+    ('restql_parser', load_restql_parser),
+    ('similarity_index', load_similarity_index),
+]
+
+
+def warm_up():
+    """
+    Load what is otherwise loaded lazily by the first request of a worker
+    and return how long each step took in seconds. With gunicorn `--preload`
+    it runs once in the master process and workers share the loaded state.
+    """
+    durations = {}
+    for name, step in STEPS:
+        start = time.perf_counter()
+        step()
+        durations[name] = time.perf_counter() - start
+
+    # Connections must not be inherited by forked workers
+    connections.close_all()
+    return durations
+
+
+class LifespanMiddleware():
+    """
+    ASGI middleware warming up the worker on lifespan startup, before the
+    server accepts connections. Other connections are passed to `app`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'lifespan':
+            return await self.app(scope, receive, send)
+
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    if settings.WARM_UP:
+                        await sync_to_async(warm_up)()
+                except Exception as error:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(error)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
@@ -13,4 +13,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
 
-application = get_asgi_application()
\ No newline at end of file
+application = get_asgi_application()
+
+# Imported once apps are loaded
+from api.warmup import LifespanMiddleware  # noqa: E402
+from api.live import LiveUpdatesMiddleware  # noqa: E402
+
+# Workers are warmed up on lifespan startup
+application = LifespanMiddleware(application)
+
+# Property changes are streamed to map clients
+application = LiveUpdatesMiddleware(application)
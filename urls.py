@@ -14,14 +14,16 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from api import media
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('api.urls')),
+    re_path(rf'^{settings.MEDIA_URL.lstrip("/")}(?P<path>.*)$', media.serve, name='media'),
 ]
 
 urlpatterns += static(settings.STATIC_URL, document_root = settings.STATIC_ROOT)
-urlpatterns += static(settings.MEDIA_URL, document_root = settings.MEDIA_ROOT)
@@ -9,8 +9,16 @@ https://docs.djangoproject.com/en/3.0/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
 
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+# Imported once apps are loaded
+from api.warmup import warm_up  # noqa: E402
+
+if settings.WARM_UP:
+    # With gunicorn --preload this runs in the master before forking workers
+    warm_up()